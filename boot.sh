@@ -1,3 +1,3 @@
 #!/bin/sh
 . venv/bin/activate
-exec uvicorn app.app:api --log-level=info --host 0.0.0.0 --port $PORT
\ No newline at end of file
+exec uvicorn app.app:api --log-level=info --host 0.0.0.0 --port $PORT --workers ${WORKERS:-1}
\ No newline at end of file
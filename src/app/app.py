@@ -1,5 +1,8 @@
 from fastapi import FastAPI
 
+from app.config import settings
+from app.metrics import MetricsMiddleware
+from app.router import recorder
 from app.router import router as items_router
 
 api = FastAPI(
@@ -8,6 +11,16 @@ api = FastAPI(
     version="1.0.0",
 )
 api.include_router(items_router)
+if recorder is not None:
+    api.add_middleware(MetricsMiddleware, recorder=recorder)
+if settings.debug_token:
+    # Profiling is only imported when enabled, so it costs nothing otherwise
+    from app import debug
+    from app.profiling import ProfilingMiddleware
+
+    api.include_router(debug.router)
+    if debug.request_profiler is not None:
+        api.add_middleware(ProfilingMiddleware, profiler=debug.request_profiler)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+# op, id, value (None for deletes)
+Change = Tuple[str, str, Optional[str]]
+
+
+class ChangesExpiredError(Exception):
+    """Exception raised when the changes after a sequence number are not available.
+
+    Either they were pushed out of the ring buffer, or the sequence number was
+    issued before the process restarted. The reader has to resynchronize.
+    """
+
+    def __init__(self, since: int, oldest: int, last: int):
+        super().__init__(
+            f"Changes after {since} are not available; "
+            f"the feed holds changes after {oldest} up to {last}."
+        )
+        self.since = since
+        self.oldest = oldest
+        self.last = last
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ChangeFeed:
+    """Bounded in-memory log of the latest writes, with asyncio fan-out.
+
+    Every published change gets the next sequence number. Only the newest
+    `capacity` records are kept, in a ring buffer.
+
+    Writers may publish from any thread. All readers waiting for new changes
+    share a single future, so an idle subscriber costs one suspended coroutine
+    and a write wakes every subscriber with one thread-safe callback.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self._records: deque[dict] = deque(maxlen=capacity)
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Future] = None
+
+    @property
+    def last_seq(self) -> int:
+        """The sequence number of the latest change, or 0 before the first one."""
+        return self._last_seq
+
+    def publish(self, changes: Iterable[Change]) -> int:
+        """Append changes and wake the waiting readers. Returns the last seq."""
+        with self._lock:
+            for op, key, value in changes:
+                self._last_seq += 1
+                self._records.append(
+                    {"seq": self._last_seq, "op": op, "id": key, "value": value}
+                )
+            changed, self._changed = self._changed, None
+            loop = self._loop
+            last_seq = self._last_seq
+        if changed is not None:
+            loop.call_soon_threadsafe(_wake, changed)
+        return last_seq
+
+    def reset(self, last_seq: int) -> None:
+        """Continue numbering after `last_seq`, dropping the changes held so far.
+
+        For feeds that follow changes numbered elsewhere, when the changes up
+        to `last_seq` cannot be listed: readers that were behind get
+        ChangesExpiredError and have to resynchronize. Does nothing when the
+        feed is already at `last_seq`.
+        """
+        with self._lock:
+            if last_seq == self._last_seq:
+                return
+            self._records.clear()
+            self._last_seq = last_seq
+            changed, self._changed = self._changed, None
+            loop = self._loop
+        if changed is not None:
+            loop.call_soon_threadsafe(_wake, changed)
+
+    def since(self, seq: int, limit: int) -> List[dict]:
+        """Return up to `limit` changes after `seq`, oldest first.
+
+        Raises ChangesExpiredError when some of them are no longer held.
+        """
+        with self._lock:
+            oldest = self._records[0]["seq"] - 1 if self._records else self._last_seq
+            if seq < oldest or seq > self._last_seq:
+                raise ChangesExpiredError(seq, oldest, self._last_seq)
+            # Sequence numbers are contiguous, so the newest `count` records
+            # are exactly the ones after `seq`
+            count = self._last_seq - seq
+            newest = list(islice(reversed(self._records), count))
+        newest.reverse()
+        return newest[:limit]
+
+    async def wait(self, seq: int, timeout: float, limit: int) -> List[dict]:
+        """Like `since`, but waits up to `timeout` seconds for a change if none are due."""
+        records = self.since(seq, limit)
+        if records or timeout <= 0:
+            return records
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._last_seq > seq:
+                changed = None
+            else:
+                if self._changed is None or self._loop is not loop:
+                    self._loop = loop
+                    self._changed = loop.create_future()
+                changed = self._changed
+        if changed is not None:
+            try:
+                # Shielded: one reader timing out must not cancel the shared future
+                await asyncio.wait_for(asyncio.shield(changed), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.since(seq, limit)
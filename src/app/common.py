@@ -1,5 +1,58 @@
-from aws_lambda_powertools import Logger, Metrics
+import os
+import threading
+from typing import Any, Callable
+
+from app.config import settings
+from app.log import EventLogger, QueueBatchingHandler
 
 service_name = "ListService"
-logger = Logger(service=service_name)
-metrics = Metrics(service=service_name)
+
+
+class LazyProxy:
+    """Stands in for an object that is only built when first used.
+
+    Importing aws_lambda_powertools takes tens of milliseconds, which every
+    cold start would pay at import time even when nothing gets logged. The
+    proxy builds the real object on the first attribute access and forwards
+    everything to it from then on. The object is built once even when
+    several threads use the proxy for the first time together.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes the proxy itself does not have
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return getattr(self._target, name)
+
+    @property
+    def initialized(self) -> bool:
+        return self._target is not None
+
+
+def _create_logger():
+    from aws_lambda_powertools import Logger
+
+    handler = None
+    if settings.log_batching:
+        handler = QueueBatchingHandler()
+    return Logger(service=service_name, logger_handler=handler)
+
+
+def _create_metrics():
+    from aws_lambda_powertools import Metrics
+
+    namespace = os.environ.get("POWERTOOLS_METRICS_NAMESPACE", service_name)
+    return Metrics(service=service_name, namespace=namespace)
+
+
+logger = LazyProxy(_create_logger)
+metrics = LazyProxy(_create_metrics)
+# Sampled, structured events for the request path; errors go to `logger`
+events = EventLogger(logger, settings.log_sample_rates)
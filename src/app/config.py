@@ -0,0 +1,65 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, read from `LIST_SERVICE_*` environment variables."""
+
+    model_config = SettingsConfigDict(env_prefix="LIST_SERVICE_")
+
+    repository_backend: Literal["memory", "compact", "sqlite", "log", "shared"] = (
+        "memory"
+    )
+    repository_max_workers: int = 8
+    # Ids of new items. All but `uuid4` sort in creation order; `compact`
+    # needs UUIDs and sharding needs ordered ids
+    id_scheme: Literal["uuid4", "uuid7", "ulid", "snowflake"] = "uuid7"
+    # Worker id embedded in snowflake ids; the process id when unset
+    snowflake_worker_id: int | None = None
+    # Repositories of the backend that items are spread across by id
+    shard_count: int = 1
+    # Lets the `memory` backend serve several worker threads at once
+    memory_thread_safe: bool = False
+    sqlite_path: str = "/tmp/items.db"
+    log_directory: str = "/tmp/items-log"
+    log_segment_size: int = 64 * 1024 * 1024
+    log_compaction_interval: float = 60.0
+    # Bytes of log appended after which the `log` backend writes a checkpoint
+    log_checkpoint_min_log: int = 16 * 1024 * 1024
+    # File shared by the worker processes of the `shared` backend
+    shared_memory_path: str = "/dev/shm/list-service"
+    shared_memory_size: int = 16 * 1024 * 1024
+    # Snapshot of the `memory` backend, loaded at startup when the file exists
+    snapshot_path: str | None = None
+    # Seconds between snapshots; 0 only writes them on demand
+    snapshot_interval: float = 0
+    # Entries in each read cache in front of the repository; 0 disables it
+    cache_size: int = 0
+    # Seconds a cached read stays valid; None keeps it until a write evicts it
+    cache_ttl: float | None = None
+    # Encoded /head and /tail responses reused until the next write; 0 disables
+    response_cache_size: int = 256
+    # Latest changes kept for /changes readers that fall behind
+    change_feed_size: int = 10_000
+    # Identical reads in flight at the same time share one repository call
+    coalesce_reads: bool = True
+    # Latency histograms per route and repository operation, served on /metrics
+    metrics_enabled: bool = True
+    # Seconds between CloudWatch EMF logs of the metrics; 0 disables them
+    metrics_emf_interval: float = 60.0
+    # Fraction of each type of log event that is written, such as
+    # {"item.get": 0.01}; types not listed are always written
+    log_sample_rates: dict[str, float] = {}
+    # Format and write logs in batches on a background thread
+    log_batching: bool = True
+    # Token expected in X-Debug-Token by the /debug routes, which are only
+    # mounted when it is set
+    debug_token: str | None = None
+    # Profile one in this many requests with cProfile; 0 disables it
+    profile_sample_rate: int = 0
+    # Slowest request profiles kept for /debug/profiles
+    profile_keep: int = 20
+
+
+settings = Settings()
@@ -0,0 +1,71 @@
+import asyncio
+import hmac
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.profiling import (
+    ProfilerBusyError,
+    RequestProfiler,
+    SamplingProfiler,
+    collapsed_text,
+    flamegraph_tree,
+)
+from app.responses import FastJSONResponse
+
+MAX_PROFILE_SECONDS = 60.0
+
+
+async def check_debug_token(
+    x_debug_token: Annotated[str | None, Header()] = None,
+) -> None:
+    """Dependency that lets requests through only with the configured token."""
+    expected = settings.debug_token
+    if not expected or not hmac.compare_digest(
+        (x_debug_token or "").encode(), expected.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+# Only mounted by `app.app` when a debug token is configured
+router = APIRouter(
+    prefix="/debug",
+    dependencies=[Depends(check_debug_token)],
+    default_response_class=FastJSONResponse,
+    include_in_schema=False,
+)
+sampler = SamplingProfiler()
+request_profiler = (
+    RequestProfiler(settings.profile_sample_rate, settings.profile_keep)
+    if settings.profile_sample_rate > 0
+    else None
+)
+
+
+@router.get("/profile")
+async def get_profile(
+    seconds: Annotated[float, Query(gt=0, le=MAX_PROFILE_SECONDS)] = 10.0,
+    format: Literal["collapsed", "json"] = "collapsed",
+):
+    """Sample the stacks of every thread while live traffic is served.
+
+    `collapsed` returns one `frame;frame;frame count` line per stack, for
+    flamegraph.pl or speedscope; `json` returns the tree d3-flame-graph draws.
+    """
+    try:
+        stacks = await asyncio.to_thread(sampler.profile, seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return flamegraph_tree(stacks)
+    return PlainTextResponse(collapsed_text(stacks))
+
+
+@router.get("/profiles")
+async def get_request_profiles():
+    """The slowest sampled requests, with their most expensive functions."""
+    if request_profiler is None:
+        raise HTTPException(status_code=404, detail="Request profiling is disabled")
+    return [profile.report() for profile in request_profiler.slowest()]
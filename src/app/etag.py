@@ -0,0 +1,41 @@
+from hashlib import blake2b
+from typing import Optional
+
+
+def collection_etag(instance: str, version: int) -> str:
+    """Strong ETag for a view of the whole collection at a repository version.
+
+    `instance` tells apart processes whose in-memory versions count from zero
+    independently, so a tag issued by one is never mistaken by another.
+    """
+    return f'"{instance}-{version}"'
+
+
+def item_etag(value: str) -> str:
+    """Strong ETag for a single item, derived from its value."""
+    return f'"{blake2b(value.encode(), digest_size=8).hexdigest()}"'
+
+
+def _tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def matches_if_none_match(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag`, so a 304 can be sent.
+
+    Uses the weak comparison required for If-None-Match (RFC 9110, 13.1.2).
+    """
+    if not header:
+        return False
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in _tags(header))
+
+
+def matches_if_match(header: str, etag: Optional[str]) -> bool:
+    """Whether an If-Match header matches the current `etag` of a resource.
+
+    Uses strong comparison, so weak tags never match (RFC 9110, 13.1.1).
+    `etag` is None when the resource does not exist.
+    """
+    if etag is None:
+        return False
+    return any(tag == "*" or tag == etag for tag in _tags(header))
@@ -0,0 +1,222 @@
+import asyncio
+import base64
+from typing import Any, Optional
+from urllib.parse import urlencode
+
+from app.app import api
+from app.common import logger
+
+# Seconds kept back from the invocation deadline to return the response
+DEADLINE_MARGIN = 1.0
+# Body of the 504 answered when the API has not responded by then
+TIMED_OUT = b'{"detail":"The request timed out"}'
+# Response media types that are returned as text rather than base64
+TEXT_MEDIA_TYPES = ("text/", "application/json", "application/x-ndjson")
+
+Headers = list[tuple[bytes, bytes]]
+
+# One loop for the life of the execution environment, since the service keeps
+# futures and caches bound to the loop it first ran on
+_loop = asyncio.new_event_loop()
+
+
+def handler(event: dict, context: Any = None) -> dict:
+    """Answer an API Gateway proxy event by calling the API in process.
+
+    This is the function handler for deploying without the container image,
+    where uvicorn runs behind the Lambda Web Adapter and every event becomes
+    an HTTP request on loopback. REST API (payload v1) and HTTP API (payload
+    v2) events are turned straight into ASGI calls on `app.app.api`.
+
+    Responses are buffered, since API Gateway proxy integrations return the
+    whole body at once. A response still streaming when the invocation is
+    about to time out, such as a `/changes` Server-Sent Events stream, is
+    ended there with the events sent so far; clients reconnect with
+    `Last-Event-ID`.
+    """
+    v2 = event.get("version") == "2.0"
+    scope = _v2_scope(event) if v2 else _v1_scope(event)
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        raw_body = base64.b64decode(body)
+    else:
+        raw_body = body.encode()
+    timeout = None
+    if context is not None:
+        remaining = context.get_remaining_time_in_millis() / 1000
+        timeout = max(remaining - DEADLINE_MARGIN, 0)
+    status, headers, response_body = _loop.run_until_complete(
+        _call(scope, raw_body, timeout)
+    )
+    # Logs are written by a background thread, and the execution environment
+    # may be frozen as soon as the handler returns
+    if logger.initialized:
+        logger.registered_handler.flush()
+    if v2:
+        return _v2_response(status, headers, response_body)
+    return _v1_response(status, headers, response_body)
+
+
+# Events to ASGI scopes
+
+
+def _v1_scope(event: dict) -> dict:
+    multi_headers = event.get("multiValueHeaders") or {
+        name: [value] for name, value in (event.get("headers") or {}).items()
+    }
+    headers = [
+        (name.lower().encode(), value.encode())
+        for name, values in multi_headers.items()
+        for value in values
+    ]
+    query = event.get("multiValueQueryStringParameters") or event.get(
+        "queryStringParameters"
+    )
+    context = event.get("requestContext") or {}
+    source_ip = (context.get("identity") or {}).get("sourceIp")
+    return _scope(
+        event["httpMethod"],
+        event["path"],
+        urlencode(query or {}, doseq=True),
+        headers,
+        source_ip,
+    )
+
+
+def _v2_scope(event: dict) -> dict:
+    headers = [
+        (name.lower().encode(), value.encode())
+        for name, value in (event.get("headers") or {}).items()
+    ]
+    if event.get("cookies"):
+        headers.append((b"cookie", "; ".join(event["cookies"]).encode()))
+    context = event["requestContext"]
+    path = event["rawPath"]
+    # Named stages are part of the path seen by API Gateway, not by the API
+    stage = context.get("stage")
+    prefix = f"/{stage}"
+    if stage and stage != "$default" and path.startswith(prefix + "/"):
+        path = path.removeprefix(prefix)
+    return _scope(
+        context["http"]["method"],
+        path,
+        event.get("rawQueryString", ""),
+        headers,
+        context["http"].get("sourceIp"),
+    )
+
+
+def _scope(
+    method: str,
+    path: str,
+    query: str,
+    headers: Headers,
+    source_ip: Optional[str],
+) -> dict:
+    values = dict(headers)
+    host = values.get(b"host", b"lambda").decode()
+    port = int(values.get(b"x-forwarded-port", b"443"))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": values.get(b"x-forwarded-proto", b"https").decode(),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "server": (host, port),
+        "client": (source_ip, 0) if source_ip else None,
+    }
+
+
+# Running the app
+
+
+async def _call(
+    scope: dict, body: bytes, timeout: Optional[float]
+) -> tuple[int, Headers, bytes]:
+    """Run one request through the API and collect its response."""
+    start: dict = {}
+    chunks: list[bytes] = []
+    finished = asyncio.Event()
+    request_sent = False
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Streaming responses listen for the client going away until they end
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    task = asyncio.ensure_future(api(scope, receive, send))
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        finished.set()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if not start:
+            return 504, [(b"content-type", b"application/json")], TIMED_OUT
+    return start["status"], start.get("headers", []), b"".join(chunks)
+
+
+# Responses to API Gateway
+
+
+def _is_text(headers: Headers) -> bool:
+    content_type = dict(headers).get(b"content-type", b"").decode()
+    return not content_type or content_type.startswith(TEXT_MEDIA_TYPES)
+
+
+def _encode_body(headers: Headers, body: bytes) -> tuple[str, bool]:
+    if _is_text(headers):
+        return body.decode(), False
+    return base64.b64encode(body).decode(), True
+
+
+def _v1_response(status: int, headers: Headers, body: bytes) -> dict:
+    multi_headers: dict[str, list[str]] = {}
+    for name, value in headers:
+        multi_headers.setdefault(name.decode(), []).append(value.decode())
+    encoded, is_base64 = _encode_body(headers, body)
+    return {
+        "statusCode": status,
+        "multiValueHeaders": multi_headers,
+        "body": encoded,
+        "isBase64Encoded": is_base64,
+    }
+
+
+def _v2_response(status: int, headers: Headers, body: bytes) -> dict:
+    joined: dict[str, str] = {}
+    cookies = []
+    for name, value in headers:
+        if name == b"set-cookie":
+            cookies.append(value.decode())
+        elif name.decode() in joined:
+            joined[name.decode()] += f", {value.decode()}"
+        else:
+            joined[name.decode()] = value.decode()
+    encoded, is_base64 = _encode_body(headers, body)
+    response = {
+        "statusCode": status,
+        "headers": joined,
+        "body": encoded,
+        "isBase64Encoded": is_base64,
+    }
+    if cookies:
+        response["cookies"] = cookies
+    return response
@@ -0,0 +1,129 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from typing import IO, Any, Callable, Optional
+
+# Records written to the stream in one write at most
+BATCH_SIZE = 512
+# Seconds the writer waits after a record, so that those logged meanwhile
+# share its write
+BATCH_DELAY = 0.002
+# Seconds `flush` waits for the writer thread
+FLUSH_TIMEOUT = 5.0
+
+
+class QueueBatchingHandler(logging.Handler):
+    """Log handler that formats and writes records on a thread of its own.
+
+    `emit` only puts the record on a queue, so logging never waits for the
+    formatter or for stdout. After taking a record, the writer thread waits
+    `BATCH_DELAY` and then writes everything queued by then, up to
+    `batch_size` records, with a single write. Records are formatted on the
+    writer thread, so keys appended to a logger after a record was logged
+    can show up in that record.
+
+    `flush` blocks until everything logged before it was written. The
+    handler flushes at interpreter exit; call `flush` before a Lambda
+    invocation returns, since the environment may be frozen afterwards.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, batch_size: int = BATCH_SIZE):
+        super().__init__()
+        # Resolved on every write when unset, so redirecting stdout works
+        self.stream = stream
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(
+            target=self._write_batches, name="log-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._queue.put(record)
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> None:
+        if threading.current_thread() is self._writer:
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait(timeout)
+
+    def _write_batches(self) -> None:
+        get, get_nowait = self._queue.get, self._queue.get_nowait
+        while True:
+            batch = [get()]
+            if not isinstance(batch[0], threading.Event):
+                time.sleep(BATCH_DELAY)
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+            lines = []
+            flushed = []
+            for entry in batch:
+                if isinstance(entry, threading.Event):
+                    flushed.append(entry)
+                    continue
+                try:
+                    lines.append(self.format(entry))
+                except Exception:
+                    self.handleError(entry)
+            if lines:
+                stream = self.stream or sys.stdout
+                try:
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+                except Exception:
+                    self.handleError(batch[-1])
+            for written in flushed:
+                written.set()
+
+
+class EventLogger:
+    """Writes structured log events, each type sampled at its own rate.
+
+    Every event has a type, such as `item.add`, which is logged as the
+    `event` key along with the keyword fields. A type with a sample rate
+    below 1 is logged for that fraction of the calls, with the rate in
+    `sample_rate` so counts can be scaled back up. Messages take
+    `%`-style arguments, which are only formatted for events that are
+    written, and events that are sampled out or below the logger's level
+    never touch the logger.
+    """
+
+    def __init__(
+        self,
+        logger: Any,
+        sample_rates: dict[str, float],
+        random: Callable[[], float] = random.random,
+    ):
+        self._logger = logger
+        self.sample_rates = sample_rates
+        self._random = random
+
+    def info(self, event: str, message: str, *args: Any, **fields: Any) -> None:
+        self._log(logging.INFO, event, message, args, fields)
+
+    def debug(self, event: str, message: str, *args: Any, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, message, args, fields)
+
+    def _log(
+        self, level: int, event: str, message: str, args: tuple, fields: dict
+    ) -> None:
+        rate = self.sample_rates.get(event)
+        if rate is not None:
+            if rate < 1.0 and self._random() >= rate:
+                return
+            fields["sample_rate"] = rate
+        logger = self._logger
+        if not logger.isEnabledFor(level):
+            return
+        # Attributed to the caller of info or debug
+        fields["event"] = event
+        logger.log(level, message, *args, extra=fields, stacklevel=3)
@@ -0,0 +1,254 @@
+import time
+from bisect import bisect_right
+from typing import Any, Dict, Hashable, List
+
+# Upper bounds of the latency buckets in seconds: four per doubling from 1 µs
+# to about 70 s, so a percentile is off by at most a factor of 2 ** (1 / 4)
+LATENCY_BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(105)]
+# Upper bounds of the payload size buckets in bytes: two per doubling up to 1 GiB
+SIZE_BOUNDS = [2 ** (i / 2) for i in range(61)]
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+class Histogram:
+    """Counts of observed values in fixed, logarithmically spaced buckets.
+
+    Recording is a binary search over the bucket bounds and a few additions,
+    without locking. Concurrent threads may in rare cases lose an increment,
+    which metrics can tolerate, in return for costing well under a
+    microsecond. Percentiles are the upper bound of the bucket they fall
+    in, capped at the largest value seen.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: List[float] = LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_right(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+
+    def summary(self, scale: float = 1.0) -> dict[str, float]:
+        """Count, mean, percentiles and maximum, with values multiplied by scale."""
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count * scale if self.count else 0.0,
+        }
+        for name, q in PERCENTILES.items():
+            summary[name] = self.percentile(q) * scale
+        summary["max"] = self.max * scale
+        return summary
+
+
+class _Series:
+    """Latency, outcomes and sizes recorded for one route or repository operation.
+
+    Everything is counted since startup. `take_interval` works out what was
+    recorded since its previous call by subtracting the counts it saw then,
+    so recording only updates one set of counters.
+    """
+
+    __slots__ = ("latency", "outcomes", "sizes", "_taken_counts", "_taken_outcomes")
+
+    def __init__(self, sizes: int):
+        self.latency = Histogram()
+        # Status codes of routes, or whether repository operations failed
+        self.outcomes: Dict[Hashable, int] = {}
+        # Request and response sizes of routes
+        self.sizes = [Histogram(SIZE_BOUNDS) for _ in range(sizes)]
+        self._taken_counts = [0] * len(self.latency.counts)
+        self._taken_outcomes: Dict[Hashable, int] = {}
+
+    def record(self, seconds: float, outcome: Hashable) -> None:
+        self.latency.record(seconds)
+        outcomes = self.outcomes
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def take_interval(self) -> tuple[Histogram, Dict[Hashable, int]]:
+        """Return the latencies and outcomes recorded since the last call."""
+        latency = self.latency
+        counts = list(latency.counts)
+        outcomes = dict(self.outcomes)
+        interval = Histogram(latency.bounds)
+        interval.counts = [n - taken for n, taken in zip(counts, self._taken_counts)]
+        interval.count = sum(interval.counts)
+        interval.max = latency.max
+        interval_outcomes = {
+            outcome: n - self._taken_outcomes.get(outcome, 0)
+            for outcome, n in outcomes.items()
+        }
+        self._taken_counts = counts
+        self._taken_outcomes = outcomes
+        return interval, interval_outcomes
+
+
+class MetricsRecorder:
+    """Latency histograms per route and per repository operation.
+
+    Routes also count status codes and record request and response sizes.
+    `report` summarizes everything since startup for the `/metrics`
+    endpoint. When given a Powertools `Metrics` object, the recorder also
+    publishes the latency percentiles and counts of each interval as
+    CloudWatch embedded metric format (EMF) logs, one per route and
+    operation, the first time it is recorded to after the interval ends.
+    """
+
+    def __init__(self, emf_metrics: Any = None, emf_interval: float = 60.0):
+        self._routes: Dict[tuple[str, str], _Series] = {}
+        self._operations: Dict[str, _Series] = {}
+        self._emf_metrics = emf_metrics
+        self._emf_interval = emf_interval
+        self._next_publish = (
+            time.monotonic() + emf_interval
+            if emf_metrics and emf_interval > 0
+            else None
+        )
+
+    def record_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+    ) -> None:
+        series = self._routes.get((method, route))
+        if series is None:
+            series = self._routes.setdefault((method, route), _Series(sizes=2))
+        series.record(seconds, status)
+        series.sizes[0].record(request_bytes)
+        series.sizes[1].record(response_bytes)
+        if self._next_publish is not None and time.monotonic() >= self._next_publish:
+            self.publish()
+
+    def record_operation(self, name: str, seconds: float, failed: bool) -> None:
+        series = self._operations.get(name)
+        if series is None:
+            series = self._operations.setdefault(name, _Series(sizes=0))
+        series.record(seconds, failed)
+
+    def report(self) -> dict[str, Any]:
+        routes = {}
+        for (method, route), series in sorted(self._routes.items()):
+            routes[f"{method} {route}"] = {
+                "requests": series.latency.count,
+                "statuses": {
+                    str(status): count
+                    for status, count in sorted(series.outcomes.items())
+                },
+                "latency_ms": series.latency.summary(scale=1000),
+                "request_bytes": series.sizes[0].summary(),
+                "response_bytes": series.sizes[1].summary(),
+            }
+        operations = {}
+        for name, series in sorted(self._operations.items()):
+            operations[name] = {
+                "calls": series.latency.count,
+                "failures": series.outcomes.get(True, 0),
+                "latency_ms": series.latency.summary(scale=1000),
+            }
+        return {"routes": routes, "repository": operations}
+
+    def publish(self) -> None:
+        """Write the metrics of the interval that just ended as EMF logs."""
+        from aws_lambda_powertools.metrics import MetricUnit
+
+        self._next_publish = time.monotonic() + self._emf_interval
+        metrics = self._emf_metrics
+        series = [
+            ("route", f"{method} {route}", route_series)
+            for (method, route), route_series in list(self._routes.items())
+        ] + [
+            ("operation", name, operation_series)
+            for name, operation_series in list(self._operations.items())
+        ]
+        for dimension, name, one_series in series:
+            latency, outcomes = one_series.take_interval()
+            if not latency.count:
+                continue
+            if dimension == "route":
+                errors = sum(n for status, n in outcomes.items() if status >= 500)
+            else:
+                errors = outcomes.get(True, 0)
+            metrics.add_dimension(name=dimension, value=name)
+            metrics.add_metric(name="Calls", unit=MetricUnit.Count, value=latency.count)
+            metrics.add_metric(name="Errors", unit=MetricUnit.Count, value=errors)
+            for stat, q in PERCENTILES.items():
+                metrics.add_metric(
+                    name=f"Latency{stat.upper()}",
+                    unit=MetricUnit.Milliseconds,
+                    value=latency.percentile(q) * 1000,
+                )
+            # Emitted per dimension, since Powertools applies dimensions to
+            # every metric of a flush
+            metrics.flush_metrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records every HTTP request in a `MetricsRecorder`.
+
+    Requests are grouped by method and route template, such as
+    `GET /items/{item_id}`, so ids do not create new series; requests that
+    match no route are grouped under `unmatched`. The response size is the
+    sum of the body chunks sent, and the request size is taken from the
+    Content-Length header.
+    """
+
+    def __init__(self, app, recorder: MetricsRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+
+        async def send_and_measure(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            else:
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            request_bytes = 0
+            for name, value in scope["headers"]:
+                if name == b"content-length" and value.isdigit():
+                    request_bytes = int(value)
+                    break
+            self.recorder.record_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                elapsed,
+                request_bytes,
+                response_bytes,
+            )
@@ -1,5 +1,33 @@
-from pydantic import BaseModel
+from typing import Any, List, Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+MAX_BATCH_SIZE = 1000
 
 
 class PostValue(BaseModel):
     value: str
+
+
+class BatchOperation(BaseModel):
+    op: Literal["insert", "update", "delete"]
+    id: str | None = None
+    value: str | None = None
+
+    @model_validator(mode="after")
+    def check_required_fields(self):
+        if self.op in ("update", "delete") and not self.id:
+            raise ValueError(f"'{self.op}' operations require an 'id'")
+        if self.op in ("insert", "update") and self.value is None:
+            raise ValueError(f"'{self.op}' operations require a 'value'")
+        return self
+
+
+class BatchRequest(BaseModel):
+    # Operations are validated one by one in the service, so that a single bad
+    # entry is reported on its own instead of rejecting the whole batch.
+    operations: List[Any] = Field(max_length=MAX_BATCH_SIZE)
+
+
+class GetManyRequest(BaseModel):
+    ids: List[str] = Field(max_length=MAX_BATCH_SIZE)
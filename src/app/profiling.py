@@ -0,0 +1,236 @@
+import cProfile
+import heapq
+import itertools
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Seconds between two samples of the thread stacks
+SAMPLE_INTERVAL = 0.005
+# Functions listed per request profile, by cumulative time
+TOP_FUNCTIONS = 30
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+    def __init__(self):
+        super().__init__("A profile is already being taken.")
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval.
+
+    The stacks are read with `sys._current_frames` from a thread of the
+    profiler's own, so the code being profiled is not changed or slowed down
+    beyond the sampler holding the GIL briefly every `interval` seconds.
+    Coroutines only show up while they run on the event loop; the time they
+    spend waiting for the repository shows up in the thread pool threads.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._labels: dict[Any, str] = {}
+
+    def profile(self, seconds: float) -> Counter:
+        """Sample for `seconds` and return how often each stack was seen.
+
+        Stacks are collapsed into one string per stack, starting with the
+        thread name and going from the outermost frame to the innermost,
+        separated by semicolons. This blocks the calling thread.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError()
+        try:
+            stacks: Counter = Counter()
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident != own_thread:
+                        name = names.get(ident, str(ident))
+                        stacks[self._collapse(name, frame)] += 1
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        labels = self._labels
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                module = "/".join(code.co_filename.split("/")[-2:])
+                # co_qualname is new in Python 3.11
+                name = getattr(code, "co_qualname", code.co_name)
+                label = labels[code] = f"{name} ({module})"
+            frames.append(label)
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+
+def collapsed_text(stacks: Counter) -> str:
+    """Format stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def flamegraph_tree(stacks: Counter) -> dict[str, Any]:
+    """Nest stacks into the `{name, value, children}` tree of d3-flame-graph."""
+    root: dict[str, Any] = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["value"] += count
+        for name in stack.split(";"):
+            children = node["children"]
+            node = children.get(name)
+            if node is None:
+                node = children[name] = {"name": name, "value": 0, "children": {}}
+            node["value"] += count
+
+    def to_lists(node):
+        children = sorted(node["children"].values(), key=lambda c: -c["value"])
+        return {**node, "children": [to_lists(child) for child in children]}
+
+    return to_lists(root)
+
+
+@dataclass(order=True)
+class RequestProfile:
+    """cProfile results of one request."""
+
+    seconds: float
+    method: str = field(compare=False)
+    path: str = field(compare=False)
+    status: int = field(compare=False)
+    started_at: float = field(compare=False)
+    stats: pstats.Stats = field(compare=False, repr=False)
+
+    def report(self, limit: int = TOP_FUNCTIONS) -> dict[str, Any]:
+        functions = sorted(
+            self.stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.seconds * 1000,
+            "started_at": self.started_at,
+            "functions": [
+                {
+                    "function": f"{name} ({filename}:{line})",
+                    "calls": calls,
+                    "own_ms": own * 1000,
+                    "cumulative_ms": cumulative * 1000,
+                }
+                for (filename, line, name), (_, calls, own, cumulative, _) in (
+                    functions[:limit]
+                )
+            ],
+        }
+
+
+class RequestProfiler:
+    """Profiles one in `sample_rate` requests and keeps the `keep` slowest.
+
+    cProfile traces the event loop thread, so a profile also holds whatever
+    other requests ran on the loop while the sampled one was waiting. Only
+    one request is profiled at a time; a request due for sampling while
+    another is being profiled is skipped.
+    """
+
+    def __init__(self, sample_rate: int, keep: int):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._requests = itertools.count()
+        self._active = False
+        self._lock = threading.Lock()
+        # Min-heap, so the fastest kept profile is the one replaced
+        self._slowest: list[RequestProfile] = []
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Return a running profile when this request is sampled, else None."""
+        if next(self._requests) % self.sample_rate or self._active:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already running in this interpreter
+            self._active = False
+            return None
+        return profile
+
+    def finish(
+        self,
+        profile: cProfile.Profile,
+        method: str,
+        path: str,
+        status: int,
+        seconds: float,
+        started_at: float,
+    ) -> None:
+        profile.disable()
+        self._active = False
+        slowest = self._slowest
+        if len(slowest) >= self.keep and seconds <= slowest[0].seconds:
+            return
+        entry = RequestProfile(
+            seconds, method, path, status, started_at, pstats.Stats(profile)
+        )
+        with self._lock:
+            if len(slowest) < self.keep:
+                heapq.heappush(slowest, entry)
+            else:
+                heapq.heappushpop(slowest, entry)
+
+    def slowest(self) -> list[RequestProfile]:
+        with self._lock:
+            return sorted(self._slowest, reverse=True)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that runs the requests sampled by a `RequestProfiler`."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profile = self.profiler.start() if scope["type"] == "http" else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+        started_at = time.time()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            self.profiler.finish(
+                profile,
+                scope["method"],
+                scope["path"],
+                status,
+                time.perf_counter() - started,
+                started_at,
+            )
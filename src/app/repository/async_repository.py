@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional, Tuple
+
+from .base_repository import (
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+    partial_batch_error,
+)
+
+
+class AsyncBaseRepository(ABC):
+    """Asynchronous counterpart of `BaseRepository`.
+
+    Implementations must not block the event loop: either use an async driver
+    or hand blocking work off to a thread pool.
+    """
+
+    @abstractmethod
+    async def get_by_id(self, key) -> dict[str, str]:
+        """Retrieve an item by its key."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def add_item(self, value: str) -> str:
+        """Add a new item to the repository."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def update(self, key: str, value: str) -> None:
+        """Set an item with a key and value."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete an item by its key."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    async def add_items(self, values: List[str]) -> List[str]:
+        """Add several items and return their keys, in the same order.
+
+        Raises DBPartialBatchError when it fails after adding some of them.
+        """
+        keys: List[str] = []
+        try:
+            for value in values:
+                keys.append(await self.add_item(value))
+        except Exception as e:
+            raise partial_batch_error(keys, len(values), e) from e
+        return keys
+
+    async def get_many(self, keys: List[str]) -> dict[str, str]:
+        """Retrieve several items by key. Keys that do not exist are left out."""
+        results = {}
+        for key in keys:
+            try:
+                results.update(await self.get_by_id(key))
+            except DBItemNotFoundError:
+                continue
+        return results
+
+    async def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        """Set several (key, value) pairs.
+
+        Returns one flag per pair telling whether the key existed. Raises
+        DBPartialBatchError when it fails after applying some of them.
+        """
+        results: List[bool] = []
+        try:
+            for key, value in items:
+                try:
+                    await self.update(key, value)
+                    results.append(True)
+                except DBItemNotFoundError:
+                    results.append(False)
+        except Exception as e:
+            raise partial_batch_error(results, len(items), e) from e
+        return results
+
+    async def delete_many(self, keys: List[str]) -> List[bool]:
+        """Delete several items by key.
+
+        Returns one flag per key telling whether the key existed. Raises
+        DBPartialBatchError when it fails after deleting some of them.
+        """
+        results: List[bool] = []
+        try:
+            for key in keys:
+                try:
+                    await self.delete(key)
+                    results.append(True)
+                except DBItemNotFoundError:
+                    results.append(False)
+        except Exception as e:
+            raise partial_batch_error(results, len(keys), e) from e
+        return results
+
+    async def update_if(self, key: str, expected: str, value: str) -> None:
+        """Set `key` to `value` only while it still holds `expected`.
+
+        Raises DBPreconditionFailedError when it holds something else.
+        """
+        if (await self.get_by_id(key))[key] != expected:
+            raise DBPreconditionFailedError(key)
+        await self.update(key, value)
+
+    async def delete_if(self, key: str, expected: str) -> None:
+        """Delete `key` only while it still holds `expected`.
+
+        Raises DBPreconditionFailedError when it holds something else.
+        """
+        if (await self.get_by_id(key))[key] != expected:
+            raise DBPreconditionFailedError(key)
+        await self.delete(key)
+
+    @abstractmethod
+    async def list(self) -> List[dict[str, str]]:
+        """List all items."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        """Get up to `limit` items in insertion order, starting after `cursor`."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    async def iter_items(self, batch_size: int = 1000) -> AsyncIterator[dict[str, str]]:
+        """Iterate over all items in insertion order, one page at a time."""
+        items, cursor = await self.page(batch_size)
+        for item in items:
+            yield item
+        while cursor is not None:
+            items, cursor = await self.page(batch_size, cursor)
+            for item in items:
+                yield item
+
+    @abstractmethod
+    async def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        """Get the top N elements of the list, skipping the first `offset`."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        """Get the bottom N elements of the list, skipping the last `offset`."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Count the number of items in the repository."""
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    def version(self) -> int:
+        """Return a number that increases with every write to the repository.
+
+        Unlike the other methods this one is synchronous: it must be cheap and
+        must not block, so it can be checked on every request.
+        """
+        raise NotImplementedError("This method should be overridden in a subclass.")
@@ -1,5 +1,7 @@
+import base64
+import binascii
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 
 class DBError(Exception):
@@ -59,7 +61,66 @@ class DBFailedToCountItemsError(DBError):
         self.message = message
 
 
+class DBPreconditionFailedError(DBError):
+    """Exception raised when a conditional write finds an unexpected value."""
+
+    def __init__(self, key):
+        super().__init__(f"Item with key '{key}' does not hold the expected value.")
+        self.key = key
+
+
+class DBInvalidCursorError(DBError):
+    """Exception raised when a pagination cursor cannot be decoded."""
+
+    def __init__(self, cursor):
+        super().__init__(f"Invalid cursor '{cursor}'.")
+        self.cursor = cursor
+
+
+class DBPartialBatchError(DBError):
+    """Exception raised when a bulk write fails after applying part of its entries.
+
+    `outcomes` has one element per entry, in order: what the call would have
+    returned for the entry (its key or found flag) if it was applied, or None
+    if it was not.
+    """
+
+    def __init__(self, message, outcomes: List):
+        super().__init__(message)
+        self.outcomes = outcomes
+
+
+def partial_batch_error(
+    applied: List, size: int, error: Exception
+) -> DBPartialBatchError:
+    """Build the error of a bulk write that applied only its first entries."""
+    return DBPartialBatchError(
+        f"Bulk write failed after {len(applied)} of {size} entries: {error}",
+        applied + [None] * (size - len(applied)),
+    )
+
+
+def encode_cursor(seq: int) -> str:
+    """Encode an insertion sequence number into an opaque cursor."""
+    return base64.urlsafe_b64encode(f"s:{seq}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by `encode_cursor` back into a sequence number."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, seq = base64.urlsafe_b64decode(padded).decode().split(":")
+        if prefix != "s" or int(seq) < 0:
+            raise ValueError(cursor)
+        return int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise DBInvalidCursorError(cursor) from e
+
+
 class BaseRepository(ABC):
+    # Whether the repository may be called from several threads at once
+    thread_safe: bool = False
+
     @abstractmethod
     def get_by_id(self, key) -> dict[str, str]:
         """Retrieve an item by its key."""
@@ -80,22 +141,142 @@ class BaseRepository(ABC):
         """Delete an item by its key."""
         raise NotImplementedError("This method should be overridden in a subclass.")
 
+    def add_items(self, values: List[str]) -> List[str]:
+        """Add several items and return their keys, in the same order.
+
+        Raises DBPartialBatchError when it fails after adding some of them.
+        """
+        keys: List[str] = []
+        try:
+            for value in values:
+                keys.append(self.add_item(value))
+        except Exception as e:
+            raise partial_batch_error(keys, len(values), e) from e
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        """Append (key, value) pairs under keys chosen by the caller, in order.
+
+        Used to move items between repositories without changing their ids.
+        The keys must not be in use yet.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot import items.")
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        """Retrieve several items by key. Keys that do not exist are left out."""
+        results = {}
+        for key in keys:
+            try:
+                results.update(self.get_by_id(key))
+            except DBItemNotFoundError:
+                continue
+        return results
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        """Set several (key, value) pairs.
+
+        Returns one flag per pair telling whether the key existed. Raises
+        DBPartialBatchError when it fails after applying some of them.
+        """
+        results: List[bool] = []
+        try:
+            for key, value in items:
+                try:
+                    self.update(key, value)
+                    results.append(True)
+                except DBItemNotFoundError:
+                    results.append(False)
+        except Exception as e:
+            raise partial_batch_error(results, len(items), e) from e
+        return results
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        """Delete several items by key.
+
+        Returns one flag per key telling whether the key existed. Raises
+        DBPartialBatchError when it fails after deleting some of them.
+        """
+        results: List[bool] = []
+        try:
+            for key in keys:
+                try:
+                    self.delete(key)
+                    results.append(True)
+                except DBItemNotFoundError:
+                    results.append(False)
+        except Exception as e:
+            raise partial_batch_error(results, len(keys), e) from e
+        return results
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        """Set `key` to `value` only while it still holds `expected`.
+
+        Raises DBPreconditionFailedError when it holds something else. This
+        default checks and writes in two steps; thread safe repositories
+        override it to make the pair atomic.
+        """
+        if self.get_by_id(key)[key] != expected:
+            raise DBPreconditionFailedError(key)
+        self.update(key, value)
+
+    def delete_if(self, key: str, expected: str) -> None:
+        """Delete `key` only while it still holds `expected`.
+
+        Raises DBPreconditionFailedError when it holds something else.
+        """
+        if self.get_by_id(key)[key] != expected:
+            raise DBPreconditionFailedError(key)
+        self.delete(key)
+
     @abstractmethod
     def list(self) -> List[dict[str, str]]:
         """List all items."""
         raise NotImplementedError("This method should be overridden in a subclass.")
 
     @abstractmethod
-    def head(self, n: int) -> List[dict[str, str]]:
-        """Get the top N elements of the list."""
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        """Get up to `limit` items in insertion order, starting after `cursor`.
+
+        Returns the page and the cursor for the next page, or None when there
+        are no more items.
+        """
+        raise NotImplementedError("This method should be overridden in a subclass.")
+
+    def iter_items(self, batch_size: int = 1000) -> Iterator[dict[str, str]]:
+        """Iterate over all items in insertion order.
+
+        Items are fetched one page at a time, so only `batch_size` items are
+        held in memory at once.
+        """
+        items, cursor = self.page(batch_size)
+        yield from items
+        while cursor is not None:
+            items, cursor = self.page(batch_size, cursor)
+            yield from items
+
+    @abstractmethod
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        """Get the top N elements of the list, skipping the first `offset`."""
         raise NotImplementedError("This method should be overridden in a subclass.")
 
     @abstractmethod
-    def tail(self, n: int) -> List[dict[str, str]]:
-        """Get the bottom N elements of the list."""
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        """Get the bottom N elements of the list, skipping the last `offset`."""
         raise NotImplementedError("This method should be overridden in a subclass.")
 
     @abstractmethod
     def count(self) -> int:
         """Count the number of items in the repository."""
         raise NotImplementedError("This method should be overridden in a subclass.")
+
+    @abstractmethod
+    def version(self) -> int:
+        """Return a number that increases with every write to the repository.
+
+        Reading it must be cheap and must not block, so that callers can check
+        it on every request to tell whether cached results are still current.
+        A successful write of a single item increases it by exactly one.
+        """
+        raise NotImplementedError("This method should be overridden in a subclass.")
@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from .base_repository import BaseRepository
+
+_MISSING = object()
+
+T = TypeVar("T")
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with an optional time to live.
+
+    Not thread safe on its own; `CachingRepository` guards it with a lock.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than zero")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        # key -> (expiry time or None, value)
+        self._entries: OrderedDict[Hashable, Tuple[Optional[float], Any]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CachingRepository(BaseRepository):
+    """Decorator that caches `get_by_id`, `head` and `tail` of another repository.
+
+    Single items and head/tail windows are kept in separate LRU caches. Every
+    write evicts the items it touches and drops all cached windows, since any
+    insert, update or delete can change them. A read that raced with a write
+    is returned to its caller but not stored, so the cache never holds a value
+    older than the last write made through this process.
+
+    Writes made elsewhere, such as by other worker processes sharing the
+    backend, are caught by comparing the version of the wrapped repository
+    before every cached read: when it moved, both caches are dropped. A
+    single item write made through this cache records the version it left
+    behind, so that it only evicts its own item.
+
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.repository = repository
+        self.thread_safe = repository.thread_safe
+        self._items = LRUCache(max_size, ttl, clock)
+        self._windows = LRUCache(max_size, ttl, clock)
+        self._lock = threading.Lock()
+        # Bumped by every write, so reads that overlapped one are not cached
+        self._generation = 0
+        # Version of the wrapped repository the cached results belong to
+        self._version: Optional[int] = None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Hit, miss and eviction counters summed over both caches."""
+        with self._lock:
+            caches = (self._items, self._windows)
+            return {
+                "hits": sum(c.hits for c in caches),
+                "misses": sum(c.misses for c in caches),
+                "evictions": sum(c.evictions for c in caches),
+                "size": sum(len(c) for c in caches),
+            }
+
+    def _cached(self, cache: LRUCache, key: Hashable, load: Callable[[], Any]) -> Any:
+        version = self.repository.version()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._generation += 1
+                self._items.clear()
+                self._windows.clear()
+            value = cache.get(key, _MISSING)
+            generation = self._generation
+        if value is not _MISSING:
+            return value
+        value = load()
+        with self._lock:
+            if generation == self._generation:
+                cache.put(key, value)
+        return value
+
+    def _write(
+        self, write: Callable[[], T], keys: Iterable[str] = (), single: bool = False
+    ) -> T:
+        """Run a write of `keys` through to the repository and evict them.
+
+        A successful `single` item write moves the version by one, so when it
+        moved by exactly one the cached results of other keys are still valid.
+        """
+        version = self.repository.version()
+        try:
+            result = write()
+        except BaseException:
+            self._invalidate(keys)
+            raise
+        self._invalidate(keys, version if single else None)
+        return result
+
+    def _invalidate(self, keys: Iterable[str], version: Optional[int] = None) -> None:
+        after = self.repository.version() if version is not None else None
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._items.pop(key)
+            self._windows.clear()
+            # Any other change, such as a write by another worker that landed
+            # in between, leaves the version for the next read to catch
+            if version is not None and version == self._version == after - 1:
+                self._version = after
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        return self._cached(
+            self._items, key, lambda: self.repository.get_by_id(key)
+        ).copy()
+
+    def add_item(self, value: str) -> str:
+        return self._write(lambda: self.repository.add_item(value), single=True)
+
+    def add_items(self, values: List[str]) -> List[str]:
+        return self._write(lambda: self.repository.add_items(values))
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        self._write(
+            lambda: self.repository.import_items(items), [key for key, _ in items]
+        )
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        return self.repository.get_many(keys)
+
+    def update(self, key: str, value: str) -> None:
+        self._write(lambda: self.repository.update(key, value), [key], single=True)
+
+    def update_many(self, updates: List[Tuple[str, str]]) -> List[bool]:
+        return self._write(
+            lambda: self.repository.update_many(updates), [key for key, _ in updates]
+        )
+
+    def delete(self, key: str) -> None:
+        self._write(lambda: self.repository.delete(key), [key], single=True)
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        return self._write(lambda: self.repository.delete_many(keys), keys)
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        self._write(
+            lambda: self.repository.update_if(key, expected, value), [key], single=True
+        )
+
+    def delete_if(self, key: str, expected: str) -> None:
+        self._write(
+            lambda: self.repository.delete_if(key, expected), [key], single=True
+        )
+
+    def list(self) -> List[dict[str, str]]:
+        return self.repository.list()
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        return self.repository.page(limit, cursor)
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self._cached(
+            self._windows,
+            ("head", n, offset),
+            lambda: self.repository.head(n, offset),
+        )
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self._cached(
+            self._windows,
+            ("tail", n, offset),
+            lambda: self.repository.tail(n, offset),
+        )
+
+    def count(self) -> int:
+        return self.repository.count()
+
+    def version(self) -> int:
+        return self.repository.version()
@@ -0,0 +1,123 @@
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from app.change_feed import ChangeFeed
+
+from .base_repository import BaseRepository, DBPartialBatchError
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class ChangeFeedRepository(BaseRepository):
+    """Decorator that publishes every write of another repository to a ChangeFeed.
+
+    Each write and its publication happen under one lock, so the feed lists
+    changes in the order they were applied, even with a thread safe backend.
+    A bulk write that fails partway still publishes the entries it applied.
+    Reads are passed straight through.
+    """
+
+    def __init__(self, repository: BaseRepository, feed: ChangeFeed):
+        self.repository = repository
+        self.feed = feed
+        self.thread_safe = repository.thread_safe
+        self._write_lock = threading.Lock()
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        return self.repository.get_by_id(key)
+
+    def add_item(self, value: str) -> str:
+        with self._write_lock:
+            key = self.repository.add_item(value)
+            self.feed.publish([(INSERT, key, value)])
+        return key
+
+    def _publish(self, op: str, entries: Iterable, applied: Iterable) -> None:
+        """Publish the (key, value) entries whose outcome says they were applied."""
+        self.feed.publish(
+            (op, key, value) for (key, value), ok in zip(entries, applied) if ok
+        )
+
+    def add_items(self, values: List[str]) -> List[str]:
+        with self._write_lock:
+            try:
+                keys = self.repository.add_items(values)
+            except DBPartialBatchError as e:
+                self._publish(INSERT, zip(e.outcomes, values), e.outcomes)
+                raise
+            self._publish(INSERT, zip(keys, values), keys)
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        with self._write_lock:
+            try:
+                self.repository.import_items(items)
+            except DBPartialBatchError as e:
+                self._publish(INSERT, items, e.outcomes)
+                raise
+            self.feed.publish((INSERT, key, value) for key, value in items)
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        return self.repository.get_many(keys)
+
+    def update(self, key: str, value: str) -> None:
+        with self._write_lock:
+            self.repository.update(key, value)
+            self.feed.publish([(UPDATE, key, value)])
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        with self._write_lock:
+            try:
+                found = self.repository.update_many(items)
+            except DBPartialBatchError as e:
+                self._publish(UPDATE, items, e.outcomes)
+                raise
+            self._publish(UPDATE, items, found)
+        return found
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        with self._write_lock:
+            self.repository.update_if(key, expected, value)
+            self.feed.publish([(UPDATE, key, value)])
+
+    def delete(self, key: str) -> None:
+        with self._write_lock:
+            self.repository.delete(key)
+            self.feed.publish([(DELETE, key, None)])
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        with self._write_lock:
+            try:
+                found = self.repository.delete_many(keys)
+            except DBPartialBatchError as e:
+                self._publish(DELETE, ((key, None) for key in keys), e.outcomes)
+                raise
+            self._publish(DELETE, ((key, None) for key in keys), found)
+        return found
+
+    def delete_if(self, key: str, expected: str) -> None:
+        with self._write_lock:
+            self.repository.delete_if(key, expected)
+            self.feed.publish([(DELETE, key, None)])
+
+    def list(self) -> List[dict[str, str]]:
+        return self.repository.list()
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        return self.repository.page(limit, cursor)
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self.repository.head(n, offset)
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self.repository.tail(n, offset)
+
+    def count(self) -> int:
+        return self.repository.count()
+
+    def version(self) -> int:
+        return self.repository.version()
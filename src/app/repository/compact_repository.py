@@ -0,0 +1,362 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from .base_repository import (
+    BaseRepository,
+    DBFailedToAddItemError,
+    DBFailedtoListItemsError,
+    DBFailedToUpdateItemError,
+    DBItemNotFoundError,
+    decode_cursor,
+    encode_cursor,
+    partial_batch_error,
+)
+from .fenwick import FenwickTree
+from .ids import IdGenerator, UUID7Generator
+
+ID_SIZE = 16
+DELETED = 0xFFFFFFFF
+MIN_TABLE_SIZE = 1024
+
+
+def encode_id(key: str) -> Optional[bytes]:
+    """Convert a canonical UUID string to its 16 bytes, or None if it is not one."""
+    if len(key) != 36 or key[8] != "-" or key[13] != "-" or key[18] != "-":
+        return None
+    try:
+        return bytes.fromhex(key.replace("-", ""))
+    except ValueError:
+        return None
+
+
+def decode_id(raw) -> str:
+    """Convert 16 id bytes back to the canonical UUID string."""
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class CompactInMemoryRepository(BaseRepository):
+    """Memory-efficient in-memory repository.
+
+    Items live in insertion-ordered slots spread over a few flat arrays instead
+    of per-item Python objects:
+
+    - `_ids`: the 16 raw bytes of each UUID, packed back to back
+    - `_arena`: every value encoded as UTF-8 in one contiguous buffer, located
+      through the `_offsets` and `_lengths` arrays
+    - `_seqs`: the insertion sequence number of each slot, used for cursors
+    - `_table`: an open-addressing hash table with linear probing that maps an
+      id to its slot (stored as slot + 1, with 0 marking an empty bucket)
+    - `_live_slots`: a Fenwick tree counting live slots, built once slots have
+      been deleted, so offset windows skip tombstones in O(log n)
+
+    Deleting an item marks its slot with a DELETED length. Overwritten values
+    and deleted slots are reclaimed once they make up more than half the space.
+
+    Ids must be UUIDs, so only generators with `uuid_format` can be used.
+    """
+
+    def __init__(self, id_generator: Optional[IdGenerator] = None):
+        id_generator = id_generator or UUID7Generator()
+        if not id_generator.uuid_format:
+            raise ValueError(f"{type(self).__name__} can only store UUID ids")
+        self._new_raw_id = id_generator.new_bytes
+        self._ids = bytearray()
+        self._arena = bytearray()
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._seqs = array("Q")
+        self._table = array("q", bytes(8 * MIN_TABLE_SIZE))
+        self._mask = MIN_TABLE_SIZE - 1
+        self._live_slots: Optional[FenwickTree] = None
+        self._last_seq = 0
+        self._live = 0
+        self._garbage = 0
+        self._version = 0
+
+    # Slots and hash table
+
+    def _key_at(self, slot: int) -> bytearray:
+        start = slot * ID_SIZE
+        end = start + ID_SIZE
+        return self._ids[start:end]
+
+    def _value_at(self, slot: int) -> str:
+        start = self._offsets[slot]
+        end = start + self._lengths[slot]
+        return self._arena[start:end].decode()
+
+    def _find(self, raw: bytes) -> int:
+        """Return the slot holding `raw`, or -1."""
+        table = self._table
+        mask = self._mask
+        bucket = hash(raw) & mask
+        while True:
+            entry = table[bucket]
+            if entry == 0:
+                return -1
+            if self._key_at(entry - 1) == raw:
+                return entry - 1
+            bucket = (bucket + 1) & mask
+
+    def _live_slot(self, key: str) -> int:
+        raw = encode_id(key)
+        slot = self._find(raw) if raw is not None else -1
+        if slot < 0 or self._lengths[slot] == DELETED:
+            raise DBItemNotFoundError(key)
+        return slot
+
+    def _insert_into_table(self, raw: bytes, slot: int) -> None:
+        table = self._table
+        mask = self._mask
+        bucket = hash(raw) & mask
+        while table[bucket] != 0:
+            bucket = (bucket + 1) & mask
+        table[bucket] = slot + 1
+
+    def _rebuild_table(self, size: int) -> None:
+        self._table = array("q", bytes(8 * size))
+        self._mask = size - 1
+        for slot in range(len(self._seqs)):
+            self._insert_into_table(bytes(self._key_at(slot)), slot)
+
+    def _append(self, raw: bytes, value: str) -> None:
+        encoded = value.encode()
+        slot = len(self._seqs)
+        # Keep the table at most half full
+        if 2 * (slot + 1) > len(self._table):
+            self._rebuild_table(2 * len(self._table))
+        self._last_seq += 1
+        self._ids += raw
+        self._offsets.append(len(self._arena))
+        self._lengths.append(len(encoded))
+        self._seqs.append(self._last_seq)
+        self._arena += encoded
+        self._insert_into_table(raw, slot)
+        if self._live_slots is not None:
+            self._live_slots.append(1)
+        self._live += 1
+        self._version += 1
+
+    def _reclaim(self) -> None:
+        """Drop deleted slots and overwritten values once they waste too much."""
+        deleted = len(self._seqs) - self._live
+        if deleted > 1024 and deleted > self._live:
+            self._compact_slots()
+        elif self._garbage > 1024 * 1024 and 2 * self._garbage > len(self._arena):
+            self._compact_arena()
+
+    def _compact_slots(self) -> None:
+        ids, arena = bytearray(), bytearray()
+        offsets, lengths, seqs = array("Q"), array("I"), array("Q")
+        for slot in range(len(self._seqs)):
+            length = self._lengths[slot]
+            if length == DELETED:
+                continue
+            start = self._offsets[slot]
+            end = start + length
+            ids += self._key_at(slot)
+            offsets.append(len(arena))
+            lengths.append(length)
+            seqs.append(self._seqs[slot])
+            arena += self._arena[start:end]
+        self._ids, self._arena = ids, arena
+        self._offsets, self._lengths, self._seqs = offsets, lengths, seqs
+        self._live_slots = None
+        self._garbage = 0
+        size = MIN_TABLE_SIZE
+        while size < 2 * len(seqs):
+            size *= 2
+        self._rebuild_table(size)
+
+    def _compact_arena(self) -> None:
+        arena = bytearray()
+        for slot in range(len(self._seqs)):
+            length = self._lengths[slot]
+            if length == DELETED:
+                continue
+            start = self._offsets[slot]
+            end = start + length
+            self._offsets[slot] = len(arena)
+            arena += self._arena[start:end]
+        self._arena = arena
+        self._garbage = 0
+
+    def _items_from(self, slots) -> List[dict[str, str]]:
+        return [
+            {"id": decode_id(self._key_at(slot)), "value": self._value_at(slot)}
+            for slot in slots
+        ]
+
+    def _slot_of(self, rank: int) -> int:
+        """Return the slot of the live item at position `rank`, or len(slots)."""
+        if rank >= self._live:
+            return len(self._seqs)
+        if self._live == len(self._seqs):
+            return rank
+        return self._live_index().find(rank)
+
+    def _live_index(self) -> FenwickTree:
+        if self._live_slots is None:
+            lengths = self._lengths
+            self._live_slots = FenwickTree(
+                (int(length != DELETED) for length in lengths), typecode="i"
+            )
+        return self._live_slots
+
+    def _window(self, offset: int, limit: int) -> List[int]:
+        slots: List[int] = []
+        rank = offset
+        slot = self._slot_of(rank)
+        lengths = self._lengths
+        while len(slots) < limit and slot < len(lengths):
+            if lengths[slot] == DELETED:
+                # Jump over a run of deleted slots straight to the next live one
+                slot = self._slot_of(rank)
+                continue
+            slots.append(slot)
+            rank += 1
+            slot += 1
+        return slots
+
+    def _window_from_end(self, offset: int, limit: int) -> List[int]:
+        slots: List[int] = []
+        rank = self._live - 1 - offset
+        if rank < 0:
+            return slots
+        slot = self._slot_of(rank)
+        lengths = self._lengths
+        while len(slots) < limit and rank >= 0:
+            if lengths[slot] == DELETED:
+                slot = self._slot_of(rank)
+                continue
+            slots.append(slot)
+            rank -= 1
+            slot -= 1
+        return slots
+
+    def _live_slots_after(self, slot: int, limit: int) -> List[int]:
+        """Return up to `limit` live slots from `slot` on."""
+        if self._live == len(self._seqs):
+            end = min(slot + limit, len(self._seqs))
+            return list(range(slot, end))
+        # Start from the rank of the first live slot, so deleted runs are jumped
+        return self._window(self._live_index().prefix_sum(slot), limit)
+
+    # BaseRepository
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        return {key: self._value_at(self._live_slot(key))}
+
+    def add_item(self, value: str) -> str:
+        raw = self._new_raw_id()
+        try:
+            self._append(raw, value)
+        except Exception as e:
+            raise DBFailedToAddItemError(value) from e
+        return decode_id(raw)
+
+    def add_items(self, values: List[str]) -> List[str]:
+        new_raw_id = self._new_raw_id
+        raws = [new_raw_id() for _ in values]
+        keys = [decode_id(raw) for raw in raws]
+        self._append_all(raws, list(zip(keys, values)))
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        # Checked up front, so a rejected batch adds nothing
+        raws = []
+        reused = False
+        try:
+            for key, _ in items:
+                raw = encode_id(key)
+                if raw is None:
+                    raise ValueError(f"Key '{key}' is not a UUID")
+                slot = self._find(raw)
+                if slot >= 0:
+                    if self._lengths[slot] != DELETED:
+                        raise ValueError(f"Key '{key}' is already in use")
+                    reused = True
+                raws.append(raw)
+            if len(set(raws)) != len(raws):
+                raise ValueError("Keys are repeated")
+        except ValueError as e:
+            raise DBFailedToAddItemError(f"<batch of {len(items)}>") from e
+        if reused:
+            # The table still points at the deleted slots of these keys
+            self._compact_slots()
+        self._append_all(raws, items)
+
+    def _append_all(self, raws: List[bytes], items: List[Tuple[str, str]]) -> None:
+        added: List[str] = []
+        try:
+            for raw, (key, value) in zip(raws, items):
+                self._append(raw, value)
+                added.append(key)
+        except Exception as e:
+            raise partial_batch_error(added, len(items), e) from e
+
+    def update(self, key: str, value: str) -> None:
+        slot = self._live_slot(key)
+        try:
+            encoded = value.encode()
+            self._garbage += self._lengths[slot]
+            self._offsets[slot] = len(self._arena)
+            self._lengths[slot] = len(encoded)
+            self._arena += encoded
+            self._version += 1
+            self._reclaim()
+        except Exception as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+
+    def delete(self, key: str) -> None:
+        slot = self._live_slot(key)
+        self._garbage += self._lengths[slot]
+        self._lengths[slot] = DELETED
+        if self._live_slots is not None:
+            self._live_slots.add(slot, -1)
+        self._live -= 1
+        self._version += 1
+        self._reclaim()
+
+    def list(self) -> List[dict[str, str]]:
+        try:
+            return self._items_from(self._live_slots_after(0, self._live))
+        except Exception as e:
+            raise DBFailedtoListItemsError(str(e)) from e
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        after_seq = decode_cursor(cursor) if cursor else 0
+        try:
+            # Fetch one extra slot to find out whether another page exists
+            slots = self._live_slots_after(
+                bisect_right(self._seqs, after_seq), limit + 1
+            )
+            results = self._items_from(slots[:limit])
+        except Exception as e:
+            raise DBFailedtoListItemsError("Page operation failed.") from e
+        next_cursor = (
+            encode_cursor(self._seqs[slots[limit - 1]]) if len(slots) > limit else None
+        )
+        return results, next_cursor
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            return self._items_from(self._window(offset, n))
+        except Exception as e:
+            raise DBFailedtoListItemsError("Head operation failed.") from e
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            return self._items_from(self._window_from_end(offset, n))
+        except Exception as e:
+            raise DBFailedtoListItemsError("Tail operation failed.") from e
+
+    def count(self) -> int:
+        return self._live
+
+    def version(self) -> int:
+        return self._version
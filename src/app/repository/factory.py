@@ -0,0 +1,86 @@
+import os
+from typing import Optional
+
+from app.change_feed import ChangeFeed
+from app.config import Settings
+
+from .base_repository import BaseRepository
+from .ids import IdGenerator, create_id_generator
+
+
+def create_repository(
+    settings: Settings, change_feed: Optional[ChangeFeed] = None
+) -> BaseRepository:
+    """Build the repository selected by `settings.repository_backend`.
+
+    With `settings.shard_count` above one, that many repositories of the
+    backend are built, each with its own files, and wrapped in a
+    `ShardedRepository`.
+
+    The unsharded `shared` backend publishes the writes of every worker
+    process to `change_feed`; other backends do not use it.
+
+    Backends are imported on demand so that unused ones cost nothing at startup.
+    """
+    id_generator = create_id_generator(settings.id_scheme, settings.snowflake_worker_id)
+    if settings.shard_count > 1:
+        from .sharded_repository import ShardedRepository
+
+        return ShardedRepository(
+            [
+                _create_backend(settings, id_generator, suffix=f"-{i}")
+                for i in range(settings.shard_count)
+            ],
+            max_workers=settings.repository_max_workers,
+            id_generator=id_generator,
+        )
+    return _create_backend(settings, id_generator, change_feed=change_feed)
+
+
+def _create_backend(
+    settings: Settings,
+    id_generator: IdGenerator,
+    suffix: str = "",
+    change_feed: Optional[ChangeFeed] = None,
+) -> BaseRepository:
+    """Build one repository, adding `suffix` to the paths of its files."""
+    if settings.repository_backend == "compact":
+        from .compact_repository import CompactInMemoryRepository
+
+        return CompactInMemoryRepository(id_generator)
+    if settings.repository_backend == "sqlite":
+        from .sqlite_repository import SqliteRepository
+
+        root, extension = os.path.splitext(settings.sqlite_path)
+        return SqliteRepository(root + suffix + extension, id_generator=id_generator)
+    if settings.repository_backend == "shared":
+        from .shared_memory_repository import SharedMemoryRepository
+
+        return SharedMemoryRepository(
+            settings.shared_memory_path + suffix,
+            size=settings.shared_memory_size,
+            id_generator=id_generator,
+            change_feed=change_feed,
+        )
+    if settings.repository_backend == "log":
+        from .log_structured_repository import LogStructuredRepository
+
+        return LogStructuredRepository(
+            settings.log_directory + suffix,
+            segment_size=settings.log_segment_size,
+            compaction_interval=settings.log_compaction_interval,
+            checkpoint_min_log=settings.log_checkpoint_min_log,
+            id_generator=id_generator,
+        )
+
+    from .in_memory_repository import InMemoryRepository
+
+    repository_class = InMemoryRepository
+    if settings.memory_thread_safe:
+        from .thread_safe_repository import ThreadSafeInMemoryRepository
+
+        repository_class = ThreadSafeInMemoryRepository
+    if not suffix and settings.snapshot_path and os.path.exists(settings.snapshot_path):
+        # Snapshots hold a single repository, so they are not used by shards
+        return repository_class.from_snapshot(settings.snapshot_path, id_generator)
+    return repository_class(id_generator=id_generator)
@@ -0,0 +1,77 @@
+from array import array
+from typing import Iterable, Optional
+
+
+class FenwickTree:
+    """Binary indexed tree over a growable sequence of small counts.
+
+    Used as an order-statistics index over insertion slots: each slot holds 1
+    while its item is live and 0 once it is deleted, so the position of the
+    k-th live item is found in O(log n) no matter how many tombstones precede
+    it. Pass an array `typecode` to store the tree compactly.
+    """
+
+    def __init__(self, values: Iterable[int] = (), typecode: Optional[str] = None):
+        self._typecode = typecode
+        self._build(values)
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def _build(self, values: Iterable[int]) -> None:
+        tree = [0]
+        tree.extend(values)
+        size = len(tree) - 1
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = array(self._typecode, tree) if self._typecode else tree
+
+    def rebuild(self, values: Iterable[int]) -> None:
+        """Replace the whole sequence in O(n)."""
+        self._build(values)
+
+    def append(self, value: int) -> None:
+        """Add a new element at the end of the sequence in O(log n)."""
+        i = len(self._tree)
+        # Node i covers the elements (i - lowbit(i), i]
+        covered = self.prefix_sum(i - 1) - self.prefix_sum(i - (i & -i))
+        self._tree.append(value + covered)
+
+    def add(self, index: int, delta: int) -> None:
+        """Add `delta` to the element at 0-based `index`."""
+        tree = self._tree
+        size = len(tree) - 1
+        i = index + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, count: int) -> int:
+        """Sum of the first `count` elements."""
+        tree = self._tree
+        total = 0
+        i = count
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k: int) -> int:
+        """Return the 0-based index of the element where the running sum exceeds `k`.
+
+        With 0/1 elements this is the position of the k-th (0-based) set element.
+        Returns len(self) if the total is not above `k`.
+        """
+        tree = self._tree
+        size = len(tree) - 1
+        pos = 0
+        step = 1 << size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= size and tree[nxt] <= k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos
@@ -0,0 +1,187 @@
+import base64
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+from uuid import uuid4
+
+# Crockford's base32 alphabet is in ASCII order, so encoded ids sort like the
+# numbers they encode. The translation maps the RFC 4648 alphabet onto it.
+_CROCKFORD = b"0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_FROM_RFC4648 = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", _CROCKFORD)
+
+
+def _base32(value: int, n_bytes: int, n_chars: int) -> str:
+    """Encode `value` as the last `n_chars` base32 digits of `n_bytes` bytes.
+
+    `n_bytes` must be a multiple of 5, so that base64.b32encode, which runs in
+    C, needs no padding and every digit covers whole bits.
+    """
+    encoded = base64.b32encode(value.to_bytes(n_bytes, "big"))
+    return encoded[-n_chars:].translate(_FROM_RFC4648).decode()
+
+
+def _uuid_string(value: int) -> str:
+    h = f"{value:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class IdGenerator(ABC):
+    """Makes the ids of new items.
+
+    `time_ordered` generators return ids that sort, as strings, in the order
+    they were generated, which lets backends order items by id. Generators
+    with `uuid_format` return canonical UUID strings and also provide their
+    16 bytes through `new_bytes`, for backends that store ids packed.
+    """
+
+    time_ordered = False
+    uuid_format = False
+
+    @abstractmethod
+    def __call__(self) -> str:
+        pass
+
+    def new_bytes(self) -> bytes:
+        raise NotImplementedError(f"{type(self).__name__} ids are not UUIDs.")
+
+
+class UUID4Generator(IdGenerator):
+    """Random UUIDv4 strings, the ids the service has always handed out."""
+
+    uuid_format = True
+
+    def __call__(self) -> str:
+        return str(uuid4())
+
+    def new_bytes(self) -> bytes:
+        return uuid4().bytes
+
+
+class _MonotonicClock:
+    """Milliseconds plus a counter that keep increasing within one generator.
+
+    When the clock has not moved since the last call, or has gone backwards,
+    the counter is incremented; when it reaches `limit` the millisecond is
+    advanced past the last one handed out instead.
+    """
+
+    def __init__(self, limit: int, clock: Callable[[], int] = time.time_ns):
+        self._limit = limit
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def next(self) -> tuple[int, int]:
+        now_ms = self._clock() // 1_000_000
+        with self._lock:
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._counter = 0
+            else:
+                self._counter += 1
+                if self._counter >= self._limit:
+                    self._last_ms += 1
+                    self._counter = 0
+            return self._last_ms, self._counter
+
+
+class UUID7Generator(IdGenerator):
+    """Generates UUIDv7 strings that sort in the order they were generated.
+
+    A UUIDv7 starts with a 48 bit Unix timestamp in milliseconds, so the
+    canonical strings sort by creation time. Within one millisecond the 12 bit
+    `rand_a` field is used as a counter (RFC 9562, section 6.2, method 1), and
+    when it overflows, or the clock goes backwards, the timestamp is advanced
+    past the last one handed out. Ids from one generator are therefore strictly
+    increasing, as strings as well as numbers.
+    """
+
+    time_ordered = True
+    uuid_format = True
+
+    def __init__(self, clock: Callable[[], int] = time.time_ns):
+        self._clock = _MonotonicClock(1 << 12, clock)
+
+    def _next(self) -> int:
+        ms, counter = self._clock.next()
+        rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+        return (ms << 80) | (0x7 << 76) | (counter << 64) | (0x2 << 62) | rand_b
+
+    def __call__(self) -> str:
+        return _uuid_string(self._next())
+
+    def new_bytes(self) -> bytes:
+        return self._next().to_bytes(16, "big")
+
+
+class ULIDGenerator(IdGenerator):
+    """Generates ULIDs: 26 character, time-sortable ids in Crockford base32.
+
+    A ULID holds the same 48 bit millisecond timestamp as a UUIDv7 followed by
+    80 bits of randomness, written as 26 characters instead of 36. Ids made
+    within one millisecond take a 16 bit counter in the top of the random part,
+    so they are strictly increasing like those of `UUID7Generator`.
+    """
+
+    time_ordered = True
+
+    def __init__(self, clock: Callable[[], int] = time.time_ns):
+        self._clock = _MonotonicClock(1 << 16, clock)
+
+    def __call__(self) -> str:
+        ms, counter = self._clock.next()
+        random = int.from_bytes(os.urandom(8), "big")
+        return _base32((ms << 80) | (counter << 64) | random, 20, 26)
+
+
+class SnowflakeGenerator(IdGenerator):
+    """Generates 13 character snowflake ids.
+
+    A snowflake id is a 63 bit number made of 41 bits of milliseconds since
+    `epoch_ms`, a 10 bit worker id and a 12 bit sequence number, here written
+    in Crockford base32. Ids carry no randomness, so processes that add items
+    to the same store need different worker ids; by default the worker id is
+    taken from the process id.
+    """
+
+    time_ordered = True
+    # 2024-01-01T00:00:00Z, which leaves room until 2093
+    EPOCH_MS = 1_704_067_200_000
+
+    def __init__(
+        self,
+        worker_id: Optional[int] = None,
+        epoch_ms: int = EPOCH_MS,
+        clock: Callable[[], int] = time.time_ns,
+    ):
+        if worker_id is None:
+            worker_id = os.getpid()
+        self.worker_id = worker_id & 0x3FF
+        self._epoch_ms = epoch_ms
+        self._clock = _MonotonicClock(1 << 12, clock)
+
+    def __call__(self) -> str:
+        ms, sequence = self._clock.next()
+        value = ((ms - self._epoch_ms) << 22) | (self.worker_id << 12) | sequence
+        return _base32(value, 10, 13)
+
+
+ID_SCHEMES = {
+    "uuid4": UUID4Generator,
+    "uuid7": UUID7Generator,
+    "ulid": ULIDGenerator,
+    "snowflake": SnowflakeGenerator,
+}
+
+
+def create_id_generator(scheme: str, worker_id: Optional[int] = None) -> IdGenerator:
+    """Build the generator of one of the `ID_SCHEMES`."""
+    if scheme == "snowflake":
+        return SnowflakeGenerator(worker_id)
+    try:
+        return ID_SCHEMES[scheme]()
+    except KeyError:
+        raise ValueError(f"Unknown id scheme '{scheme}'") from None
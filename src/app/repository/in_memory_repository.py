@@ -1,6 +1,5 @@
 import itertools
-from typing import List
-from uuid import uuid4
+from typing import List, Optional, Tuple
 
 from .base_repository import (
     BaseRepository,
@@ -10,12 +9,46 @@ from .base_repository import (
     DBFailedtoListItemsError,
     DBFailedToUpdateItemError,
     DBItemNotFoundError,
+    decode_cursor,
+    encode_cursor,
 )
+from .ids import IdGenerator, UUID7Generator
+from .insertion_order import InsertionOrder
+from .snapshot import dump_snapshot, load_snapshot
+
+# Rows kept for reuse by `head` and `tail`, enough for their hottest windows
+ROW_CACHE_SIZE = 4096
 
 
 class InMemoryRepository(BaseRepository):
-    def __init__(self, data: dict[str, str] = {}):
+    def __init__(
+        self, data: dict[str, str] = {}, id_generator: Optional[IdGenerator] = None
+    ):
         self._data: dict[str, str] = data or {}
+        self._new_id = id_generator or UUID7Generator()
+        self._order = InsertionOrder(self._data)
+        # `{"id", "value"}` rows handed out by `head` and `tail`, built once
+        # per value so that repeated reads of the same window pass the same
+        # dicts straight to the encoder. At most ROW_CACHE_SIZE are kept, the
+        # oldest dropped first. Rows are never mutated; a write drops the row
+        # of its key instead.
+        self._rows: dict[str, dict[str, str]] = {}
+        self._version = 0
+
+    @classmethod
+    def from_snapshot(
+        cls, path: str, id_generator: Optional[IdGenerator] = None
+    ) -> "InMemoryRepository":
+        """Create a repository from a snapshot written by `save_snapshot`.
+
+        Cursors handed out before the snapshot was taken are not preserved.
+        """
+        keys, values = load_snapshot(path)
+        return cls(dict(zip(keys, values)), id_generator)
+
+    def save_snapshot(self, path: str) -> None:
+        """Write the items to a binary snapshot file, keeping their order."""
+        dump_snapshot(path, list(self._data.items()))
 
     def get_by_id(self, key: str) -> dict[str, str]:
         """Retrieve an item by its key."""
@@ -26,19 +59,48 @@ class InMemoryRepository(BaseRepository):
         return {key: self._data[key]}
 
     def add_item(self, value: str) -> str:
-        key = str(uuid4())
+        key = self._new_id()
 
         try:
             self._data[key] = value
+            self._order.append(key)
+            self._version += 1
         except Exception as e:
             raise DBFailedToAddItemError(value) from e
         return key
 
+    def add_items(self, values: List[str]) -> List[str]:
+        new_id = self._new_id
+        keys = [new_id() for _ in values]
+        self.import_items(list(zip(keys, values)))
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        data = self._data
+        try:
+            # Checked up front, so a rejected batch adds nothing
+            keys = {key for key, _ in items}
+            if len(keys) != len(items) or not keys.isdisjoint(data):
+                raise ValueError("Keys are repeated or already in use")
+            for key, value in items:
+                data[key] = value
+                self._order.append(key)
+        except Exception as e:
+            raise DBFailedToAddItemError(f"<batch of {len(items)}>") from e
+        finally:
+            self._version += 1
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        data = self._data
+        return {key: data[key] for key in keys if key in data}
+
     def update(self, key, value):
         if key not in self._data:
             raise DBItemNotFoundError(key)
         try:
             self._data[key] = value
+            self._rows.pop(key, None)
+            self._version += 1
         except Exception as e:
             raise DBFailedToUpdateItemError(key, value) from e
 
@@ -47,36 +109,43 @@ class InMemoryRepository(BaseRepository):
             raise DBItemNotFoundError(key)
         try:
             del self._data[key]
+            self._rows.pop(key, None)
+            self._order.remove(key)
+            self._version += 1
         except Exception as e:
             raise DBFailedToDeleteItemError(key) from e
 
     def list(self):
         """List all items in the repository."""
+        # Built per call, since caching every row would double the memory
         return self.format_results(self._data)
 
-    def head(self, n: int):
-        _num_samples = n
-        if self.count() <= 0:
-            return []
-        elif self.count() <= n:
-            _num_samples = self.count()
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        """Get one page of items in insertion order, starting after `cursor`."""
+        after_seq = decode_cursor(cursor) if cursor else 0
+        try:
+            # Fetch one extra entry to find out whether another page exists
+            entries = self._order.after(after_seq, limit + 1)
+            data = self._data
+            results = [{"id": key, "value": data[key]} for _, key in entries[:limit]]
+        except Exception as e:
+            raise DBFailedtoListItemsError("Page operation failed.") from e
+        next_cursor = (
+            encode_cursor(entries[limit - 1][0]) if len(entries) > limit else None
+        )
+        return results, next_cursor
 
+    def head(self, n: int, offset: int = 0):
         try:
-            results = itertools.islice(self._data.items(), _num_samples)
-            return self.format_results(dict(results))
+            return self._rows_for(self._order.window(offset, n))
         except Exception as e:
             raise DBFailedtoListItemsError("Head operation failed.") from e
 
-    def tail(self, n: int):
-        _num_samples = n
-        if self.count() <= 0:
-            return []
-        elif self.count() <= n:
-            _num_samples = self.count()
-
+    def tail(self, n: int, offset: int = 0):
         try:
-            results = itertools.islice(reversed(self._data.items()), _num_samples)
-            return self.format_results(dict(results))
+            return self._rows_for(self._order.window_from_end(offset, n))
         except Exception as e:
             raise DBFailedtoListItemsError("Tail operation failed.") from e
 
@@ -86,9 +155,34 @@ class InMemoryRepository(BaseRepository):
         except Exception as e:
             raise DBFailedToCountItemsError("") from e
 
+    def version(self) -> int:
+        return self._version
+
+    def _rows_for(self, keys) -> List[dict[str, str]]:
+        """Return the row of each key, building the ones not seen since a write."""
+        rows = self._rows
+        data = self._data
+        if len(keys) > ROW_CACHE_SIZE:
+            # Too wide to cache without pushing out the hot windows
+            get = rows.get
+            return [get(key) or {"id": key, "value": data[key]} for key in keys]
+        results = list(map(rows.get, keys))
+        missing = results.count(None)
+        if missing:
+            # Only visit the gaps, so a write costs one row, not a full rebuild
+            keys = keys if isinstance(keys, list) else list(keys)
+            i = -1
+            for _ in range(missing):
+                i = results.index(None, i + 1)
+                key = keys[i]
+                results[i] = rows[key] = {"id": key, "value": data[key]}
+            # Dicts keep insertion order, so the first rows are the oldest
+            excess = len(rows) - ROW_CACHE_SIZE
+            if excess > 0:
+                for key in list(itertools.islice(rows, excess)):
+                    del rows[key]
+        return results
+
     def format_results(self, results: dict[str, str]) -> List[dict[str, str]]:
-        """Format the results into a list of dictionaries."""
-        formatted_results = []
-        for key, value in results.items():
-            formatted_results.append({"id": key, "value": value})
-        return formatted_results
+        """Format the results into the `{"id", "value"}` rows the API encodes."""
+        return [{"id": key, "value": value} for key, value in results.items()]
@@ -0,0 +1,161 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+from .fenwick import FenwickTree
+
+
+class InsertionOrder:
+    """Keeps track of the order in which keys were inserted.
+
+    Every key gets a monotonically increasing sequence number when it is
+    appended. Removed keys leave a tombstone behind, so positions (and therefore
+    cursors built from sequence numbers) stay valid while the collection changes.
+    Tombstones are compacted away once they outnumber the live keys.
+
+    Positional windows (the k-th live key from either end) are answered in
+    O(log n + k) through a Fenwick tree that counts live keys per slot, so large
+    offsets stay cheap even while many tombstones are waiting for compaction.
+    """
+
+    def __init__(self, keys=()):
+        self._keys: List[Optional[str]] = list(keys)
+        self._seqs: List[int] = list(range(1, len(self._keys) + 1))
+        # Built on first use, so that restoring a large collection stays cheap
+        self._seq_by_key: Optional[dict[str, int]] = None
+        # Only needed once there are tombstones; also built on first use
+        self._live_slots: Optional[FenwickTree] = None
+        self._last_seq = len(self._keys)
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._keys) - self._removed
+
+    @property
+    def last_seq(self) -> int:
+        """The highest sequence number handed out so far."""
+        return self._last_seq
+
+    def append(self, key: str, seq: Optional[int] = None) -> int:
+        """Append a key and return its sequence number.
+
+        An explicit `seq` can be given when restoring a previously saved order;
+        it must be higher than any sequence number seen so far.
+        """
+        if seq is None:
+            seq = self._last_seq + 1
+        elif seq <= self._last_seq:
+            raise ValueError(f"Sequence {seq} is not above {self._last_seq}")
+        self._last_seq = seq
+        self._keys.append(key)
+        self._seqs.append(seq)
+        if self._seq_by_key is not None:
+            self._seq_by_key[key] = seq
+        if self._live_slots is not None:
+            self._live_slots.append(1)
+        return seq
+
+    def seq_of(self, key: str) -> int:
+        """Return the sequence number a key was appended with."""
+        return self._index()[key]
+
+    def rank_of(self, key: str) -> int:
+        """Return the position of a key among the live keys, oldest first."""
+        slot = bisect_left(self._seqs, self._index()[key])
+        if not self._removed:
+            return slot
+        return self._live().prefix_sum(slot)
+
+    def remove(self, key: str) -> None:
+        """Remove a key, leaving a tombstone in its slot."""
+        seq = self._index().pop(key)
+        slot = bisect_left(self._seqs, seq)
+        self._keys[slot] = None
+        if self._live_slots is not None:
+            self._live_slots.add(slot, -1)
+        self._removed += 1
+        if self._removed > 1024 and self._removed > len(self):
+            self._compact()
+
+    def after(self, seq: int, limit: int) -> List[Tuple[int, str]]:
+        """Return up to `limit` (seq, key) pairs inserted after `seq`, oldest first."""
+        slot = bisect_right(self._seqs, seq)
+        if not self._removed:
+            end = slot + limit
+            return list(zip(self._seqs[slot:end], self._keys[slot:end]))
+        seqs, keys = self._seqs, self._keys
+        slots = self._live_slots_from(self._live().prefix_sum(slot), limit)
+        return [(seqs[slot], keys[slot]) for slot in slots]
+
+    def last(self, n: int) -> List[str]:
+        """Return up to `n` keys, newest first."""
+        return self.window_from_end(0, n)
+
+    def window(self, offset: int, limit: int) -> List[str]:
+        """Return up to `limit` keys, oldest first, skipping the first `offset`."""
+        if not self._removed:
+            end = offset + limit
+            return self._keys[offset:end]
+        keys = self._keys
+        return [keys[slot] for slot in self._live_slots_from(offset, limit)]
+
+    def window_from_end(self, offset: int, limit: int) -> List[str]:
+        """Return up to `limit` keys, newest first, skipping the newest `offset`."""
+        results: List[str] = []
+        rank = len(self) - 1 - offset
+        if rank < 0:
+            return results
+        if not self._removed:
+            stop = rank - limit
+            end = stop if stop >= 0 else None
+            return self._keys[rank:end:-1]
+        slot = self._slot_of(rank)
+        while len(results) < limit and rank >= 0:
+            key = self._keys[slot]
+            if key is None:
+                slot = self._slot_of(rank)
+                continue
+            results.append(key)
+            rank -= 1
+            slot -= 1
+        return results
+
+    def _live_slots_from(self, rank: int, limit: int) -> List[int]:
+        """Return the slots of up to `limit` live keys, from position `rank` on."""
+        slots: List[int] = []
+        slot = self._slot_of(rank)
+        while len(slots) < limit and slot < len(self._keys):
+            if self._keys[slot] is None:
+                # Jump over a run of tombstones straight to the next live key
+                slot = self._slot_of(rank)
+                continue
+            slots.append(slot)
+            rank += 1
+            slot += 1
+        return slots
+
+    def _slot_of(self, rank: int) -> int:
+        """Return the slot of the live key at position `rank`, or len(slots)."""
+        if rank >= len(self):
+            return len(self._keys)
+        if not self._removed:
+            return rank
+        return self._live().find(rank)
+
+    def _live(self) -> FenwickTree:
+        if self._live_slots is None:
+            self._live_slots = FenwickTree(int(k is not None) for k in self._keys)
+        return self._live_slots
+
+    def _index(self) -> dict[str, int]:
+        if self._seq_by_key is None:
+            self._seq_by_key = {
+                key: seq for seq, key in zip(self._seqs, self._keys) if key is not None
+            }
+        return self._seq_by_key
+
+    def _compact(self) -> None:
+        live = [(s, k) for s, k in zip(self._seqs, self._keys) if k is not None]
+        self._seqs = [s for s, _ in live]
+        self._keys = [k for _, k in live]
+        self._removed = 0
+        self._live_slots = None
@@ -0,0 +1,85 @@
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from .base_repository import BaseRepository
+
+
+class InstrumentedRepository(BaseRepository):
+    """Decorator that times every call to another repository.
+
+    Each call is reported to `record(operation, seconds, failed)`, where
+    `failed` tells whether it raised, which includes items that were not
+    found. Timing adds two clock reads and a function call per operation.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        record: Callable[[str, float, bool], None],
+    ):
+        self.repository = repository
+        self.thread_safe = repository.thread_safe
+        self._record = record
+
+    def _timed(self, operation: str, call: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = call(*args)
+            failed = False
+            return result
+        finally:
+            self._record(operation, time.perf_counter() - started, failed)
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        return self._timed("get_by_id", self.repository.get_by_id, key)
+
+    def add_item(self, value: str) -> str:
+        return self._timed("add_item", self.repository.add_item, value)
+
+    def add_items(self, values: List[str]) -> List[str]:
+        return self._timed("add_items", self.repository.add_items, values)
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        self._timed("import_items", self.repository.import_items, items)
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        return self._timed("get_many", self.repository.get_many, keys)
+
+    def update(self, key: str, value: str) -> None:
+        self._timed("update", self.repository.update, key, value)
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        return self._timed("update_many", self.repository.update_many, items)
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        self._timed("update_if", self.repository.update_if, key, expected, value)
+
+    def delete(self, key: str) -> None:
+        self._timed("delete", self.repository.delete, key)
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        return self._timed("delete_many", self.repository.delete_many, keys)
+
+    def delete_if(self, key: str, expected: str) -> None:
+        self._timed("delete_if", self.repository.delete_if, key, expected)
+
+    def list(self) -> List[dict[str, str]]:
+        return self._timed("list", self.repository.list)
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        return self._timed("page", self.repository.page, limit, cursor)
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self._timed("head", self.repository.head, n, offset)
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return self._timed("tail", self.repository.tail, n, offset)
+
+    def count(self) -> int:
+        return self._timed("count", self.repository.count)
+
+    def version(self) -> int:
+        return self._timed("version", self.repository.version)
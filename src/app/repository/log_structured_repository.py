@@ -0,0 +1,746 @@
+import mmap
+import os
+import sys
+import threading
+import zlib
+from array import array
+from struct import Struct
+from struct import error as struct_error
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.common import logger
+
+from .base_repository import (
+    BaseRepository,
+    DBError,
+    DBFailedToAddItemError,
+    DBFailedToDeleteItemError,
+    DBFailedtoListItemsError,
+    DBFailedToUpdateItemError,
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+    decode_cursor,
+    encode_cursor,
+    partial_batch_error,
+)
+from .ids import IdGenerator, UUID7Generator
+from .insertion_order import InsertionOrder
+
+# crc32, op, seq, key length, value length
+RECORD_HEADER = Struct("<IBQHI")
+OP_END = 0
+OP_PUT = 1
+OP_DELETE = 2
+
+LOG_PREFIX = "log-"
+DATA_PREFIX = "data-"
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_FILE = "checkpoint"
+CHECKPOINT_MAGIC = b"LSCHECK"
+CHECKPOINT_VERSION = 2
+# version, tail start, last seq, segment count, entry count
+CHECKPOINT_HEADER = Struct("<HQQQQ")
+# crc32 of everything before it
+CHECKPOINT_TRAILER = Struct("<I")
+# Array type codes of the columns that follow the header, in file order:
+# segment id, is data segment, write position
+SEGMENT_COLUMNS = "QBQ"
+# key length, seq, segment id, value offset, value length, record size
+ENTRY_COLUMNS = "HQQQQQ"
+
+
+def _segment_name(prefix: str, segment_id: int) -> str:
+    return f"{prefix}{segment_id:08d}{SEGMENT_SUFFIX}"
+
+
+def _encode_record(op: int, seq: int, key: bytes, value: bytes) -> bytes:
+    body = RECORD_HEADER.pack(0, op, seq, len(key), len(value))[4:] + key + value
+    return zlib.crc32(body).to_bytes(4, "little") + body
+
+
+def _pack_column(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _unpack_column(typecode: str, data: bytes, start: int, count: int) -> array:
+    column = array(typecode)
+    end = start + column.itemsize * count
+    if end > len(data):
+        raise ValueError("the file is truncated")
+    column.frombytes(data[start:end])
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def _encode_checkpoint(state: dict) -> bytes:
+    segments = state["segments"]
+    keys, *numbers = state["entries"]
+    encoded_keys = [key.encode() for key in keys]
+    parts = [
+        CHECKPOINT_MAGIC,
+        CHECKPOINT_HEADER.pack(
+            CHECKPOINT_VERSION,
+            state["tail_start"],
+            state["last_seq"],
+            len(segments),
+            len(keys),
+        ),
+    ]
+    segment_columns = (
+        [segment_id for segment_id, _, _ in segments],
+        [prefix == DATA_PREFIX for _, prefix, _ in segments],
+        [write_pos for _, _, write_pos in segments],
+    )
+    for typecode, values in zip(SEGMENT_COLUMNS, segment_columns):
+        parts.append(_pack_column(typecode, values))
+    entry_columns = ([len(key) for key in encoded_keys], *numbers)
+    for typecode, values in zip(ENTRY_COLUMNS, entry_columns):
+        parts.append(_pack_column(typecode, values))
+    parts.append(b"".join(encoded_keys))
+    data = b"".join(parts)
+    return data + CHECKPOINT_TRAILER.pack(zlib.crc32(data))
+
+
+def _decode_checkpoint(data: bytes) -> dict:
+    """Parse a checkpoint written by `_encode_checkpoint`.
+
+    Raises ValueError or struct.error when the file is not a checkpoint, was
+    written by another version, or is truncated or corrupt.
+    """
+    if not data.startswith(CHECKPOINT_MAGIC):
+        raise ValueError("not a checkpoint file")
+    body_end = len(data) - CHECKPOINT_TRAILER.size
+    (crc,) = CHECKPOINT_TRAILER.unpack_from(data, body_end)
+    if zlib.crc32(data[:body_end]) != crc:
+        raise ValueError("the checksum does not match")
+    version, tail_start, last_seq, segment_count, entry_count = (
+        CHECKPOINT_HEADER.unpack_from(data, len(CHECKPOINT_MAGIC))
+    )
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported version {version}")
+    data = data[:body_end]
+    pos = len(CHECKPOINT_MAGIC) + CHECKPOINT_HEADER.size
+    columns = []
+    for typecodes, count in (
+        (SEGMENT_COLUMNS, segment_count),
+        (ENTRY_COLUMNS, entry_count),
+    ):
+        for typecode in typecodes:
+            column = _unpack_column(typecode, data, pos, count)
+            pos += column.itemsize * count
+            columns.append(column)
+    segment_ids, is_data, write_positions, key_lengths, *numbers = columns
+    if pos + sum(key_lengths) != len(data):
+        raise ValueError("the file is truncated or corrupt")
+    keys = []
+    for length in key_lengths:
+        end = pos + length
+        keys.append(data[pos:end].decode())
+        pos = end
+    return {
+        "tail_start": tail_start,
+        "last_seq": last_seq,
+        "segments": [
+            (segment_id, DATA_PREFIX if data_segment else LOG_PREFIX, write_pos)
+            for segment_id, data_segment, write_pos in zip(
+                segment_ids, is_data, write_positions
+            )
+        ],
+        "entries": (keys, *numbers),
+    }
+
+
+class _Segment:
+    """A fixed-capacity segment file, appended with pwrite and read through mmap.
+
+    The file is preallocated (sparsely) to its full capacity, so it is mapped
+    once and the mapping never has to grow. Unused space reads as zeros, which
+    decodes as an OP_END record header.
+    """
+
+    def __init__(self, directory: str, prefix: str, segment_id: int, capacity: int):
+        self.id = segment_id
+        self.prefix = prefix
+        self.path = os.path.join(directory, _segment_name(prefix, segment_id))
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < capacity:
+            os.ftruncate(self._fd, capacity)
+        self.capacity = os.fstat(self._fd).st_size
+        self.map = mmap.mmap(self._fd, self.capacity, access=mmap.ACCESS_READ)
+        self.write_pos = 0
+
+    def read(self, offset: int, length: int) -> bytes:
+        end = offset + length
+        return self.map[offset:end]
+
+    def append(self, data: bytes) -> int:
+        offset = self.write_pos
+        self.write_at(data, offset)
+        self.write_pos += len(data)
+        return offset
+
+    def write_at(self, data: bytes, offset: int) -> None:
+        os.pwrite(self._fd, data, offset)
+
+    def sync(self) -> None:
+        os.fsync(self._fd)
+
+    def remove(self) -> None:
+        """Delete the file. The mapping stays readable until it is collected."""
+        os.close(self._fd)
+        os.remove(self.path)
+
+    def close(self) -> None:
+        self.map.close()
+        os.close(self._fd)
+
+
+class _Entry(NamedTuple):
+    """Location of the current value of a key."""
+
+    segment: _Segment
+    offset: int
+    length: int
+    record_size: int
+
+    def read(self) -> str:
+        return self.segment.read(self.offset, self.length).decode()
+
+
+class LogStructuredRepository(BaseRepository):
+    """Repository backed by append-only segment files.
+
+    Every write is a sequential append to the active log segment. An in-memory
+    hash index maps each key to the location of its latest value, and values
+    are read straight from memory-mapped segments. Compaction copies the live
+    records of sealed segments into new data segments and then writes a
+    checkpoint of the index, so that startup only loads the checkpoint and
+    replays the log written after it. When little is overwritten or deleted
+    the background thread still writes a checkpoint once `checkpoint_min_log`
+    bytes of log have been appended since the last one, so that the replay at
+    startup stays bounded for append-only workloads.
+
+    The checkpoint is a flat binary file with a checksum. One that fails to
+    parse or refers to missing segments is ignored, and the index is rebuilt
+    by replaying every segment instead.
+    """
+
+    thread_safe = True
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 64 * 1024 * 1024,
+        sync_writes: bool = False,
+        compaction_interval: Optional[float] = None,
+        compaction_min_garbage: int = 16 * 1024 * 1024,
+        checkpoint_min_log: int = 16 * 1024 * 1024,
+        id_generator: Optional[IdGenerator] = None,
+    ):
+        self._directory = directory
+        self._new_id = id_generator or UUID7Generator()
+        self._segment_size = segment_size
+        self._sync_writes = sync_writes
+        self._compaction_min_garbage = compaction_min_garbage
+        self._checkpoint_min_log = checkpoint_min_log
+        self._lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._index: Dict[str, _Entry] = {}
+        self._order = InsertionOrder()
+        self._segments: Dict[int, _Segment] = {}
+        self._last_seq = 0
+        self._next_segment_id = 1
+        self._live_bytes = 0
+        # Bytes appended to the log since the last checkpoint
+        self._log_bytes = 0
+        self._version = 0
+        os.makedirs(directory, exist_ok=True)
+        try:
+            self._recover()
+        except (OSError, ValueError) as e:
+            raise DBError(f"Failed to open log at '{directory}': {e}") from e
+
+        self._stop = threading.Event()
+        self._compactor = None
+        if compaction_interval:
+            self._compactor = threading.Thread(
+                target=self._compaction_loop,
+                args=(compaction_interval,),
+                name="log-compactor",
+                daemon=True,
+            )
+            self._compactor.start()
+
+    # Recovery
+
+    def _recover(self) -> None:
+        files = {}
+        for name in os.listdir(self._directory):
+            for prefix in (LOG_PREFIX, DATA_PREFIX):
+                if name.startswith(prefix) and name.endswith(SEGMENT_SUFFIX):
+                    segment_id = name.removeprefix(prefix).removesuffix(SEGMENT_SUFFIX)
+                    files[int(segment_id)] = prefix
+        self._next_segment_id = max(files, default=0) + 1
+
+        tail_start = 1
+        state = self._load_checkpoint(files)
+        if state is None and DATA_PREFIX in files.values():
+            # Without the checkpoint, compacted data has to be replayed as well
+            self._replay_all(files)
+        elif state is not None:
+            tail_start = state["tail_start"]
+            self._last_seq = state["last_seq"]
+            for segment_id, prefix, write_pos in state["segments"]:
+                self._open_segment(prefix, segment_id).write_pos = write_pos
+            for key, seq, segment_id, offset, length, size in zip(*state["entries"]):
+                self._index[key] = _Entry(
+                    self._segments[segment_id], offset, length, size
+                )
+                self._order.append(key, seq)
+                self._live_bytes += size
+
+        # Segments that the checkpoint does not reference are either log written
+        # after it, or leftovers from an interrupted compaction
+        for segment_id, prefix in sorted(files.items()):
+            if segment_id in self._segments:
+                continue
+            if segment_id < tail_start or prefix == DATA_PREFIX:
+                os.remove(
+                    os.path.join(self._directory, _segment_name(prefix, segment_id))
+                )
+            else:
+                self._replay(self._open_segment(prefix, segment_id))
+
+        tail = [
+            s
+            for s in self._segments.values()
+            if s.prefix == LOG_PREFIX and s.id >= tail_start
+        ]
+        self._log_bytes = sum(segment.write_pos for segment in tail)
+        if tail:
+            self._active = max(tail, key=lambda s: s.id)
+        else:
+            self._active = self._new_segment(LOG_PREFIX)
+
+    def _load_checkpoint(self, files: Dict[int, str]) -> Optional[dict]:
+        """Read and check the checkpoint; None if there is no usable one."""
+        path = os.path.join(self._directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            state = _decode_checkpoint(data)
+            for segment_id, prefix, _ in state["segments"]:
+                if files.get(segment_id) != prefix:
+                    raise ValueError(f"segment {segment_id} is missing")
+            _, seqs, segment_ids, *_ = state["entries"]
+            if not set(segment_ids) <= {s[0] for s in state["segments"]}:
+                raise ValueError("an entry refers to an unknown segment")
+            if any(a >= b for a, b in zip(seqs, seqs[1:])):
+                raise ValueError("the entries are out of order")
+        except (ValueError, struct_error) as e:
+            logger.warning(f"Ignoring checkpoint '{path}' and replaying the log: {e}")
+            return None
+        return state
+
+    def _replay_all(self, files: Dict[int, str]) -> None:
+        """Rebuild the index from every segment, without a checkpoint.
+
+        Compaction removes the segments it copied once the checkpoint is
+        written, so data segments only hold records older than every log
+        segment left, and are replayed first. Records carry the seq a key was
+        added with, so the order is restored from them at the end.
+        """
+        order = sorted(files.items(), key=lambda item: (item[1] == LOG_PREFIX, item[0]))
+        live: Dict[str, Tuple[int, _Entry]] = {}
+        for segment_id, prefix in order:
+            segment = self._open_segment(prefix, segment_id)
+            for op, seq, key, entry in self._scan(segment):
+                if op == OP_PUT:
+                    live[key] = (seq, entry)
+                else:
+                    live.pop(key, None)
+        for key, (seq, entry) in sorted(live.items(), key=lambda item: item[1][0]):
+            self._index[key] = entry
+            self._order.append(key, seq)
+            self._live_bytes += entry.record_size
+
+    def _replay(self, segment: _Segment) -> None:
+        for op, seq, key, entry in self._scan(segment):
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._live_bytes -= old.record_size
+            if op == OP_PUT:
+                self._index[key] = entry
+                self._live_bytes += entry.record_size
+                if old is None:
+                    self._order.append(key, seq)
+            elif old is not None:
+                self._order.remove(key)
+
+    def _scan(self, segment: _Segment):
+        """Yield (op, seq, key, entry) for each record and set the write position."""
+        pos = 0
+        while pos + RECORD_HEADER.size <= segment.capacity:
+            crc, op, seq, key_len, value_len = RECORD_HEADER.unpack_from(
+                segment.map, pos
+            )
+            size = RECORD_HEADER.size + key_len + value_len
+            if op == OP_END or pos + size > segment.capacity:
+                break
+            if zlib.crc32(segment.read(pos + 4, size - 4)) != crc:
+                # A torn write at the end of the log. Clear it so that records
+                # appended from here on are not followed by stale bytes.
+                segment.write_at(bytes(size), pos)
+                break
+            key_start = pos + RECORD_HEADER.size
+            key = segment.read(key_start, key_len).decode()
+            self._last_seq = max(self._last_seq, seq)
+            yield op, seq, key, _Entry(segment, key_start + key_len, value_len, size)
+            pos += size
+        segment.write_pos = pos
+
+    # Segment management
+
+    def _open_segment(self, prefix: str, segment_id: int) -> _Segment:
+        segment = _Segment(self._directory, prefix, segment_id, self._segment_size)
+        self._segments[segment_id] = segment
+        return segment
+
+    def _new_segment(self, prefix: str) -> _Segment:
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        return self._open_segment(prefix, segment_id)
+
+    def _roll(self) -> None:
+        if self._active.write_pos:
+            self._active.sync()
+            self._active = self._new_segment(LOG_PREFIX)
+
+    def _append(self, op: int, seq: int, key: str, value: bytes) -> _Entry:
+        record = _encode_record(op, seq, key.encode(), value)
+        if len(record) > self._segment_size:
+            raise ValueError(f"Record of {len(record)} bytes exceeds the segment size")
+        if self._active.write_pos + len(record) > self._active.capacity:
+            self._roll()
+        offset = self._active.append(record)
+        self._log_bytes += len(record)
+        if self._sync_writes:
+            self._active.sync()
+        value_offset = offset + len(record) - len(value)
+        return _Entry(self._active, value_offset, len(value), len(record))
+
+    def _put(self, key: str, value: str) -> None:
+        """Write a new value for `key`. Must be called with the lock held."""
+        old = self._index.get(key)
+        if old is None:
+            seq = self._last_seq + 1
+        else:
+            seq = self._order.seq_of(key)
+        entry = self._append(OP_PUT, seq, key, value.encode())
+        self._index[key] = entry
+        self._live_bytes += entry.record_size
+        self._version += 1
+        if old is None:
+            self._last_seq = seq
+            self._order.append(key, seq)
+        else:
+            self._live_bytes -= old.record_size
+
+    def _remove(self, key: str) -> None:
+        """Delete `key`. Must be called with the lock held."""
+        self._append(OP_DELETE, self._order.seq_of(key), key, b"")
+        self._live_bytes -= self._index.pop(key).record_size
+        self._order.remove(key)
+        self._version += 1
+
+    # BaseRepository
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        entry = self._index.get(key)
+        if entry is None:
+            raise DBItemNotFoundError(key)
+        return {key: entry.read()}
+
+    def add_item(self, value: str) -> str:
+        key = self._new_id()
+        try:
+            with self._lock:
+                self._put(key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToAddItemError(value) from e
+        return key
+
+    def update(self, key: str, value: str) -> None:
+        try:
+            with self._lock:
+                if key not in self._index:
+                    raise DBItemNotFoundError(key)
+                self._put(key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._lock:
+                if key not in self._index:
+                    raise DBItemNotFoundError(key)
+                self._remove(key)
+        except OSError as e:
+            raise DBFailedToDeleteItemError(key) from e
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        try:
+            with self._lock:
+                self._check_value(key, expected)
+                self._put(key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+
+    def delete_if(self, key: str, expected: str) -> None:
+        try:
+            with self._lock:
+                self._check_value(key, expected)
+                self._remove(key)
+        except OSError as e:
+            raise DBFailedToDeleteItemError(key) from e
+
+    def _check_value(self, key: str, expected: str) -> None:
+        """Must be called with the lock held."""
+        entry = self._index.get(key)
+        if entry is None:
+            raise DBItemNotFoundError(key)
+        if entry.read() != expected:
+            raise DBPreconditionFailedError(key)
+
+    def add_items(self, values: List[str]) -> List[str]:
+        new_id = self._new_id
+        keys = [new_id() for _ in values]
+        self.import_items(list(zip(keys, values)))
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            # Checked up front, so a rejected batch adds nothing
+            keys = {key for key, _ in items}
+            if len(keys) != len(items) or not keys.isdisjoint(self._index):
+                raise DBFailedToAddItemError(f"<batch of {len(items)}>")
+            added: List[str] = []
+            try:
+                for key, value in items:
+                    self._put(key, value)
+                    added.append(key)
+            except (OSError, ValueError) as e:
+                raise partial_batch_error(added, len(items), e) from e
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        index = self._index
+        return {key: index[key].read() for key in keys if key in index}
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        results: List[bool] = []
+        try:
+            with self._lock:
+                for key, value in items:
+                    found = key in self._index
+                    if found:
+                        self._put(key, value)
+                    results.append(found)
+        except (OSError, ValueError) as e:
+            raise partial_batch_error(results, len(items), e) from e
+        return results
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        results: List[bool] = []
+        try:
+            with self._lock:
+                for key in keys:
+                    found = key in self._index
+                    if found:
+                        self._remove(key)
+                    results.append(found)
+        except OSError as e:
+            raise partial_batch_error(results, len(keys), e) from e
+        return results
+
+    def list(self) -> List[dict[str, str]]:
+        try:
+            return list(self.iter_items())
+        except Exception as e:
+            raise DBFailedtoListItemsError(str(e)) from e
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        after_seq = decode_cursor(cursor) if cursor else 0
+        try:
+            with self._lock:
+                # Fetch one extra entry to find out whether another page exists
+                entries = [
+                    (seq, key, self._index[key])
+                    for seq, key in self._order.after(after_seq, limit + 1)
+                ]
+            results = [
+                {"id": key, "value": entry.read()} for _, key, entry in entries[:limit]
+            ]
+        except Exception as e:
+            raise DBFailedtoListItemsError("Page operation failed.") from e
+        next_cursor = (
+            encode_cursor(entries[limit - 1][0]) if len(entries) > limit else None
+        )
+        return results, next_cursor
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            with self._lock:
+                entries = [
+                    (key, self._index[key]) for key in self._order.window(offset, n)
+                ]
+            return [{"id": key, "value": entry.read()} for key, entry in entries]
+        except Exception as e:
+            raise DBFailedtoListItemsError("Head operation failed.") from e
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            with self._lock:
+                entries = [
+                    (key, self._index[key])
+                    for key in self._order.window_from_end(offset, n)
+                ]
+            return [{"id": key, "value": entry.read()} for key, entry in entries]
+        except Exception as e:
+            raise DBFailedtoListItemsError("Tail operation failed.") from e
+
+    def count(self) -> int:
+        return len(self._index)
+
+    def version(self) -> int:
+        return self._version
+
+    # Compaction and checkpoints
+
+    @property
+    def garbage_bytes(self) -> int:
+        """Bytes held by overwritten and deleted records."""
+        # Writers add segments, so they are not iterated without the lock
+        with self._lock:
+            written = sum(segment.write_pos for segment in self._segments.values())
+            return written - self._live_bytes
+
+    def checkpoint(self) -> None:
+        """Persist the index so that startup does not replay the whole log."""
+        # Compaction writes checkpoints through the same temporary file
+        with self._compaction_lock:
+            with self._lock:
+                self._roll()
+                state = self._checkpoint_state()
+            self._write_checkpoint(state)
+
+    def compact(self) -> None:
+        """Rewrite the live records of sealed segments and drop the old segments.
+
+        Writers wait for the index bookkeeping but not for the copying, which
+        happens outside the lock.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                self._roll()
+                sealed = [s for s in self._segments.values() if s is not self._active]
+                live = [
+                    (seq, key, self._index[key])
+                    for seq, key in self._order.after(0, len(self._order))
+                    if self._index[key].segment is not self._active
+                ]
+                output = self._new_segment(DATA_PREFIX)
+
+            outputs = [output]
+            relocated = []
+            for seq, key, entry in live:
+                value = entry.segment.read(entry.offset, entry.length)
+                record = _encode_record(OP_PUT, seq, key.encode(), value)
+                if output.write_pos + len(record) > output.capacity:
+                    output.sync()
+                    with self._lock:
+                        output = self._new_segment(DATA_PREFIX)
+                    outputs.append(output)
+                offset = output.append(record)
+                value_offset = offset + len(record) - len(value)
+                new_entry = _Entry(output, value_offset, len(value), len(record))
+                relocated.append((key, entry, new_entry))
+            output.sync()
+
+            with self._lock:
+                for key, old, new in relocated:
+                    # Keys written or deleted during the copy keep their newer state
+                    if self._index.get(key) is old:
+                        self._index[key] = new
+                for segment in sealed:
+                    del self._segments[segment.id]
+                self._roll()
+                state = self._checkpoint_state()
+            self._write_checkpoint(state)
+
+            for segment in sealed:
+                segment.remove()
+
+    def _checkpoint_state(self) -> dict:
+        """Snapshot the index. Must be called with the lock held.
+
+        The log written so far is covered by the snapshot from here on.
+        """
+        self._log_bytes = 0
+        keys, seqs, segment_ids, offsets, lengths, sizes = [], [], [], [], [], []
+        for seq, key in self._order.after(0, len(self._order)):
+            entry = self._index[key]
+            keys.append(key)
+            seqs.append(seq)
+            segment_ids.append(entry.segment.id)
+            offsets.append(entry.offset)
+            lengths.append(entry.length)
+            sizes.append(entry.record_size)
+        return {
+            "tail_start": self._active.id,
+            "last_seq": self._last_seq,
+            "segments": [
+                (s.id, s.prefix, s.write_pos)
+                for s in self._segments.values()
+                if s is not self._active
+            ],
+            "entries": (keys, seqs, segment_ids, offsets, lengths, sizes),
+        }
+
+    def _write_checkpoint(self, state: dict) -> None:
+        path = os.path.join(self._directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "wb") as f:
+            f.write(_encode_checkpoint(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def maintain(self) -> None:
+        """Compact, or write a checkpoint, if enough log has built up since the last."""
+        garbage = self.garbage_bytes
+        if garbage >= self._compaction_min_garbage and garbage > self._live_bytes:
+            self.compact()
+        elif self._log_bytes >= self._checkpoint_min_log:
+            self.checkpoint()
+
+    def _compaction_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.maintain()
+
+    def close(self) -> None:
+        """Stop background compaction, write a checkpoint and close the files."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        self.checkpoint()
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
@@ -0,0 +1,452 @@
+import base64
+import binascii
+import heapq
+import json
+import threading
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
+
+from .base_repository import (
+    BaseRepository,
+    DBInvalidCursorError,
+    DBPartialBatchError,
+)
+from .ids import IdGenerator, UUID7Generator
+
+T = TypeVar("T")
+
+_by_id = itemgetter("id")
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """Maps keys to shard names with consistent hashing.
+
+    Every shard owns `replicas` points on a ring of 64 bit hashes, and a key
+    belongs to the shard of the first point after the hash of the key. When a
+    shard is added it only takes over the keys that now fall just before its
+    own points, about 1/N of all keys, and no key moves between old shards.
+    """
+
+    def __init__(self, names: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self.names = frozenset(names)
+        points = {
+            _hash(f"{name}#{i}"): name for name in self.names for i in range(replicas)
+        }
+        self._points = sorted(points)
+        self._owners = [points[point] for point in self._points]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def shard_for(self, key: str) -> str:
+        index = bisect(self._points, _hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class ShardedRepository(BaseRepository):
+    """Spreads items over several child repositories by consistent hashing of ids.
+
+    Ids come from one time-ordered generator, UUIDv7 by default, so they
+    sort in insertion order, and every child keeps its items in insertion
+    order. Reads of a single id go to the child that owns it. Ordered reads
+    fan out to all children in parallel and k-way merge the results by id: `head` and `tail`
+    take the first `offset + n` items of every child, `page` keeps a cursor
+    per child and `list` merges complete listings.
+
+    Writes are serialized, so that each child receives new ids in increasing
+    order. Children must implement `import_items`, which is how new items
+    and items moved by `rebalance` are stored under their ids.
+    """
+
+    def __init__(
+        self,
+        shards: Union[List[BaseRepository], Dict[str, BaseRepository]],
+        replicas: int = 128,
+        max_workers: Optional[int] = None,
+        id_generator: Optional[IdGenerator] = None,
+    ):
+        if not isinstance(shards, dict):
+            shards = {str(i): shard for i, shard in enumerate(shards)}
+        if not shards:
+            raise ValueError("At least one shard is needed")
+        self._shards: Dict[str, BaseRepository] = dict(shards)
+        self._ring = ConsistentHashRing(self._shards, replicas)
+        self.thread_safe = all(shard.thread_safe for shard in self._shards.values())
+        id_generator = id_generator or UUID7Generator()
+        if not id_generator.time_ordered:
+            raise ValueError("Sharding needs time-ordered ids")
+        self._new_id = id_generator
+        self._write_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="shard")
+        # While items are being moved some of them are held by two shards;
+        # reads then drop the copies that are not on their owner
+        self._rebalancing = False
+        # Versions of removed shards, so that `version` never goes backwards
+        self._removed_versions = 0
+
+    @property
+    def shards(self) -> Dict[str, BaseRepository]:
+        return dict(self._shards)
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        for shard in self._shards.values():
+            close = getattr(shard, "close", None)
+            if close is not None:
+                close()
+
+    # Routing and fan-out
+
+    def _shard_for(self, key: str) -> BaseRepository:
+        return self._shards[self._ring.shard_for(key)]
+
+    def _fan_out(self, call: Callable[[str, BaseRepository], T]) -> List[Tuple[str, T]]:
+        """Call every shard in parallel and return (name, result) pairs."""
+        shards = list(self._shards.items())
+        if len(shards) == 1:
+            name, shard = shards[0]
+            return [(name, call(name, shard))]
+        futures = [
+            (name, self._pool.submit(call, name, shard)) for name, shard in shards
+        ]
+        return [(name, future.result()) for name, future in futures]
+
+    def _grouped(self, keys: Iterable[str]) -> Dict[str, List[int]]:
+        """Map each shard name to the positions of the keys it owns."""
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self._ring.shard_for(key), []).append(i)
+        return groups
+
+    def _owned(self, name: str, rows: List[dict[str, str]]) -> List[dict[str, str]]:
+        if not self._rebalancing:
+            return rows
+        ring = self._ring
+        return [row for row in rows if ring.shard_for(row["id"]) == name]
+
+    def _merged(self, results: List[Tuple[str, List[dict[str, str]]]], reverse=False):
+        return heapq.merge(
+            *(self._owned(name, rows) for name, rows in results),
+            key=_by_id,
+            reverse=reverse,
+        )
+
+    # BaseRepository
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        return self._shard_for(key).get_by_id(key)
+
+    def add_item(self, value: str) -> str:
+        with self._write_lock:
+            key = self._new_id()
+            self._shard_for(key).import_items([(key, value)])
+        return key
+
+    def add_items(self, values: List[str]) -> List[str]:
+        with self._write_lock:
+            keys = [self._new_id() for _ in values]
+
+            def store(shard: BaseRepository, positions: List[int]) -> List[str]:
+                shard.import_items([(keys[i], values[i]) for i in positions])
+                return [keys[i] for i in positions]
+
+            self._scatter(self._grouped(keys), len(keys), store)
+        return keys
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        groups = self._grouped(keys)
+        results: dict[str, str] = {}
+        for _, found in self._fan_out(
+            lambda name, shard: (
+                shard.get_many([keys[i] for i in groups[name]])
+                if name in groups
+                else {}
+            )
+        ):
+            results.update(found)
+        return results
+
+    def update(self, key: str, value: str) -> None:
+        with self._write_lock:
+            self._shard_for(key).update(key, value)
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        with self._write_lock:
+            groups = self._grouped(key for key, _ in items)
+            return self._scatter(
+                groups,
+                len(items),
+                lambda shard, positions: shard.update_many(
+                    [items[i] for i in positions]
+                ),
+            )
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        with self._write_lock:
+            self._shard_for(key).update_if(key, expected, value)
+
+    def delete(self, key: str) -> None:
+        with self._write_lock:
+            self._shard_for(key).delete(key)
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        with self._write_lock:
+            groups = self._grouped(keys)
+            return self._scatter(
+                groups,
+                len(keys),
+                lambda shard, positions: shard.delete_many(
+                    [keys[i] for i in positions]
+                ),
+            )
+
+    def delete_if(self, key: str, expected: str) -> None:
+        with self._write_lock:
+            self._shard_for(key).delete_if(key, expected)
+
+    def _scatter(
+        self,
+        groups: Dict[str, List[int]],
+        size: int,
+        call: Callable[[BaseRepository, List[int]], List],
+    ) -> List:
+        """Run a batch write on every shard with keys in it; reassemble the outcomes.
+
+        A shard that fails does not stop the others. Their outcomes are then
+        raised together in a DBPartialBatchError, with None for the entries
+        of the failed shards that were not applied.
+        """
+        errors: List[Exception] = []
+
+        def run(name: str, shard: BaseRepository) -> List:
+            if name not in groups:
+                return []
+            try:
+                return call(shard, groups[name])
+            except DBPartialBatchError as e:
+                errors.append(e)
+                return e.outcomes
+            except Exception as e:
+                errors.append(e)
+                return []
+
+        results: List = [None] * size
+        for name, outcomes in self._fan_out(run):
+            for i, outcome in zip(groups.get(name, ()), outcomes):
+                results[i] = outcome
+        if errors:
+            raise DBPartialBatchError(
+                f"Bulk write failed on {len(errors)} shards: {errors[0]}", results
+            ) from errors[0]
+        return results
+
+    def list(self) -> List[dict[str, str]]:
+        return list(self._merged(self._fan_out(lambda _, shard: shard.list())))
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        """Get a page merged from one page of every shard.
+
+        The cursor holds the last id returned and a cursor per shard. Shards
+        that were added after it was issued are read from their start, and
+        their items up to that id are skipped. Every shard is read on every
+        call, so items added to a shard that had run out are still returned.
+        """
+        last_id, cursors = _decode_page_cursor(cursor) if cursor else ("", {})
+        results: List[dict[str, str]] = []
+        # Shards that have no items left after their cursor in this call
+        ended: set = set()
+        while len(results) < limit and len(ended) < len(self._shards):
+            pages = [
+                (name, page)
+                for name, page in self._fan_out(
+                    lambda name, shard: (
+                        None if name in ended else shard.page(limit, cursors.get(name))
+                    )
+                )
+                if page is not None
+            ]
+            consumed = {name: 0 for name, _ in pages}
+            tagged = [
+                [(row["id"], name, i, row) for i, row in enumerate(rows)]
+                for name, (rows, _) in pages
+            ]
+            for key, name, i, row in heapq.merge(*tagged):
+                if len(results) == limit:
+                    break
+                consumed[name] = i + 1
+                if key > last_id and self._owned(name, [row]):
+                    results.append(row)
+                    last_id = key
+            for name, (rows, next_cursor) in pages:
+                count = consumed[name]
+                if count == len(rows) and next_cursor is not None:
+                    cursors[name] = next_cursor
+                    continue
+                if count == len(rows):
+                    ended.add(name)
+                if count:
+                    position = self._cursor_after(
+                        self._shards[name], cursors.get(name), count, rows[count - 1]
+                    )
+                    if position is not None:
+                        cursors[name] = position
+        if len(ended) == len(self._shards):
+            return results, None
+        return results, _encode_page_cursor(last_id, cursors)
+
+    @staticmethod
+    def _cursor_after(
+        shard: BaseRepository, cursor: Optional[str], count: int, last: dict
+    ) -> Optional[str]:
+        """Return the cursor of `shard` after `last`, the `count`-th item from `cursor`.
+
+        No cursor follows the newest item of a shard, so for that one the
+        cursor just before it is returned; the id filter of `page` skips it.
+        """
+        while count > 0:
+            rows, next_cursor = shard.page(count, cursor)
+            # Items deleted since the page was read shift the window forward
+            seen = sum(1 for row in rows if row["id"] <= last["id"])
+            if seen < len(rows):
+                count = seen
+            elif next_cursor is not None:
+                return next_cursor
+            else:
+                count = seen - 1
+        return cursor
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        if self._rebalancing:
+            end = offset + n
+            return self.list()[offset:end]
+        take = offset + n
+        results = self._fan_out(lambda _, shard: shard.head(take))
+        return list(islice(self._merged(results), offset, take))
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        if self._rebalancing:
+            newest_first = self.list()[::-1]
+            end = offset + n
+            return newest_first[offset:end]
+        take = offset + n
+        results = self._fan_out(lambda _, shard: shard.tail(take))
+        return list(islice(self._merged(results, reverse=True), offset, take))
+
+    def count(self) -> int:
+        if self._rebalancing:
+            return len(self.list())
+        return sum(count for _, count in self._fan_out(lambda _, shard: shard.count()))
+
+    def version(self) -> int:
+        shards = list(self._shards.values())
+        return self._removed_versions + sum(shard.version() for shard in shards)
+
+    # Rebalancing
+
+    def add_shard(self, repository: BaseRepository, name: Optional[str] = None) -> int:
+        """Add a child and move the items it now owns onto it.
+
+        Returns the number of items moved, about 1/N of them.
+        """
+        with self._write_lock:
+            if name is None:
+                name = str(len(self._shards))
+            if name in self._shards:
+                raise ValueError(f"Shard '{name}' already exists")
+            self.thread_safe = self.thread_safe and repository.thread_safe
+            self._rebalancing = True
+            self._shards = {**self._shards, name: repository}
+            return self._rebalance([*self._ring.names, name])
+
+    def remove_shard(self, name: str) -> BaseRepository:
+        """Move the items of a child onto the others and drop it."""
+        with self._write_lock:
+            if len(self._shards) == 1:
+                raise ValueError("Cannot remove the last shard")
+            self._rebalancing = True
+            self._rebalance([other for other in self._ring.names if other != name])
+            shards = dict(self._shards)
+            removed = shards.pop(name)
+            self._removed_versions += removed.version()
+            self._shards = shards
+            return removed
+
+    def rebalance(self) -> int:
+        """Move every item that is not held by the shard owning its id."""
+        with self._write_lock:
+            self._rebalancing = True
+            return self._rebalance(self._ring.names)
+
+    def _rebalance(self, names: Iterable[str]) -> int:
+        """Copy misplaced items, switch the ring, then delete the originals.
+
+        Must be called with the write lock held and `_rebalancing` set.
+        """
+        try:
+            ring = ConsistentHashRing(names, self._ring.replicas)
+            moves: Dict[str, List[Tuple[str, str]]] = {}
+            sources: Dict[str, List[str]] = {}
+            for name, rows in self._fan_out(lambda _, shard: shard.list()):
+                for row in rows:
+                    owner = ring.shard_for(row["id"])
+                    if owner != name:
+                        moves.setdefault(owner, []).append((row["id"], row["value"]))
+                        sources.setdefault(name, []).append(row["id"])
+            self._fan_out(
+                lambda name, shard: (
+                    _merge_into(shard, sorted(moves[name])) if name in moves else None
+                )
+            )
+            self._ring = ring
+            self._fan_out(
+                lambda name, shard: (
+                    shard.delete_many(sources[name]) if name in sources else None
+                )
+            )
+            return sum(len(items) for items in moves.values())
+        finally:
+            self._rebalancing = False
+
+
+def _merge_into(shard: BaseRepository, items: List[Tuple[str, str]]) -> None:
+    """Import items sorted by id into a shard, keeping the shard in id order.
+
+    When the shard holds items newer than some of the incoming ones, those are
+    deleted and imported again after them, so they are briefly missing.
+    """
+    newest = shard.tail(1)
+    if newest and newest[0]["id"] > items[0][0]:
+        newer = [
+            (row["id"], row["value"]) for row in shard.list() if row["id"] > items[0][0]
+        ]
+        shard.delete_many([key for key, _ in newer])
+        items = sorted(items + newer)
+    shard.import_items(items)
+
+
+def _encode_page_cursor(last_id: str, cursors: Dict[str, str]) -> str:
+    state = json.dumps({"k": last_id, "c": cursors}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(state.encode()).decode().rstrip("=")
+
+
+def _decode_page_cursor(cursor: str) -> Tuple[str, Dict[str, str]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+        last_id, cursors = state["k"], state["c"]
+        if not isinstance(last_id, str) or not isinstance(cursors, dict):
+            raise ValueError(cursor)
+        return last_id, cursors
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise DBInvalidCursorError(cursor) from e
@@ -0,0 +1,476 @@
+import fcntl
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from struct import Struct
+from typing import Iterator, List, Optional, Tuple
+
+from app.change_feed import Change, ChangeFeed
+
+from .base_repository import (
+    DBError,
+    DBFailedToAddItemError,
+    DBFailedToDeleteItemError,
+    DBFailedToUpdateItemError,
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+    partial_batch_error,
+)
+from .change_feed_repository import DELETE, INSERT, UPDATE
+from .ids import IdGenerator
+from .insertion_order import InsertionOrder
+from .log_structured_repository import (
+    OP_DELETE,
+    OP_PUT,
+    RECORD_HEADER,
+    _encode_record,
+)
+from .thread_safe_repository import ThreadSafeInMemoryRepository
+
+MAGIC = b"LISTSHM2"
+# magic, end of the committed records, repository version, records written,
+# last insertion sequence number, changes ever committed, superseded flag
+HEADER = Struct("<8sQQQQQB")
+# Everything after the magic, rewritten by each commit
+COMMIT = Struct("<QQQQQ")
+END = Struct("<Q")
+END_OFFSET = 8
+SUPERSEDED_OFFSET = 48
+DATA_START = 64
+MIN_SIZE = 1024 * 1024
+MIN_COMPACTION_RECORDS = 4096
+# Seconds between checks for records committed by other processes
+POLL_INTERVAL = 0.05
+
+
+class SharedMemoryRepository(ThreadSafeInMemoryRepository):
+    """Repository that several worker processes share through one mapped file.
+
+    The file, which should live on a tmpfs such as /dev/shm, holds a header
+    and an append-only log of put and delete records. Each process maps it
+    and keeps its own in-memory view of the items, so reads are served
+    without any cross-process coordination and scale with the number of
+    processes. Before every read a process compares the committed end of the
+    log in the header with the position it has replayed up to, and replays
+    the records other processes appended in the meantime. A background
+    thread does the same every POLL_INTERVAL, so that `version`, which must
+    not block, can return the version of the last records replayed and still
+    notice the writes of other processes without a read to trigger it.
+
+    Writers take an exclusive `flock` on a lock file next to the data file,
+    append their records, then commit them by rewriting the header; readers
+    that need to catch up take a shared lock, so they never see a partial
+    commit. Writes made through any process are therefore applied in one
+    order and every process converges on the same list.
+
+    When the log holds more than twice as many records as live items it is
+    compacted into a new file that replaces the old one, and the old one is
+    flagged as superseded so other processes reopen the path.
+
+    With a `change_feed`, every record applied to the local view, whichever
+    process wrote it, is published to the feed, numbered by the count of
+    changes ever committed to the file. The feeds of all processes therefore
+    list the same changes under the same sequence numbers, and waiting
+    readers see the writes of other processes through the background thread.
+    Records a process missed because the file was compacted meanwhile are not
+    listed: its feed skips ahead and readers that were behind have to
+    resynchronize.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int = 16 * 1024 * 1024,
+        id_generator: Optional[IdGenerator] = None,
+        change_feed: Optional[ChangeFeed] = None,
+    ):
+        super().__init__(id_generator=id_generator)
+        self._path = path
+        self._size = max(size, MIN_SIZE)
+        self._records = 0
+        self._last_seq = 0
+        self._changes = 0
+        self._feed = change_feed
+        # Changes appended by this process and not published yet
+        self._pending: List[Change] = []
+        try:
+            self._lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            with self._lock, self._file_lock(fcntl.LOCK_EX):
+                self._open()
+                self._replay(publish=False)
+        except (OSError, ValueError) as e:
+            raise DBError(f"Failed to open shared memory file '{path}': {e}") from e
+        self._closed = threading.Event()
+        self._follower = threading.Thread(
+            target=self._follow, name="shared-memory-follower", daemon=True
+        )
+        self._follower.start()
+
+    # File handling
+
+    @contextmanager
+    def _file_lock(self, operation: int) -> Iterator[None]:
+        """Lock the file across processes. Must be called with the lock held."""
+        fcntl.flock(self._lock_fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self) -> None:
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.ftruncate(self._fd, self._size)
+            os.pwrite(self._fd, HEADER.pack(MAGIC, DATA_START, 0, 0, 0, 0, 0), 0)
+        self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError("Not a shared memory repository file")
+        self._pos = DATA_START
+
+    def _reopen(self) -> None:
+        """Switch to the file that replaced a superseded one and reload it.
+
+        The items are loaded into a new dict and order index that replace the
+        old ones at once, so that `get_by_id` and `count`, which read without
+        the lock, never see a partly loaded view.
+        """
+        os.close(self._fd)
+        self._open()
+        end = END.unpack_from(self._map, END_OFFSET)[0]
+        data: dict[str, str] = {}
+        order = InsertionOrder()
+        for op, seq, key, value in self._read_records(self._pos, end):
+            if op == OP_DELETE:
+                del data[key]
+                order.remove(key)
+            else:
+                if key not in data:
+                    order.append(key, seq)
+                data[key] = value.decode()
+        self._pos = end
+        self._order = order
+        self._rows = {}
+        self._snapshot = None
+        self._data = data
+
+    def _grow(self, needed: int) -> None:
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        os.ftruncate(self._fd, size)
+        # The old mapping is left for the garbage collector, since a reader
+        # thread may still be looking at its header
+        self._map = mmap.mmap(self._fd, size)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._follower.join()
+        with self._lock:
+            self._map.close()
+            os.close(self._fd)
+            os.close(self._lock_fd)
+
+    # Replaying and appending records
+
+    def _refresh(self) -> None:
+        """Catch up with the records committed by other processes."""
+        view = self._map
+        if END.unpack_from(view, END_OFFSET)[0] != self._pos or view[SUPERSEDED_OFFSET]:
+            with self._lock, self._file_lock(fcntl.LOCK_SH):
+                self._sync()
+
+    def _follow(self) -> None:
+        while not self._closed.wait(POLL_INTERVAL):
+            try:
+                self._refresh()
+            except (OSError, ValueError):
+                # The next poll tries again
+                continue
+
+    def _sync(self) -> None:
+        """Must be called with both locks held."""
+        superseded = self._map[SUPERSEDED_OFFSET]
+        if superseded:
+            self._reopen()
+        # A reloaded file holds the live items, not the changes made to them
+        self._replay(publish=not superseded)
+
+    def _replay(self, publish: bool = True) -> None:
+        """Apply the records committed after `_pos`. Needs both locks held.
+
+        The records are published to the change feed, or with `publish` off
+        the feed skips ahead to the changes committed so far.
+        """
+        _, end, version, records, last_seq, changes, _ = HEADER.unpack_from(self._map)
+        if end > len(self._map):
+            self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+        applied = [
+            self._apply(op, seq, key, value)
+            for op, seq, key, value in self._read_records(self._pos, end)
+        ]
+        self._pos = end
+        self._version = version
+        self._records = records
+        self._last_seq = last_seq
+        self._changes = changes
+        if self._feed is not None:
+            if publish:
+                self._feed.publish(applied)
+            else:
+                self._feed.reset(changes)
+
+    def _read_records(
+        self, pos: int, end: int
+    ) -> Iterator[Tuple[int, int, str, bytes]]:
+        """Yield (op, seq, key, value) for the records from `pos` up to `end`."""
+        view = self._map
+        while pos < end:
+            _, op, seq, key_len, value_len = RECORD_HEADER.unpack_from(view, pos)
+            key_start = pos + RECORD_HEADER.size
+            value_start = key_start + key_len
+            pos = value_start + value_len
+            yield op, seq, view[key_start:value_start].decode(), view[value_start:pos]
+
+    def _apply(self, op: int, seq: int, key: str, value: bytes) -> Change:
+        """Update the local view, and the list snapshot when there is one."""
+        data = self._data
+        snapshot = self._snapshot
+        if op == OP_DELETE:
+            if snapshot is not None:
+                del snapshot[self._order.rank_of(key)]
+            del data[key]
+            self._rows.pop(key, None)
+            self._order.remove(key)
+            return (DELETE, key, None)
+        if key in data:
+            data[key] = text = value.decode()
+            self._rows.pop(key, None)
+            if snapshot is not None:
+                snapshot[self._order.rank_of(key)] = self._row(key)
+            return (UPDATE, key, text)
+        data[key] = text = value.decode()
+        self._order.append(key, seq)
+        if snapshot is not None:
+            snapshot.append(self._row(key))
+        return (INSERT, key, text)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold both locks with the view caught up, then commit what was appended."""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            start = self._pos
+            try:
+                yield
+            finally:
+                if self._pos != start:
+                    self._version += 1
+                    COMMIT.pack_into(
+                        self._map,
+                        END_OFFSET,
+                        self._pos,
+                        self._version,
+                        self._records,
+                        self._last_seq,
+                        self._changes,
+                    )
+                    if self._feed is not None:
+                        self._feed.publish(self._pending)
+                        self._pending = []
+                    if (
+                        self._records > MIN_COMPACTION_RECORDS
+                        and self._records > 2 * len(self._data)
+                    ):
+                        self._compact()
+
+    def _append(self, op: int, key: str, value: str = "") -> None:
+        """Append one record and apply it. Must be called within `_exclusive`."""
+        if key in self._data:
+            seq = self._order.seq_of(key)
+        else:
+            seq = self._last_seq = self._last_seq + 1
+        raw_value = value.encode()
+        record = _encode_record(op, seq, key.encode(), raw_value)
+        start = self._pos
+        end = start + len(record)
+        if end > len(self._map):
+            self._grow(end)
+        self._map[start:end] = record
+        change = self._apply(op, seq, key, raw_value)
+        if self._feed is not None:
+            self._pending.append(change)
+        self._pos = end
+        self._records += 1
+        self._changes += 1
+
+    def _compact(self) -> None:
+        """Rewrite the live items to a new file. Must be called within `_exclusive`."""
+        data = self._data
+        body = b"".join(
+            _encode_record(OP_PUT, seq, key.encode(), data[key].encode())
+            for seq, key in self._order.after(0, len(self._order))
+        )
+        size = self._size
+        while size < 2 * (DATA_START + len(body)):
+            size *= 2
+        header = HEADER.pack(
+            MAGIC,
+            DATA_START + len(body),
+            self._version,
+            len(data),
+            self._last_seq,
+            self._changes,
+            0,
+        )
+        tmp_path = self._path + ".tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, header, 0)
+            os.pwrite(fd, body, DATA_START)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self._path)
+        self._map[SUPERSEDED_OFFSET] = 1
+        self._reopen()
+        self._replay(publish=False)
+
+    # BaseRepository
+
+    def save_snapshot(self, path: str) -> None:
+        self._refresh()
+        super().save_snapshot(path)
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        self._refresh()
+        return super().get_by_id(key)
+
+    def add_item(self, value: str) -> str:
+        key = self._new_id()
+        try:
+            with self._exclusive():
+                self._append(OP_PUT, key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToAddItemError(value) from e
+        return key
+
+    def add_items(self, values: List[str]) -> List[str]:
+        new_id = self._new_id
+        keys = [new_id() for _ in values]
+        self.import_items(list(zip(keys, values)))
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        added: List[str] = []
+        try:
+            with self._exclusive():
+                # Checked up front, so a rejected batch adds nothing
+                keys = {key for key, _ in items}
+                if len(keys) != len(items) or not keys.isdisjoint(self._data):
+                    raise DBFailedToAddItemError(f"<batch of {len(items)}>")
+                for key, value in items:
+                    self._append(OP_PUT, key, value)
+                    added.append(key)
+        except (OSError, ValueError) as e:
+            # Records appended before the failure are committed all the same
+            raise partial_batch_error(added, len(items), e) from e
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        self._refresh()
+        return super().get_many(keys)
+
+    def update(self, key: str, value: str) -> None:
+        try:
+            with self._exclusive():
+                if key not in self._data:
+                    raise DBItemNotFoundError(key)
+                self._append(OP_PUT, key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        results: List[bool] = []
+        try:
+            with self._exclusive():
+                for key, value in items:
+                    found = key in self._data
+                    if found:
+                        self._append(OP_PUT, key, value)
+                    results.append(found)
+        except (OSError, ValueError) as e:
+            raise partial_batch_error(results, len(items), e) from e
+        return results
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        try:
+            with self._exclusive():
+                self._check_value(key, expected)
+                self._append(OP_PUT, key, value)
+        except (OSError, ValueError) as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._exclusive():
+                if key not in self._data:
+                    raise DBItemNotFoundError(key)
+                self._append(OP_DELETE, key)
+        except OSError as e:
+            raise DBFailedToDeleteItemError(key) from e
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        results: List[bool] = []
+        try:
+            with self._exclusive():
+                for key in keys:
+                    found = key in self._data
+                    if found:
+                        self._append(OP_DELETE, key)
+                    results.append(found)
+        except OSError as e:
+            raise partial_batch_error(results, len(keys), e) from e
+        return results
+
+    def delete_if(self, key: str, expected: str) -> None:
+        try:
+            with self._exclusive():
+                self._check_value(key, expected)
+                self._append(OP_DELETE, key)
+        except OSError as e:
+            raise DBFailedToDeleteItemError(key) from e
+
+    def _check_value(self, key: str, expected: str) -> None:
+        """Must be called within `_exclusive`."""
+        value = self._data.get(key)
+        if value is None:
+            raise DBItemNotFoundError(key)
+        if value != expected:
+            raise DBPreconditionFailedError(key)
+
+    def list(self) -> List[dict[str, str]]:
+        self._refresh()
+        return super().list()
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        self._refresh()
+        return super().page(limit, cursor)
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        self._refresh()
+        return super().head(n, offset)
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        self._refresh()
+        return super().tail(n, offset)
+
+    def count(self) -> int:
+        self._refresh()
+        return super().count()
+
+    def version(self) -> int:
+        # Catching up may wait for the file lock, so it is left to the reads
+        # and the background thread
+        return self._version
@@ -0,0 +1,155 @@
+import mmap
+import os
+import sys
+import threading
+from array import array
+from struct import Struct
+from struct import error as struct_error
+from typing import List, Tuple
+
+from app.common import logger
+
+from .base_repository import DBError
+
+MAGIC = b"LSSNAP01"
+# mode, item count, key blob size, value blob size
+HEADER = Struct("<BQQQ")
+SEPARATOR = "\x00"
+# Keys and values are joined with SEPARATOR and split back in one call
+MODE_SPLIT = 0
+# Some string contains SEPARATOR, so character offsets are stored instead
+MODE_OFFSETS = 1
+
+
+class DBSnapshotError(DBError):
+    """Exception raised when a snapshot file cannot be read."""
+
+    def __init__(self, path, reason):
+        super().__init__(f"Failed to load snapshot '{path}': {reason}")
+        self.path = path
+
+
+def dump_snapshot(path: str, items: List[Tuple[str, str]]) -> None:
+    """Write (key, value) pairs to `path`, keeping their order.
+
+    The file is written next to `path` and renamed into place, so readers never
+    see a partial snapshot.
+    """
+    keys = [key for key, _ in items]
+    values = [value for _, value in items]
+    key_text = SEPARATOR.join(keys)
+    value_text = SEPARATOR.join(values)
+    separators = max(len(items) - 1, 0)
+    if key_text.count(SEPARATOR) == separators == value_text.count(SEPARATOR):
+        mode = MODE_SPLIT
+        offsets = b""
+    else:
+        mode = MODE_OFFSETS
+        key_text, value_text = "".join(keys), "".join(values)
+        offsets = _offsets(keys).tobytes() + _offsets(values).tobytes()
+
+    key_blob = key_text.encode()
+    value_blob = value_text.encode()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(mode, len(items), len(key_blob), len(value_blob)))
+        f.write(key_blob)
+        f.write(value_blob)
+        f.write(offsets)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Tuple[List[str], List[str]]:
+    """Read a snapshot written by `dump_snapshot` into parallel key and value lists.
+
+    The file is memory-mapped and each blob is decoded and split in one call, so
+    loading costs little more than reading the file.
+    """
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                keys, values, count = _parse(m)
+    except (OSError, ValueError, struct_error) as e:
+        raise DBSnapshotError(path, e) from e
+    if len(keys) != count or len(values) != count:
+        raise DBSnapshotError(path, "the file is truncated or corrupt")
+    return keys, values
+
+
+def _parse(m) -> Tuple[List[str], List[str], int]:
+    if m[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a snapshot file")
+    mode, count, key_size, value_size = HEADER.unpack_from(m, len(MAGIC))
+    if count == 0:
+        return [], [], 0
+    start = len(MAGIC) + HEADER.size
+    key_end = start + key_size
+    value_end = key_end + value_size
+    offsets_size = 16 * (count + 1) if mode == MODE_OFFSETS else 0
+    if len(m) != value_end + offsets_size:
+        raise ValueError("the file is truncated or corrupt")
+    key_text = str(m[start:key_end], "utf-8")
+    value_text = str(m[key_end:value_end], "utf-8")
+    if mode == MODE_SPLIT:
+        return key_text.split(SEPARATOR), value_text.split(SEPARATOR), count
+    offsets = array("Q")
+    offsets.frombytes(m[value_end:])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    boundary = count + 1
+    keys = _split_at(key_text, offsets[:boundary])
+    values = _split_at(value_text, offsets[boundary:])
+    return keys, values, count
+
+
+def _offsets(strings: List[str]) -> array:
+    offsets = array("Q", [0])
+    total = 0
+    for string in strings:
+        total += len(string)
+        offsets.append(total)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+
+def _split_at(text: str, offsets) -> List[str]:
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+class PeriodicSnapshot:
+    """Background thread that saves a repository snapshot every `interval` seconds.
+
+    Rounds in which the repository version has not moved are skipped.
+    """
+
+    def __init__(self, repository, path: str, interval: float):
+        self._repository = repository
+        self._path = path
+        self._interval = interval
+        self._saved_version = repository.version()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-writer", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            version = self._repository.version()
+            if version == self._saved_version:
+                continue
+            try:
+                self._repository.save_snapshot(self._path)
+                self._saved_version = version
+            except Exception as e:
+                logger.error(f"Failed to write snapshot to '{self._path}': {str(e)}")
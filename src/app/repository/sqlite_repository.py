@@ -0,0 +1,344 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from .base_repository import (
+    BaseRepository,
+    DBError,
+    DBFailedToAddItemError,
+    DBFailedToCountItemsError,
+    DBFailedToDeleteItemError,
+    DBFailedtoListItemsError,
+    DBFailedToUpdateItemError,
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+    decode_cursor,
+    encode_cursor,
+)
+from .ids import IdGenerator, UUID7Generator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (version INTEGER NOT NULL);
+INSERT INTO meta SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM meta);
+CREATE TRIGGER IF NOT EXISTS items_insert_version AFTER INSERT ON items
+BEGIN UPDATE meta SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS items_update_version AFTER UPDATE ON items
+BEGIN UPDATE meta SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS items_delete_version AFTER DELETE ON items
+BEGIN UPDATE meta SET version = version + 1; END;
+"""
+
+# SQLite limits the number of bound parameters per statement
+MAX_VARIABLES = 500
+# Seconds between checks for writes made through other connections
+VERSION_POLL_INTERVAL = 0.05
+
+
+class SqliteRepository(BaseRepository):
+    """Repository persisted to a SQLite database.
+
+    Rows are keyed by an AUTOINCREMENT `seq` column that records insertion
+    order, so `head`, `tail` and `page` are range scans on the primary key and
+    cursors stay valid across deletes. The database runs in WAL mode so readers
+    never wait for the writer. Each thread gets its own connection, and the
+    statements below are compiled once per connection and then served from
+    sqlite3's statement cache.
+
+    Triggers bump a counter in the `meta` table on every write. `version`
+    returns a copy of it held in memory, so it never touches the database:
+    writes through this repository update the copy as they commit, and a
+    background thread polls `PRAGMA data_version` to pick up writes made by
+    other processes sharing the database file within VERSION_POLL_INTERVAL.
+    """
+
+    thread_safe = True
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 5.0,
+        id_generator: Optional[IdGenerator] = None,
+    ):
+        self._path = path
+        self._new_id = id_generator or UUID7Generator()
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        try:
+            conn = self._connection()
+            conn.executescript(SCHEMA)
+            self._version = self._read_version(conn)
+        except sqlite3.Error as e:
+            raise DBError(f"Failed to open database '{path}': {e}") from e
+        self._version_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._poller = threading.Thread(
+            target=self._poll_version, name="sqlite-version", daemon=True
+        )
+        self._poller.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._path,
+                timeout=self._timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _read_version(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT version FROM meta").fetchone()[0]
+
+    def _written(self, conn: sqlite3.Connection) -> None:
+        """Copy the version after a write, from the thread that made it."""
+        version = self._read_version(conn)
+        with self._version_lock:
+            if version > self._version:
+                self._version = version
+
+    def _poll_version(self) -> None:
+        conn = self._connection()
+        data_version = None
+        while not self._closed.wait(VERSION_POLL_INTERVAL):
+            try:
+                # Changes whenever another connection commits a write
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    self._written(conn)
+            except sqlite3.Error:
+                # Busy or locked for now; the next poll tries again
+                continue
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        try:
+            row = (
+                self._connection()
+                .execute("SELECT value FROM items WHERE id = ?", (key,))
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            raise DBError(f"Failed to get item with key '{key}': {e}") from e
+        if row is None:
+            raise DBItemNotFoundError(key)
+        return {key: row[0]}
+
+    def add_item(self, value: str) -> str:
+        key = self._new_id()
+        try:
+            conn = self._connection()
+            conn.execute("INSERT INTO items (id, value) VALUES (?, ?)", (key, value))
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToAddItemError(value) from e
+        return key
+
+    def update(self, key: str, value: str) -> None:
+        try:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE items SET value = ? WHERE id = ?", (value, key)
+            )
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+        if cursor.rowcount == 0:
+            raise DBItemNotFoundError(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            conn = self._connection()
+            cursor = conn.execute("DELETE FROM items WHERE id = ?", (key,))
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToDeleteItemError(key) from e
+        if cursor.rowcount == 0:
+            raise DBItemNotFoundError(key)
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        try:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE items SET value = ? WHERE id = ? AND value = ?",
+                (value, key, expected),
+            )
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToUpdateItemError(key, value) from e
+        if cursor.rowcount == 0:
+            self._raise_not_found_or_changed(key)
+
+    def delete_if(self, key: str, expected: str) -> None:
+        try:
+            conn = self._connection()
+            cursor = conn.execute(
+                "DELETE FROM items WHERE id = ? AND value = ?", (key, expected)
+            )
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToDeleteItemError(key) from e
+        if cursor.rowcount == 0:
+            self._raise_not_found_or_changed(key)
+
+    def _raise_not_found_or_changed(self, key: str) -> None:
+        row = (
+            self._connection()
+            .execute("SELECT 1 FROM items WHERE id = ?", (key,))
+            .fetchone()
+        )
+        if row is None:
+            raise DBItemNotFoundError(key)
+        raise DBPreconditionFailedError(key)
+
+    def add_items(self, values: List[str]) -> List[str]:
+        new_id = self._new_id
+        keys = [new_id() for _ in values]
+        self.import_items(list(zip(keys, values)))
+        return keys
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        try:
+            with self._transaction() as conn:
+                conn.executemany("INSERT INTO items (id, value) VALUES (?, ?)", items)
+            self._written(conn)
+        except sqlite3.Error as e:
+            raise DBFailedToAddItemError(f"<batch of {len(items)}>") from e
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        results = {}
+        try:
+            conn = self._connection()
+            for start in range(0, len(keys), MAX_VARIABLES):
+                stop = start + MAX_VARIABLES
+                chunk = keys[start:stop]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, value FROM items WHERE id IN ({placeholders})", chunk
+                )
+                results.update(rows)
+        except sqlite3.Error as e:
+            raise DBError(f"Failed to get {len(keys)} items: {e}") from e
+        return results
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        try:
+            with self._transaction() as conn:
+                results = [
+                    conn.execute(
+                        "UPDATE items SET value = ? WHERE id = ?", (value, key)
+                    ).rowcount
+                    > 0
+                    for key, value in items
+                ]
+            self._written(conn)
+            return results
+        except sqlite3.Error as e:
+            raise DBError(f"Failed to update {len(items)} items: {e}") from e
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        try:
+            with self._transaction() as conn:
+                results = [
+                    conn.execute("DELETE FROM items WHERE id = ?", (key,)).rowcount > 0
+                    for key in keys
+                ]
+            self._written(conn)
+            return results
+        except sqlite3.Error as e:
+            raise DBError(f"Failed to delete {len(keys)} items: {e}") from e
+
+    def list(self) -> List[dict[str, str]]:
+        try:
+            rows = self._connection().execute(
+                "SELECT id, value FROM items ORDER BY seq"
+            )
+            return [{"id": key, "value": value} for key, value in rows]
+        except sqlite3.Error as e:
+            raise DBFailedtoListItemsError(str(e)) from e
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        after_seq = decode_cursor(cursor) if cursor else 0
+        try:
+            # Fetch one extra row to find out whether another page exists
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT seq, id, value FROM items WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (after_seq, limit + 1),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            raise DBFailedtoListItemsError(str(e)) from e
+        results = [{"id": key, "value": value} for _, key, value in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return results, next_cursor
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            rows = self._connection().execute(
+                "SELECT id, value FROM items ORDER BY seq LIMIT ? OFFSET ?",
+                (n, offset),
+            )
+            return [{"id": key, "value": value} for key, value in rows]
+        except sqlite3.Error as e:
+            raise DBFailedtoListItemsError("Head operation failed.") from e
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        try:
+            rows = self._connection().execute(
+                "SELECT id, value FROM items ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (n, offset),
+            )
+            return [{"id": key, "value": value} for key, value in rows]
+        except sqlite3.Error as e:
+            raise DBFailedtoListItemsError("Tail operation failed.") from e
+
+    def count(self) -> int:
+        try:
+            return (
+                self._connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            )
+        except sqlite3.Error as e:
+            raise DBFailedToCountItemsError(str(e)) from e
+
+    def version(self) -> int:
+        return self._version
+
+    def close(self) -> None:
+        """Close the connections opened by every thread."""
+        self._closed.set()
+        self._poller.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .async_repository import AsyncBaseRepository
+from .base_repository import BaseRepository
+
+
+class ThreadPoolRepositoryAdapter(AsyncBaseRepository):
+    """Exposes a synchronous repository through the async interface.
+
+    Every call runs on a bounded thread pool, so a slow backend ties up at most
+    `max_workers` threads and never the event loop. Use `max_workers=1` for
+    repositories that are not safe to call from several threads at once.
+    """
+
+    def __init__(self, repository: BaseRepository, max_workers: int = 8):
+        self.repository = repository
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="repository"
+        )
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def get_by_id(self, key) -> dict[str, str]:
+        return await self._run(self.repository.get_by_id, key)
+
+    async def add_item(self, value: str) -> str:
+        return await self._run(self.repository.add_item, value)
+
+    async def update(self, key: str, value: str) -> None:
+        return await self._run(self.repository.update, key, value)
+
+    async def delete(self, key: str) -> None:
+        return await self._run(self.repository.delete, key)
+
+    async def add_items(self, values: List[str]) -> List[str]:
+        return await self._run(self.repository.add_items, values)
+
+    async def get_many(self, keys: List[str]) -> dict[str, str]:
+        return await self._run(self.repository.get_many, keys)
+
+    async def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        return await self._run(self.repository.update_many, items)
+
+    async def delete_many(self, keys: List[str]) -> List[bool]:
+        return await self._run(self.repository.delete_many, keys)
+
+    async def update_if(self, key: str, expected: str, value: str) -> None:
+        return await self._run(self.repository.update_if, key, expected, value)
+
+    async def delete_if(self, key: str, expected: str) -> None:
+        return await self._run(self.repository.delete_if, key, expected)
+
+    async def list(self) -> List[dict[str, str]]:
+        return await self._run(self.repository.list)
+
+    async def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        return await self._run(self.repository.page, limit, cursor)
+
+    async def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return await self._run(self.repository.head, n, offset)
+
+    async def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        return await self._run(self.repository.tail, n, offset)
+
+    async def count(self) -> int:
+        return await self._run(self.repository.count)
+
+    def version(self) -> int:
+        # Cheap and non-blocking by contract, so it skips the thread pool
+        return self.repository.version()
+
+    def close(self) -> None:
+        """Wait for pending calls and release the worker threads."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,119 @@
+import threading
+from typing import List, Optional, Tuple
+
+from .ids import IdGenerator
+from .in_memory_repository import InMemoryRepository
+from .snapshot import dump_snapshot
+
+
+class ThreadSafeInMemoryRepository(InMemoryRepository):
+    """`InMemoryRepository` that can be shared by many threads.
+
+    Every operation that touches more than one dict entry or the order index
+    runs under one lock, so each read sees the repository as it was between
+    two writes. Writers hold the lock for the few updates of one operation,
+    and readers only for the window they copy out:
+
+    * `head`, `tail` and `page` copy at most one window of immutable rows.
+    * `list` copies a snapshot of every row in insertion order. It is built
+      on the first call and from then on patched by each write (one slot per
+      update, an append per insert, a memmove per delete) instead of being
+      rebuilt, so neither readers nor writers ever wait for a full pass.
+    * `get_by_id` needs no lock, since a single dict lookup is atomic.
+
+    The lock is reentrant because the inherited batch and conditional writes
+    call the single item ones. A single lock is enough: the insertion order
+    index is shared by all keys, and with the GIL sharded locks would not let
+    writers run in parallel anyway.
+    """
+
+    thread_safe = True
+
+    def __init__(
+        self, data: dict[str, str] = {}, id_generator: Optional[IdGenerator] = None
+    ):
+        super().__init__(data, id_generator)
+        self._lock = threading.RLock()
+        self._snapshot: Optional[List[dict[str, str]]] = None
+
+    def save_snapshot(self, path: str) -> None:
+        with self._lock:
+            items = list(self._data.items())
+        dump_snapshot(path, items)
+
+    def get_by_id(self, key: str) -> dict[str, str]:
+        value = self._data.get(key)
+        if value is None:
+            return super().get_by_id(key)
+        return {key: value}
+
+    def add_item(self, value: str) -> str:
+        with self._lock:
+            key = super().add_item(value)
+            if self._snapshot is not None:
+                self._snapshot.append(self._row(key))
+            return key
+
+    def import_items(self, items: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            # A rejected batch adds nothing, so the snapshot stays valid
+            super().import_items(items)
+            if self._snapshot is not None:
+                self._snapshot.extend(self.format_results(dict(items)))
+
+    def get_many(self, keys: List[str]) -> dict[str, str]:
+        with self._lock:
+            return super().get_many(keys)
+
+    def update(self, key: str, value: str) -> None:
+        with self._lock:
+            super().update(key, value)
+            if self._snapshot is not None:
+                self._snapshot[self._order.rank_of(key)] = self._row(key)
+
+    def update_many(self, items: List[Tuple[str, str]]) -> List[bool]:
+        with self._lock:
+            return super().update_many(items)
+
+    def update_if(self, key: str, expected: str, value: str) -> None:
+        with self._lock:
+            super().update_if(key, expected, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            rank = self._order.rank_of(key) if key in self._data else None
+            super().delete(key)
+            if self._snapshot is not None:
+                del self._snapshot[rank]
+
+    def delete_many(self, keys: List[str]) -> List[bool]:
+        with self._lock:
+            return super().delete_many(keys)
+
+    def delete_if(self, key: str, expected: str) -> None:
+        with self._lock:
+            super().delete_if(key, expected)
+
+    def list(self) -> List[dict[str, str]]:
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = super().list()
+            return list(self._snapshot)
+
+    def page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict[str, str]], Optional[str]]:
+        with self._lock:
+            return super().page(limit, cursor)
+
+    def head(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        with self._lock:
+            return super().head(n, offset)
+
+    def tail(self, n: int, offset: int = 0) -> List[dict[str, str]]:
+        with self._lock:
+            return super().tail(n, offset)
+
+    def _row(self, key: str) -> dict[str, str]:
+        """Return the row of a key. Must be called with the lock held."""
+        return self._rows_for([key])[0]
@@ -0,0 +1,48 @@
+from typing import Hashable, Optional
+
+
+class ResponseCache:
+    """Encoded response bodies that are valid for one repository version.
+
+    Entries are looked up by (key, version), where the key names the endpoint
+    and its parameters and the version comes from the repository. As soon as a
+    newer version is seen every older entry is dropped, since it can never be
+    served again. A `max_size` of 0 disables the cache.
+
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._version: Optional[int] = None
+        self._bodies: dict[Hashable, bytes] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._bodies)}
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        body = self._bodies.get(key) if version == self._version else None
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def put(self, key: Hashable, version: int, body: bytes) -> None:
+        if self.max_size <= 0:
+            return
+        if self._version is None or version > self._version:
+            self._bodies.clear()
+            self._version = version
+        elif version < self._version:
+            # Built by a request that started before the latest write
+            return
+        if len(self._bodies) >= self.max_size and key not in self._bodies:
+            del self._bodies[next(iter(self._bodies))]
+        self._bodies[key] = body
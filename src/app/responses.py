@@ -0,0 +1,33 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is not installed
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` as compact UTF-8 JSON.
+
+    Uses orjson when it is installed and falls back to the standard library,
+    producing the same bytes `JSONResponse` would.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """`JSONResponse` that encodes straight to bytes with `dumps`.
+
+    Repository rows are already `{"id", "value"}` dicts, which orjson encodes
+    in a single call without any per-item work in Python.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,31 +1,193 @@
-from typing import Annotated
+from typing import Annotated, Any, AsyncIterable, AsyncIterator, Awaitable, Callable
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 
-from app.models import PostValue
-from app.repository.in_memory_repository import InMemoryRepository
-from app.service import ItemNotFoundError, ItemsService, ServerError, ValidationError
+from app.change_feed import ChangeFeed, ChangesExpiredError
+from app.config import settings
+from app.etag import collection_etag, item_etag, matches_if_none_match
+from app.models import BatchRequest, GetManyRequest, PostValue
+from app.repository.change_feed_repository import ChangeFeedRepository
+from app.repository.factory import create_repository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.response_cache import ResponseCache
+from app.responses import FastJSONResponse, dumps
+from app.service import (
+    AsyncItemsService,
+    ItemNotFoundError,
+    PreconditionFailedError,
+    ServerError,
+    ValidationError,
+)
+from app.single_flight import SingleFlight
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_SIZE = 500
+SSE_MEDIA_TYPE = "text/event-stream"
+DEFAULT_CHANGES_TIMEOUT = 30.0
+MAX_CHANGES_TIMEOUT = 60.0
+# An SSE comment is sent after this many idle seconds to keep proxies from
+# closing the connection
+SSE_KEEPALIVE_SECONDS = 15.0
 
-service = ItemsService(items_repository=InMemoryRepository())
+
+change_feed = ChangeFeed(settings.change_feed_size)
+repository = create_repository(settings, change_feed)
+if (
+    settings.repository_backend == "memory"
+    and settings.shard_count == 1
+    and settings.snapshot_path
+):
+    if settings.snapshot_interval > 0:
+        from app.repository.snapshot import PeriodicSnapshot
+
+        PeriodicSnapshot(
+            repository, settings.snapshot_path, settings.snapshot_interval
+        ).start()
+if settings.repository_backend != "shared":
+    repository = ChangeFeedRepository(repository, change_feed)
+elif settings.shard_count > 1:
+    # Each shard file numbers its own changes, so they do not make up one feed
+    change_feed = None
+read_cache = None
+if settings.cache_size > 0:
+    # Optional layers are imported only when enabled, to keep cold starts short
+    from app.repository.caching_repository import CachingRepository
+
+    repository = read_cache = CachingRepository(
+        repository, max_size=settings.cache_size, ttl=settings.cache_ttl
+    )
+recorder = None
+if settings.metrics_enabled:
+    from app.common import metrics
+    from app.metrics import MetricsRecorder
+    from app.repository.instrumented_repository import InstrumentedRepository
+
+    recorder = MetricsRecorder(metrics, settings.metrics_emf_interval)
+    repository = InstrumentedRepository(repository, recorder.record_operation)
+# Repositories that are not thread safe get their calls serialized on one thread
+max_workers = settings.repository_max_workers if repository.thread_safe else 1
+service = AsyncItemsService(
+    items_repository=ThreadPoolRepositoryAdapter(repository, max_workers=max_workers),
+    response_cache=ResponseCache(settings.response_cache_size),
+    change_feed=change_feed,
+    single_flight=SingleFlight(settings.coalesce_reads),
+)
 
 
-def get_items_service() -> ItemsService:
-    """Dependency to provide the ItemsService instance."""
+async def get_items_service() -> AsyncItemsService:
+    """Dependency to provide the ItemsService instance.
+
+    Declared async so FastAPI calls it on the event loop instead of handing
+    it to a worker thread on every request.
+    """
     return service
 
 
+async def ndjson_chunks(items: AsyncIterable[dict[str, str]]) -> AsyncIterator[bytes]:
+    """Encode items as newline-delimited JSON, a few hundred lines per chunk."""
+    lines = []
+    async for item in items:
+        lines.append(dumps(item))
+        if len(lines) >= NDJSON_CHUNK_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def sse_events(service: AsyncItemsService, since: int) -> AsyncIterator[bytes]:
+    """Stream changes after `since` as Server-Sent Events until the client leaves."""
+    while True:
+        try:
+            result = await service.changes(since, SSE_KEEPALIVE_SECONDS, MAX_PAGE_SIZE)
+        except ChangesExpiredError as e:
+            yield b"event: expired\ndata: " + dumps({"detail": str(e)}) + b"\n\n"
+            return
+        if not result["changes"]:
+            yield b": keepalive\n\n"
+            continue
+        for change in result["changes"]:
+            yield b"id: %d\nevent: change\ndata: %s\n\n" % (
+                change["seq"],
+                dumps(change),
+            )
+        since = result["last_seq"]
+
+
+async def cached_json_response(
+    service: AsyncItemsService,
+    key: tuple,
+    load: Callable[[], Awaitable[Any]],
+    if_none_match: str | None = None,
+) -> Response:
+    """Serve the body encoded for the current repository version, or build it.
+
+    The version is read before loading, so a write that lands in between can
+    only make the cached body (and its ETag) newer than its version, never
+    older. Clients that already hold the current version get a 304. Identical
+    requests that miss the cache at the same time share one load and encode.
+    """
+    version = service.version()
+    etag = collection_etag(service.instance_id, version)
+    if matches_if_none_match(if_none_match, etag):
+        return not_modified(etag)
+    body = service.response_cache.get(key, version)
+    if body is None:
+
+        async def encode() -> bytes:
+            body = dumps(await load())
+            service.response_cache.put(key, version, body)
+            return body
+
+        body = await service.single_flight.do((key, version), encode)
+    return Response(
+        body, status_code=200, media_type="application/json", headers={"ETag": etag}
+    )
+
+
 @router.get("/items")
-async def get_items(service: Annotated[ItemsService, Depends(get_items_service)]):
+async def get_items(
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
     try:
-        results = service.list()
-        return JSONResponse(
-            results,
-            status_code=200,
-            headers={"Content-Type": "application/json"},
+        if stream or (accept and NDJSON_MEDIA_TYPE in accept):
+            etag = collection_etag(service.instance_id, service.version())
+            if matches_if_none_match(if_none_match, etag):
+                return not_modified(etag)
+            return StreamingResponse(
+                ndjson_chunks(service.iter_items()),
+                status_code=200,
+                media_type=NDJSON_MEDIA_TYPE,
+                headers={"ETag": etag},
+            )
+        if limit is None and cursor is None:
+            return await cached_json_response(
+                service, ("items",), service.list, if_none_match
+            )
+        return await cached_json_response(
+            service,
+            ("items", limit, cursor),
+            lambda: service.page(limit or DEFAULT_PAGE_SIZE, cursor),
+            if_none_match,
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e),
         )
     except (ServerError, Exception):
         raise HTTPException(
@@ -34,16 +196,51 @@ async def get_items(service: Annotated[ItemsService, Depends(get_items_service)]
         )
 
 
+@router.post("/items:batch")
+async def batch_items(
+    batch: BatchRequest,
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+):
+    results = await service.batch(batch.operations)
+    return FastJSONResponse(
+        {"results": results},
+        status_code=200,
+    )
+
+
+@router.post("/items:get")
+async def get_many_items(
+    request: GetManyRequest,
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+):
+    try:
+        results = await service.get_many(request.ids)
+        return FastJSONResponse(
+            {"results": results},
+            status_code=200,
+        )
+    except ServerError:
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error",
+        )
+
+
 @router.get("/items/{item_id}")
 async def get_item(
-    item_id: str, service: Annotated[ItemsService, Depends(get_items_service)]
+    item_id: str,
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
     try:
-        item = service.get_item_by_id(item_id)
-        return JSONResponse(
+        item = await service.get_item_by_id(item_id)
+        etag = item_etag(item[item_id])
+        if matches_if_none_match(if_none_match, etag):
+            return not_modified(etag)
+        return FastJSONResponse(
             item,
             status_code=200,
-            headers={"Content-Type": "application/json"},
+            headers={"ETag": etag},
         )
     except ValidationError as e:
         raise HTTPException(
@@ -64,14 +261,14 @@ async def get_item(
 
 @router.post("/items")
 async def add_item(
-    input_data: PostValue, service: Annotated[ItemsService, Depends(get_items_service)]
+    input_data: PostValue,
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
 ):
     try:
-        new_item = service.add_item(input_data.model_dump())
-        return JSONResponse(
+        new_item = await service.add_item(input_data.model_dump())
+        return FastJSONResponse(
             new_item,
             status_code=201,
-            headers={"Content-Type": "application/json"},
         )
     except ValidationError as e:
         raise HTTPException(
@@ -89,16 +286,17 @@ async def add_item(
 async def update_item(
     item_id: str,
     input_data: PostValue,
-    service: Annotated[ItemsService, Depends(get_items_service)],
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+    if_match: Annotated[str | None, Header()] = None,
 ):
     try:
-        updated_item = service.update_item(
-            item_id=item_id, input_data=input_data.model_dump()
+        updated_item = await service.update_item(
+            item_id=item_id, input_data=input_data.model_dump(), if_match=if_match
         )
-        return JSONResponse(
+        return FastJSONResponse(
             updated_item,
             status_code=200,
-            headers={"Content-Type": "application/json"},
+            headers={"ETag": item_etag(input_data.value)},
         )
     except ValidationError as e:
         raise HTTPException(
@@ -110,6 +308,11 @@ async def update_item(
             status_code=404,
             detail=str(e),
         )
+    except PreconditionFailedError as e:
+        raise HTTPException(
+            status_code=412,
+            detail=str(e),
+        )
     except ServerError:
         raise HTTPException(
             status_code=500,
@@ -119,20 +322,26 @@ async def update_item(
 
 @router.delete("/items/{item_id}")
 async def delete_item(
-    item_id: str, service: Annotated[ItemsService, Depends(get_items_service)]
+    item_id: str,
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+    if_match: Annotated[str | None, Header()] = None,
 ):
     try:
-        service.delete_item(item_id)
-        return JSONResponse(
+        await service.delete_item(item_id, if_match=if_match)
+        return FastJSONResponse(
             {"message": "Item deleted successfully"},
             status_code=204,
-            headers={"Content-Type": "application/json"},
         )
     except ItemNotFoundError as e:
         raise HTTPException(
             status_code=404,
             detail=str(e),
         )
+    except PreconditionFailedError as e:
+        raise HTTPException(
+            status_code=412,
+            detail=str(e),
+        )
     except ServerError:
         raise HTTPException(
             status_code=500,
@@ -142,15 +351,17 @@ async def delete_item(
 
 @router.get("/tail")
 async def get_tail_items(
-    service: Annotated[ItemsService, Depends(get_items_service)],
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
     num_samples: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
     try:
-        results = service.tail(num_samples)
-        return JSONResponse(
-            results,
-            status_code=200,
-            headers={"Content-Type": "application/json"},
+        return await cached_json_response(
+            service,
+            ("tail", num_samples, offset),
+            lambda: service.tail(num_samples, offset),
+            if_none_match,
         )
     except ValidationError as e:
         raise HTTPException(
@@ -166,15 +377,17 @@ async def get_tail_items(
 
 @router.get("/head")
 async def get_head_items(
-    service: Annotated[ItemsService, Depends(get_items_service)],
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
     num_samples: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
     try:
-        results = service.head(num_samples)
-        return JSONResponse(
-            results,
-            status_code=200,
-            headers={"Content-Type": "application/json"},
+        return await cached_json_response(
+            service,
+            ("head", num_samples, offset),
+            lambda: service.head(num_samples, offset),
+            if_none_match,
         )
     except ValidationError as e:
         raise HTTPException(
@@ -186,3 +399,63 @@ async def get_head_items(
             status_code=500,
             detail="Internal Server Error",
         )
+
+
+@router.get("/changes")
+async def get_changes(
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+    since: int | None = Query(None, ge=0),
+    timeout: float = Query(DEFAULT_CHANGES_TIMEOUT, ge=0, le=MAX_CHANGES_TIMEOUT),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False),
+    accept: Annotated[str | None, Header()] = None,
+    last_event_id: Annotated[str | None, Header()] = None,
+):
+    if service.change_feed is None:
+        raise HTTPException(
+            status_code=404,
+            detail="The change feed is disabled, since the shards of the shared "
+            "backend number their changes separately",
+        )
+    try:
+        if stream or (accept and SSE_MEDIA_TYPE in accept):
+            if last_event_id and last_event_id.isdigit():
+                since = int(last_event_id)
+            # Check the starting point up front, so an expired one gets a 410
+            checked = await service.changes(since, 0, 1)
+            if since is None:
+                since = checked["last_seq"]
+            return StreamingResponse(
+                sse_events(service, since),
+                status_code=200,
+                media_type=SSE_MEDIA_TYPE,
+                headers={"Cache-Control": "no-cache"},
+            )
+        return await service.changes(since, timeout, limit)
+    except ChangesExpiredError as e:
+        raise HTTPException(
+            status_code=410,
+            detail=str(e),
+        )
+    except (ServerError, Exception):
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error",
+        )
+
+
+@router.get("/metrics")
+async def get_metrics(
+    service: Annotated[AsyncItemsService, Depends(get_items_service)],
+):
+    if recorder is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Metrics are disabled",
+        )
+    report = recorder.report()
+    report["single_flight"] = service.single_flight.stats
+    report["response_cache"] = service.response_cache.stats
+    if read_cache is not None:
+        report["read_cache"] = read_cache.stats
+    return report
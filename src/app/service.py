@@ -1,8 +1,24 @@
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
 from pydantic import ValidationError as PydanticValidationError
 
-from app.common import logger
-from app.models import PostValue
-from app.repository.base_repository import BaseRepository, DBError, DBItemNotFoundError
+from app.change_feed import ChangeFeed
+from app.common import events, logger
+from app.etag import item_etag, matches_if_match
+from app.models import BatchOperation, PostValue
+from app.repository.async_repository import AsyncBaseRepository
+from app.repository.base_repository import (
+    BaseRepository,
+    DBError,
+    DBInvalidCursorError,
+    DBItemNotFoundError,
+    DBPartialBatchError,
+    DBPreconditionFailedError,
+)
+from app.response_cache import ResponseCache
+from app.single_flight import SingleFlight
 
 
 class ValidationError(Exception):
@@ -21,6 +37,14 @@ class ItemNotFoundError(Exception):
         self.key = key
 
 
+class PreconditionFailedError(Exception):
+    """Exception raised when an If-Match precondition does not hold."""
+
+    def __init__(self, key):
+        super().__init__(f"Item with key '{key}' does not match the given ETag.")
+        self.key = key
+
+
 class ServerError(Exception):
     """Exception raised for server errors."""
 
@@ -29,138 +53,438 @@ class ServerError(Exception):
         self.message = message
 
 
+BatchRun = Tuple[str, List[Tuple[int, BatchOperation]]]
+
+
+def plan_batch(operations: List[Any], results: List) -> List[BatchRun]:
+    """Validate batch operations and group consecutive ones of the same kind.
+
+    Invalid entries get their error result written into `results` straight away
+    and are left out of the returned runs.
+    """
+    runs: List[BatchRun] = []
+    for index, entry in enumerate(operations):
+        try:
+            operation = BatchOperation.model_validate(entry)
+        except PydanticValidationError:
+            err_msg = "Invalid operation: expected data in the format: "
+            err_msg += "{'op': 'insert|update|delete', 'id': 'string', "
+            err_msg += f"'value': 'string'}} but got: {entry}"
+            results[index] = {"status": 400, "error": err_msg}
+            continue
+        if runs and runs[-1][0] == operation.op:
+            runs[-1][1].append((index, operation))
+        else:
+            runs.append((operation.op, [(index, operation)]))
+    return runs
+
+
+def record_run_results(op: str, entries: List, outcome: List, results: List):
+    """Write the per-operation results of one bulk repository call.
+
+    Operations whose outcome is None were not applied and get a server error.
+    """
+    ok_status = 200 if op == "update" else 204
+    for (index, operation), result in zip(entries, outcome):
+        if result is None:
+            results[index] = {
+                "op": op,
+                "id": operation.id,
+                "status": 500,
+                "error": "Internal Server Error",
+            }
+        elif op == "insert":
+            results[index] = {"op": op, "id": result, "status": 201}
+        elif result:
+            results[index] = {"op": op, "id": operation.id, "status": ok_status}
+        else:
+            results[index] = {
+                "op": op,
+                "id": operation.id,
+                "status": 404,
+                "error": str(ItemNotFoundError(operation.id)),
+            }
+
+
+def record_run_error(op: str, entries: List, error: Exception, results: List):
+    """Write the results of a bulk repository call that raised `error`.
+
+    The operations applied before a DBPartialBatchError keep their results;
+    the others are marked as server errors.
+    """
+    if isinstance(error, DBPartialBatchError):
+        logger.error(f"Batch {op} failed partway: {str(error)}")
+        record_run_results(op, entries, error.outcomes, results)
+    else:
+        logger.error(f"Batch {op} failed: {str(error)}")
+        record_run_results(op, entries, [None] * len(entries), results)
+
+
+def bulk_call(repository: Any, op: str, entries: List) -> Tuple[Any, List]:
+    """Return the bulk repository method for a run of operations and its argument."""
+    if op == "insert":
+        return repository.add_items, [operation.value for _, operation in entries]
+    if op == "update":
+        pairs = [(operation.id, operation.value) for _, operation in entries]
+        return repository.update_many, pairs
+    return repository.delete_many, [operation.id for _, operation in entries]
+
+
+def get_many_results(item_ids: List[str], found: dict[str, str]) -> List[dict]:
+    """Build one result per requested id from the items that were found."""
+    results = []
+    for item_id in item_ids:
+        if item_id in found:
+            results.append({"id": item_id, "status": 200, "value": found[item_id]})
+        else:
+            error = str(ItemNotFoundError(item_id))
+            results.append({"id": item_id, "status": 404, "error": error})
+    return results
+
+
+def validation_error(err_msg: str, log: bool = True) -> ValidationError:
+    if log:
+        logger.error(err_msg)
+    return ValidationError(err_msg)
+
+
+def check_item_id(item_id: str, err_msg: str) -> None:
+    if not item_id:
+        raise validation_error(err_msg)
+
+
+def check_window(name: str, n: int, offset: int) -> None:
+    """Validate the arguments of `head` and `tail`."""
+    # Errors of tail were never logged
+    log = name == "head"
+    if n <= 0:
+        err_msg = f"{name}: The number of items to return must be greater than zero."
+        raise validation_error(err_msg, log)
+    if offset < 0:
+        raise validation_error(f"{name}: The offset must not be negative.", log)
+
+
+def check_limit(limit: int) -> None:
+    if limit <= 0:
+        raise validation_error(
+            "page: The number of items to return must be greater than zero."
+        )
+
+
+def parse_value(input_data: dict[str, str]) -> str:
+    """Validate a request body against PostValue and return its value."""
+    try:
+        return PostValue(**input_data).value
+    except PydanticValidationError as e:
+        err_msg = "Invalid input data: "
+        err_msg += "expected data in the format: {'value': 'string'}"
+        err_msg += f" but got: {input_data}"
+        raise validation_error(err_msg) from e
+
+
+def check_if_match(item_id: str, if_match: str, item: dict[str, str]) -> str:
+    """Return the value of a fetched item if its ETag matches `if_match`."""
+    current = item[item_id]
+    if not matches_if_match(if_match, item_etag(current)):
+        raise DBPreconditionFailedError(item_id)
+    return current
+
+
+@contextmanager
+def service_errors(
+    item_id: Optional[str] = None,
+    action: Optional[str] = None,
+    if_match: Optional[str] = None,
+) -> Iterator[None]:
+    """Turn the repository errors raised in the block into logged service errors.
+
+    With an `item_id`, missing items and failed preconditions become
+    ItemNotFoundError and PreconditionFailedError; `action` names the write
+    in their log messages. Invalid cursors become ValidationError, and every
+    other error a ServerError.
+    """
+    try:
+        yield
+    except DBInvalidCursorError as e:
+        logger.error(str(e))
+        raise ValidationError(str(e)) from e
+    except DBItemNotFoundError as e:
+        if item_id is None:
+            raise server_error(e) from e
+        if action is None:
+            logger.error(str(e))
+        else:
+            logger.error(f"On {action}, item id; '{item_id}' was not found")
+        raise ItemNotFoundError(item_id) from e
+    except DBPreconditionFailedError as e:
+        if item_id is None:
+            raise server_error(e) from e
+        logger.error(f"On {action}, item id; '{item_id}' did not match {if_match}")
+        raise PreconditionFailedError(item_id) from e
+    except Exception as e:
+        raise server_error(e) from e
+
+
+def server_error(e: Exception) -> ServerError:
+    if isinstance(e, DBError):
+        err_msg = f"Database error occurred: {str(e)}"
+    else:
+        err_msg = f"An unexpected error occurred: {str(e)}"
+    logger.error(err_msg)
+    return ServerError(err_msg)
+
+
+def log_update(item_id: str, input_data: dict[str, str]) -> None:
+    events.info(
+        "item.update",
+        "Update operation body: %s, item_id: %s",
+        input_data,
+        item_id,
+        item_id=item_id,
+    )
+
+
+def log_batch(operations: List[Any]) -> None:
+    events.info(
+        "items.batch",
+        "Applying batch of %d operations",
+        len(operations),
+        operations=len(operations),
+    )
+
+
 class ItemsService:
+    """Validates requests and maps repository errors for a synchronous repository.
+
+    The checks and error mapping are the module-level helpers shared with
+    `AsyncItemsService`; this class only makes the repository calls.
+    """
+
     def __init__(self, items_repository: BaseRepository):
         self.items_repository = items_repository
 
     def list(self):
-        try:
-            logger.info("Listing all items")
+        events.info("items.list", "Listing all items")
+        with service_errors():
             return self.items_repository.list()
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
+
+    def iter_items(self):
+        """Iterate over all items without materializing the whole collection."""
+        events.info("items.stream", "Streaming all items")
+        with service_errors():
+            yield from self.items_repository.iter_items()
+
+    def page(self, limit: int, cursor: str | None = None):
+        check_limit(limit)
+        with service_errors():
+            items, next_cursor = self.items_repository.page(limit, cursor)
+        return {"items": items, "next_cursor": next_cursor}
 
     def get_item_by_id(self, item_id: str):
         if not item_id:
-            logger.info(f"Getting item {item_id}")
+            events.info("item.get", "Getting item %s", item_id, item_id=item_id)
             raise ValidationError("Item ID must be provided.")
-        try:
+        with service_errors(item_id):
             return self.items_repository.get_by_id(item_id)
-        except DBItemNotFoundError as e:
-            logger.error(str(e))
-            raise ItemNotFoundError(item_id) from e
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
 
     def add_item(self, input_data: dict[str, str]):
-        logger.info(f"Adding data from {input_data}")
-        try:
-            # Validate the item_data against PostValue model
-            item = PostValue(**input_data)
-            new_id: str = self.items_repository.add_item(item.value)
-            return {"id": new_id}
-        except PydanticValidationError as e:
-            err_msg = "Invalid input data: "
-            err_msg += "expected data in the format: {'value': 'string'}"
-            err_msg += f" but got: {input_data}"
-            logger.error(err_msg)
-            raise ValidationError(err_msg) from e
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
+        events.info("item.add", "Adding data from %s", input_data)
+        value = parse_value(input_data)
+        with service_errors():
+            return {"id": self.items_repository.add_item(value)}
 
-    def update_item(self, item_id: str, input_data: dict[str, str]):
-        logger.info(f"Update operation body: {input_data}, item_id: {item_id}")
-        if not item_id:
-            err_msg = "Item ID must be provided for update."
-            logger.error(err_msg)
-            raise ValidationError(err_msg)
-        try:
-            # Validate the item_data against PutValue model
-            item = PostValue(**input_data)
-            self.items_repository.update(item_id, item.value)
-        except PydanticValidationError as e:
-            err_msg = "Invalid input data: "
-            err_msg += f"expected data in the format: {'value': 'string'}"
-            err_msg += f" but got: {input_data.__dict__}"
-            logger.error(err_msg)
-            raise ValidationError(err_msg) from e
-        except DBItemNotFoundError as e:
-            logger.error(f"On update, item id; '{item_id}' was not found")
-            raise ItemNotFoundError(item_id) from e
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
+    def update_item(
+        self, item_id: str, input_data: dict[str, str], if_match: Optional[str] = None
+    ):
+        log_update(item_id, input_data)
+        check_item_id(item_id, "Item ID must be provided for update.")
+        value = parse_value(input_data)
+        with service_errors(item_id, "update", if_match):
+            if if_match is None:
+                self.items_repository.update(item_id, value)
+            else:
+                current = self._matching_value(item_id, if_match)
+                self.items_repository.update_if(item_id, current, value)
+
+    def _matching_value(self, item_id: str, if_match: str) -> str:
+        item = self.items_repository.get_by_id(item_id)
+        return check_if_match(item_id, if_match, item)
+
+    def delete_item(self, item_id: str, if_match: Optional[str] = None):
+        check_item_id(item_id, "Item ID must be provided for deletion. Received None")
+        with service_errors(item_id, "delete", if_match):
+            if if_match is None:
+                return self.items_repository.delete(item_id)
+            current = self._matching_value(item_id, if_match)
+            return self.items_repository.delete_if(item_id, current)
+
+    def version(self) -> int:
+        """Return the repository version, which increases with every write."""
+        with service_errors():
+            return self.items_repository.version()
+
+    def head(self, n: int, offset: int = 0):
+        check_window("head", n, offset)
+        with service_errors():
+            return self.items_repository.head(n, offset)
+
+    def tail(self, n: int, offset: int = 0):
+        check_window("tail", n, offset)
+        with service_errors():
+            return self.items_repository.tail(n, offset)
+
+    def get_many(self, item_ids: List[str]):
+        """Retrieve several items, reporting a status for each requested id."""
+        with service_errors():
+            found = self.items_repository.get_many(item_ids)
+        return get_many_results(item_ids, found)
+
+    def batch(self, operations: List[Any]):
+        """Apply a list of insert, update and delete operations.
+
+        Consecutive operations of the same kind are sent to the repository as a
+        single bulk call. Each operation gets its own result, so one bad entry
+        does not fail the rest of the batch, and when a bulk call fails partway
+        only the operations it did not apply are reported as server errors.
+        """
+        log_batch(operations)
+        results: List = [None] * len(operations)
+        for op, entries in plan_batch(operations, results):
+            call, argument = bulk_call(self.items_repository, op, entries)
+            try:
+                record_run_results(op, entries, call(argument), results)
+            except Exception as e:
+                record_run_error(op, entries, e, results)
+        return results
+
+
+class AsyncItemsService:
+    """Variant of `ItemsService` for repositories with an async interface."""
+
+    def __init__(
+        self,
+        items_repository: AsyncBaseRepository,
+        response_cache: Optional[ResponseCache] = None,
+        change_feed: Optional[ChangeFeed] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        self.items_repository = items_repository
+        # Distinguishes collection ETags issued by different processes
+        self.instance_id = uuid4().hex[:12]
+        # Encoded bodies of repeated reads, reused until the next write
+        self.response_cache = (
+            response_cache if response_cache is not None else ResponseCache()
+        )
+        # Fed by a ChangeFeedRepository wrapped around the repository
+        self.change_feed = change_feed
+        # Shares the reads (and encodings) that identical requests run at once
+        self.single_flight = (
+            single_flight if single_flight is not None else SingleFlight()
+        )
+
+    async def list(self):
+        events.info("items.list", "Listing all items")
+        with service_errors():
+            return await self.items_repository.list()
+
+    async def iter_items(self):
+        """Iterate over all items without materializing the whole collection."""
+        events.info("items.stream", "Streaming all items")
+        with service_errors():
+            async for item in self.items_repository.iter_items():
+                yield item
+
+    async def changes(self, since: Optional[int], timeout: float, limit: int):
+        """Return the changes after `since`, waiting up to `timeout` for new ones.
+
+        Without `since` only changes made from now on are returned. Raises
+        ChangesExpiredError when the changes after `since` are no longer held.
+        """
+        if self.change_feed is None:
+            err_msg = "The change feed is not enabled."
             logger.error(err_msg)
-            raise ServerError(err_msg) from e
+            raise ServerError(err_msg)
+        if since is None:
+            since = self.change_feed.last_seq
+        changes = await self.change_feed.wait(since, timeout, limit)
+        return {
+            "changes": changes,
+            "last_seq": changes[-1]["seq"] if changes else since,
+        }
+
+    async def page(self, limit: int, cursor: str | None = None):
+        check_limit(limit)
+        with service_errors():
+            items, next_cursor = await self.items_repository.page(limit, cursor)
+        return {"items": items, "next_cursor": next_cursor}
 
-    def delete_item(self, item_id: str):
+    async def get_item_by_id(self, item_id: str):
         if not item_id:
-            err_msg = "Item ID must be provided for deletion. Received None"
-            logger.error(err_msg)
-            raise ValidationError(err_msg)
-        try:
-            return self.items_repository.delete(item_id)
-        except DBItemNotFoundError as e:
-            logger.error(f"On delete, item id; '{item_id}' was not found")
-            raise ItemNotFoundError(item_id) from e
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
+            events.info("item.get", "Getting item %s", item_id, item_id=item_id)
+            raise ValidationError("Item ID must be provided.")
+        with service_errors(item_id):
+            return await self.items_repository.get_by_id(item_id)
 
-    def head(self, n: int):
-        if n <= 0:
-            err_msg = "head: The number of items to return must be greater than zero."
-            logger.error(err_msg)
-            raise ValidationError(err_msg)
-        try:
-            return self.items_repository.head(n)
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
+    async def add_item(self, input_data: dict[str, str]):
+        events.info("item.add", "Adding data from %s", input_data)
+        value = parse_value(input_data)
+        with service_errors():
+            return {"id": await self.items_repository.add_item(value)}
 
-    def tail(self, n: int):
-        if n <= 0:
-            err_msg = "tail: The number of items to return must be greater than zero."
-            raise ValidationError(err_msg)
-        try:
-            return self.items_repository.tail(n)
-        except DBError as e:
-            err_msg = f"Database error occurred: {str(e)}"
-            logger.error(err_msg)
-            raise ServerError(err_msg) from e
-        except Exception as e:
-            err_msg = f"An unexpected error occurred: {str(e)}"
-            logger.error(err_msg)
+    async def update_item(
+        self, item_id: str, input_data: dict[str, str], if_match: Optional[str] = None
+    ):
+        log_update(item_id, input_data)
+        check_item_id(item_id, "Item ID must be provided for update.")
+        value = parse_value(input_data)
+        with service_errors(item_id, "update", if_match):
+            if if_match is None:
+                await self.items_repository.update(item_id, value)
+            else:
+                current = await self._matching_value(item_id, if_match)
+                await self.items_repository.update_if(item_id, current, value)
+
+    async def _matching_value(self, item_id: str, if_match: str) -> str:
+        item = await self.items_repository.get_by_id(item_id)
+        return check_if_match(item_id, if_match, item)
+
+    async def delete_item(self, item_id: str, if_match: Optional[str] = None):
+        check_item_id(item_id, "Item ID must be provided for deletion. Received None")
+        with service_errors(item_id, "delete", if_match):
+            if if_match is None:
+                return await self.items_repository.delete(item_id)
+            current = await self._matching_value(item_id, if_match)
+            return await self.items_repository.delete_if(item_id, current)
+
+    def version(self) -> int:
+        """Return the repository version, which increases with every write."""
+        with service_errors():
+            return self.items_repository.version()
+
+    async def head(self, n: int, offset: int = 0):
+        check_window("head", n, offset)
+        with service_errors():
+            return await self.items_repository.head(n, offset)
+
+    async def tail(self, n: int, offset: int = 0):
+        check_window("tail", n, offset)
+        with service_errors():
+            return await self.items_repository.tail(n, offset)
+
+    async def get_many(self, item_ids: List[str]):
+        """Retrieve several items, reporting a status for each requested id."""
+        with service_errors():
+            found = await self.items_repository.get_many(item_ids)
+        return get_many_results(item_ids, found)
 
-            raise ServerError(err_msg) from e
+    async def batch(self, operations: List[Any]):
+        """Apply a list of insert, update and delete operations, like `ItemsService`."""
+        log_batch(operations)
+        results: List = [None] * len(operations)
+        for op, entries in plan_batch(operations, results):
+            call, argument = bulk_call(self.items_repository, op, entries)
+            try:
+                record_run_results(op, entries, await call(argument), results)
+            except Exception as e:
+                record_run_error(op, entries, e, results)
+        return results
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share it.
+
+    The first caller for a key starts the call as a task and every caller that
+    arrives while it is running awaits the same task, getting the same result
+    or exception. Once the call finishes the key is forgotten, so nothing is
+    cached beyond the calls in flight.
+
+    A caller that is cancelled stops waiting but does not cancel the shared
+    call, which the other callers may still need.
+
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        # Calls actually made, and callers that joined one instead
+        self.executions = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            self.executions += 1
+            return await call()
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
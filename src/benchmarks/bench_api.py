@@ -0,0 +1,85 @@
+"""Measure requests per second of API reads, with and without the response cache.
+
+Requests are passed straight to the ASGI app in-process, so the numbers cover
+routing, the service, the repository and JSON encoding but not the network.
+Run from the `src` directory:
+
+    python -m benchmarks.bench_api --items 10000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.app import api
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.response_cache import ResponseCache
+from app.router import get_items_service
+from app.service import AsyncItemsService
+from benchmarks.common import asgi_request, dump_json, print_table
+
+PATHS = [("/head", "num_samples=100"), ("/tail", "num_samples=100")]
+
+
+async def requests_per_second(
+    path: str, query: str, requests: int, concurrency: int
+) -> float:
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            status, _ = await asgi_request(api, "GET", path, query)
+            assert status == 200, status
+
+    await worker(10)
+    per_worker = requests // concurrency
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return per_worker * concurrency / elapsed
+
+
+def bench(items: int, requests: int, concurrency: int, cache_size: int) -> list:
+    repository = InMemoryRepository()
+    repository.add_items([f"value-{i}" for i in range(items)])
+    service = AsyncItemsService(
+        ThreadPoolRepositoryAdapter(repository, max_workers=1),
+        response_cache=ResponseCache(cache_size),
+    )
+
+    async def get_service():
+        return service
+
+    api.dependency_overrides[get_items_service] = get_service
+    try:
+        return [
+            {
+                "endpoint": f"{path}?{query}",
+                "response_cache": "on" if cache_size else "off",
+                "requests/s": asyncio.run(
+                    requests_per_second(path, query, requests, concurrency)
+                ),
+            }
+            for path, query in PATHS
+        ]
+    finally:
+        api.dependency_overrides.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for cache_size in (0, 256):
+        rows += bench(args.items, args.requests, args.concurrency, cache_size)
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
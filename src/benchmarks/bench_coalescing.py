@@ -0,0 +1,96 @@
+"""Measure bursts of identical reads against a slow backend, with and without coalescing.
+
+Every request asks for the same `/head` window while the response cache is
+off, so without coalescing each one makes its own repository call. The
+backend sleeps for `--latency` milliseconds per call to stand in for a
+remote database. Run from the `src` directory:
+
+    python -m benchmarks.bench_coalescing --concurrency 200 --latency 5
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.app import api
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.response_cache import ResponseCache
+from app.router import get_items_service
+from app.service import AsyncItemsService
+from app.single_flight import SingleFlight
+from benchmarks.common import asgi_request, dump_json, print_table
+
+
+class SlowRepository(InMemoryRepository):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    def head(self, n, offset=0):
+        self.calls += 1
+        time.sleep(self.latency)
+        return super().head(n, offset)
+
+
+async def burst(concurrency: int, bursts: int, query: str) -> float:
+    async def request() -> None:
+        status, _ = await asgi_request(api, "GET", "/head", query)
+        assert status == 200, status
+
+    started = time.perf_counter()
+    for _ in range(bursts):
+        await asyncio.gather(*(request() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return concurrency * bursts / elapsed
+
+
+def bench(args, enabled: bool) -> dict:
+    repository = SlowRepository(args.latency / 1000)
+    repository.add_items([f"value-{i}" for i in range(args.items)])
+    single_flight = SingleFlight(enabled)
+    adapter = ThreadPoolRepositoryAdapter(repository, max_workers=args.workers)
+    service = AsyncItemsService(
+        adapter, response_cache=ResponseCache(0), single_flight=single_flight
+    )
+
+    async def get_service():
+        return service
+
+    api.dependency_overrides[get_items_service] = get_service
+    try:
+        rate = asyncio.run(
+            burst(args.concurrency, args.bursts, f"num_samples={args.num_samples}")
+        )
+    finally:
+        api.dependency_overrides.clear()
+        adapter.close()
+    requests = args.concurrency * args.bursts
+    return {
+        "coalescing": "on" if enabled else "off",
+        "requests/s": rate,
+        "repository calls": repository.calls,
+        "coalesced %": 100 * single_flight.coalesced / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--num-samples", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=5.0, help="Milliseconds")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [bench(args, enabled) for enabled in (False, True)]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure the thread-safe in-memory repository shared by several threads.
+
+Each thread runs the same mix of reads and writes; the table shows the total
+operations per second and the slowest single write, which grows when readers
+hold the lock for long. Run from the `src` directory:
+
+    python -m benchmarks.bench_concurrency --items 100000 --threads 1 2 4 8
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from app.repository.thread_safe_repository import ThreadSafeInMemoryRepository
+from benchmarks.common import dump_json, print_table
+
+
+def run(repository, keys, threads: int, ops: int, write_ratio: float) -> dict:
+    max_write = [0.0]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        barrier.wait()
+        for i in range(ops):
+            roll = rng.random()
+            if roll < write_ratio:
+                started = time.perf_counter()
+                repository.update(rng.choice(keys), f"updated-{i}")
+                max_write[0] = max(max_write[0], time.perf_counter() - started)
+            elif roll < 0.5:
+                repository.get_by_id(rng.choice(keys))
+            elif roll < 0.95:
+                repository.head(100, rng.randrange(len(keys)))
+            else:
+                repository.list()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "threads": threads,
+        "ops/s": threads * ops / elapsed,
+        "max write ms": max_write[0] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=2_000, help="Per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    repository = ThreadSafeInMemoryRepository()
+    keys = repository.add_items([f"value-{i}" for i in range(args.items)])
+    # Build the list snapshot and the key index outside the timed runs
+    repository.list()
+    repository.update(keys[0], "value-0")
+    rows = [
+        run(repository, keys, threads, args.ops, args.write_ratio)
+        for threads in args.threads
+    ]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare the id schemes: generation speed, and their effect on disk stores.
+
+The first table shows how many ids per second each scheme generates. The
+second inserts items in batches into the SQLite and log-structured backends
+and shows the insert rate and, for SQLite, the size of the unique index on
+`id` and of the whole database. Random uuid4 ids land all over the index,
+so each batch touches pages across all of it, while time-ordered ids are
+appended at its right edge. Run from the `src` directory:
+
+    python -m benchmarks.bench_ids --items 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.repository.ids import ID_SCHEMES, create_id_generator
+from app.repository.log_structured_repository import LogStructuredRepository
+from app.repository.sqlite_repository import SqliteRepository
+from benchmarks.common import dump_json, ops_per_second, print_table
+
+BATCH_SIZE = 1000
+
+
+def insert_rate(repository, items: int) -> float:
+    values = [f"value-{i}" for i in range(BATCH_SIZE)]
+    started = time.perf_counter()
+    for _ in range(items // BATCH_SIZE):
+        repository.add_items(values)
+    return items / (time.perf_counter() - started)
+
+
+def sqlite_sizes(path: str) -> tuple[float, float]:
+    """Return the size in KiB of the id index and of the database."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    (index,) = conn.execute(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_items_1'"
+    ).fetchone()
+    conn.close()
+    return index / 1024, os.path.getsize(path) / 1024
+
+
+def run_stores(scheme: str, items: int) -> dict:
+    row = {"scheme": scheme}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "items.db")
+        sqlite = SqliteRepository(path, id_generator=create_id_generator(scheme))
+        row["sqlite inserts/s"] = insert_rate(sqlite, items)
+        row["index KiB"], row["db KiB"] = sqlite_sizes(path)
+        log = LogStructuredRepository(
+            os.path.join(directory, "log"), id_generator=create_id_generator(scheme)
+        )
+        row["log inserts/s"] = insert_rate(log, items)
+        log.close()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    generation = []
+    for scheme in ID_SCHEMES:
+        generate = create_id_generator(scheme)
+        generation.append(
+            {
+                "scheme": scheme,
+                "length": len(generate()),
+                "ids/s": ops_per_second(lambda _: generate(), args.items),
+            }
+        )
+    print_table(generation, list(generation[0]))
+    print()
+    stores = [run_stores(scheme, args.items) for scheme in ID_SCHEMES]
+    print_table(stores, list(stores[0]))
+    if args.json:
+        dump_json({"generation": generation, "stores": stores}, args.json)
+
+
+if __name__ == "__main__":
+    main()
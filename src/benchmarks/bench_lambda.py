@@ -0,0 +1,171 @@
+"""Compare the native Lambda handler with uvicorn behind the web adapter.
+
+Replays recorded API Gateway events through both ways of running the API:
+
+* native: `app.lambda_handler.handler` called in process, the way the Lambda
+  runtime calls it.
+* adapter: a uvicorn server, as started by `boot.sh`, with every event turned
+  into an HTTP request on loopback and the response turned back into a result,
+  which is the work the Lambda Web Adapter does.
+
+Each path runs in a fresh process. Cold init is the time from starting that
+process until the first event can be handled: importing the app for the
+native handler, or uvicorn accepting connections. The table then shows the
+first invocation and the latency percentiles of the following ones. Run from
+the `src` directory:
+
+    python -m benchmarks.bench_lambda --rounds 200
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import dump_json, print_table
+
+EVENTS_PATH = os.path.join(os.path.dirname(__file__), "data", "lambda_events.json")
+PORT = 8765
+
+
+def summarize(path: str, init: float, latencies: list[float]) -> dict:
+    first, rest = latencies[0], sorted(latencies[1:])
+    return {
+        "path": path,
+        "cold init ms": init * 1000,
+        "first call ms": first * 1000,
+        "p50 ms": statistics.median(rest) * 1000,
+        "p99 ms": rest[int(len(rest) * 0.99)] * 1000,
+        "calls/s": len(rest) / sum(rest),
+    }
+
+
+def replay(invoke, events: list[dict], rounds: int) -> list[float]:
+    latencies = []
+    for _ in range(rounds):
+        for event in events:
+            started = time.perf_counter()
+            invoke(event)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+# Native handler, run in a child process
+
+
+def native_child(output_path: str, rounds: int) -> None:
+    from app.lambda_handler import handler
+
+    # Wall clock time, so the parent can compare it with when it started us
+    ready = time.time()
+    with open(EVENTS_PATH) as f:
+        events = json.load(f)
+    latencies = replay(handler, events, rounds)
+    with open(output_path, "w") as f:
+        json.dump({"ready": ready, "latencies": latencies}, f)
+
+
+def run_native(rounds: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "result.json")
+        started = time.time()
+        # The app logs to stdout, so the results are passed back in a file
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_lambda"]
+            + ["--native-child", output_path, "--rounds", str(rounds)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(output_path) as f:
+            result = json.load(f)
+    return summarize("native", result["ready"] - started, result["latencies"])
+
+
+# uvicorn behind the web adapter
+
+
+def adapter_invoke(connection: http.client.HTTPConnection, event: dict) -> dict:
+    """Forward an event as an HTTP request, like the Lambda Web Adapter."""
+    if event.get("version") == "2.0":
+        method = event["requestContext"]["http"]["method"]
+        target = event["rawPath"]
+        query = event.get("rawQueryString", "")
+    else:
+        method = event["httpMethod"]
+        target = event["path"]
+        query = urlencode(event.get("queryStringParameters") or {})
+    if query:
+        target += "?" + query
+    connection.request(
+        method, target, body=event.get("body"), headers=event.get("headers") or {}
+    )
+    response = connection.getresponse()
+    return {
+        "statusCode": response.status,
+        "headers": dict(response.getheaders()),
+        "body": response.read().decode(),
+    }
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+def run_adapter(events: list[dict], rounds: int) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.app:api", "--port", str(PORT)]
+        + ["--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(PORT)
+        init = time.perf_counter() - started
+        # The adapter keeps its connection to the server open across events
+        connection = http.client.HTTPConnection("127.0.0.1", PORT)
+        latencies = replay(
+            lambda event: adapter_invoke(connection, event), events, rounds
+        )
+        connection.close()
+    finally:
+        server.terminate()
+        server.wait()
+    return summarize("adapter", init, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--native-child", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    if args.native_child:
+        native_child(args.native_child, args.rounds)
+        return
+
+    with open(EVENTS_PATH) as f:
+        events = json.load(f)
+    rows = [run_native(args.rounds), run_adapter(events, args.rounds)]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
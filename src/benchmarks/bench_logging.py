@@ -0,0 +1,126 @@
+"""Measure request throughput with logging on, sampled and off.
+
+Requests that log an event (`POST /items` and `PUT /items/{id}`) are sent in
+process to the API while the service logs through:
+
+* sync: every event, written to the stream by a plain `StreamHandler`
+  before the request continues;
+* batched: every event, queued for `QueueBatchingHandler` to write;
+* sampled: `--sample-rate` of the events, batched;
+* off: the logger level above the events, so nothing is formatted.
+
+Logs go to /dev/null, which leaves out the cost of the stream itself. The
+rounds of the setups are interleaved and the fastest of each is kept. Run
+from the `src` directory:
+
+    python -m benchmarks.bench_logging --rounds 10 --sample-rate 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from aws_lambda_powertools import Logger
+from fastapi import FastAPI
+
+from app import service as service_module
+from app.log import EventLogger, QueueBatchingHandler
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.router import get_items_service, router
+from app.service import AsyncItemsService
+from benchmarks.common import asgi_request, dump_json, print_table
+
+EVENTS = ["item.add", "item.update"]
+
+
+def build_api() -> tuple[FastAPI, str]:
+    repository = InMemoryRepository()
+    key = repository.add_items([f"value-{i}" for i in range(1000)])[0]
+    api = FastAPI()
+    api.include_router(router)
+    service = AsyncItemsService(ThreadPoolRepositoryAdapter(repository, max_workers=1))
+
+    async def get_service():
+        return service
+
+    api.dependency_overrides[get_items_service] = get_service
+    return api, f"/items/{key}"
+
+
+def build_events(name: str, handler, level: int, rates: dict) -> EventLogger:
+    logger = Logger(service=f"bench-{name}", logger_handler=handler, level=level)
+    return EventLogger(logger, rates)
+
+
+async def seconds_per_request(
+    api: FastAPI, path: str, seconds: float, handler: logging.Handler
+) -> float:
+    """Alternate adds and updates for `seconds`; return the time per request.
+
+    The time includes writing out what the handler still had queued.
+    """
+    body = json.dumps({"value": "logged"}).encode()
+    requests = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        await asgi_request(api, "POST", "/items", body=body)
+        await asgi_request(api, "PUT", path, body=body)
+        requests += 2
+    handler.flush()
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=0.5, help="Per round")
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    sampled = {event: args.sample_rate for event in EVENTS}
+    handlers = {
+        "sync": logging.StreamHandler(devnull),
+        "batched": QueueBatchingHandler(devnull),
+        "sampled": QueueBatchingHandler(devnull),
+        "off": QueueBatchingHandler(devnull),
+    }
+    setups = {
+        "sync": build_events("sync", handlers["sync"], logging.INFO, {}),
+        "batched": build_events("batched", handlers["batched"], logging.INFO, {}),
+        "sampled": build_events("sampled", handlers["sampled"], logging.INFO, sampled),
+        "off": build_events("off", handlers["off"], logging.WARNING, {}),
+    }
+    api, path = build_api()
+    timings = {name: float("inf") for name in setups}
+    for _ in range(args.rounds):
+        for name, events in setups.items():
+            service_module.events = events
+            seconds = asyncio.run(
+                seconds_per_request(api, path, args.seconds, handlers[name])
+            )
+            timings[name] = min(timings[name], seconds)
+
+    rows = [
+        {
+            "logging": name,
+            "written": args.sample_rate if name == "sampled" else int(name != "off"),
+            "requests/s": 1 / seconds,
+            "us/request": seconds * 1e6,
+            "vs off us": (seconds - timings["off"]) * 1e6,
+        }
+        for name, seconds in timings.items()
+    ]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
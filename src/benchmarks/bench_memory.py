@@ -0,0 +1,57 @@
+"""Measure the memory used per item by the in-memory repositories.
+
+Run from the `src` directory:
+
+    python -m benchmarks.bench_memory --items 100000
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from app.repository.compact_repository import CompactInMemoryRepository
+from app.repository.in_memory_repository import InMemoryRepository
+from benchmarks.common import dump_json, print_table
+
+BACKENDS = {
+    "memory": InMemoryRepository,
+    "compact": CompactInMemoryRepository,
+}
+
+
+def bench_backend(name: str, items: int, value_size: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    values = [f"{i:0{value_size}d}" for i in range(items)]
+    repository = BACKENDS[name]()
+    repository.add_items(values)
+    # Only count what the repository keeps alive
+    del values
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "backend": name,
+        "items": items,
+        "value_chars": value_size,
+        "bytes/item": used / items,
+        "total_mb": used / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--value-size", type=int, default=16)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [bench_backend(name, args.items, args.value_size) for name in args.backends]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measure what recording metrics costs per request and per repository call.
+
+The first table times the recording calls on their own. The second sends
+requests in process to the API with and without `MetricsMiddleware` and the
+`InstrumentedRepository` wrapper, and shows the difference per request. Run
+from the `src` directory:
+
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from app.metrics import MetricsMiddleware, MetricsRecorder
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.instrumented_repository import InstrumentedRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.router import get_items_service, router
+from app.service import AsyncItemsService
+from benchmarks.common import asgi_request, dump_json, ops_per_second, print_table
+
+ROUNDS = 10
+
+
+def build_api(instrumented: bool) -> tuple[FastAPI, str]:
+    repository = InMemoryRepository()
+    key = repository.add_items([f"value-{i}" for i in range(1000)])[0]
+    api = FastAPI()
+    api.include_router(router)
+    if instrumented:
+        recorder = MetricsRecorder()
+        repository = InstrumentedRepository(repository, recorder.record_operation)
+        api.add_middleware(MetricsMiddleware, recorder=recorder)
+    service = AsyncItemsService(ThreadPoolRepositoryAdapter(repository, max_workers=1))
+
+    async def get_service():
+        return service
+
+    api.dependency_overrides[get_items_service] = get_service
+    return api, f"/items/{key}"
+
+
+async def seconds_per_request(api: FastAPI, path: str, requests: int) -> float:
+    for _ in range(100):
+        await asgi_request(api, "GET", path)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await asgi_request(api, "GET", path)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    recorder = MetricsRecorder()
+    repository = InMemoryRepository()
+    key = repository.add_item("value")
+    instrumented = InstrumentedRepository(repository, recorder.record_operation)
+    calls = [
+        (
+            "record_request",
+            lambda _: recorder.record_request("GET", "/x", 200, 1e-3, 0, 10),
+        ),
+        ("record_operation", lambda _: recorder.record_operation("get", 1e-4, False)),
+        ("get_by_id", lambda _: repository.get_by_id(key)),
+        ("instrumented get_by_id", lambda _: instrumented.get_by_id(key)),
+    ]
+    micro = [
+        {"call": name, "us/call": 1e6 / ops_per_second(call, args.requests * 10)}
+        for name, call in calls
+    ]
+    print_table(micro, list(micro[0]))
+    print()
+
+    # Alternate between the two apps and keep the fastest round of each, so
+    # that noise from the rest of the machine does not end up as overhead
+    apis = {enabled: build_api(enabled) for enabled in (False, True)}
+    timings = {False: float("inf"), True: float("inf")}
+    for _ in range(ROUNDS):
+        for enabled, (api, path) in apis.items():
+            seconds = asyncio.run(
+                seconds_per_request(api, path, args.requests // ROUNDS)
+            )
+            timings[enabled] = min(timings[enabled], seconds)
+    requests = [
+        {
+            "metrics": "off",
+            "requests/s": 1 / timings[False],
+            "us/request": timings[False] * 1e6,
+        },
+        {
+            "metrics": "on",
+            "requests/s": 1 / timings[True],
+            "us/request": timings[True] * 1e6,
+            "overhead us": (timings[True] - timings[False]) * 1e6,
+        },
+    ]
+    print_table(requests, list(requests[1]))
+    if args.json:
+        dump_json(micro + requests, args.json)
+
+
+if __name__ == "__main__":
+    main()
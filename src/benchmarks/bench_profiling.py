@@ -0,0 +1,100 @@
+"""Measure what profiling costs per request.
+
+Requests are sent in process to the API without profiling, with
+`ProfilingMiddleware` profiling one in `--sample-rate` requests with cProfile,
+and while a `SamplingProfiler` samples every thread in the background. Each
+round sends requests for `--seconds`; the rounds of the setups are
+interleaved and the fastest of each is kept. Run from the `src` directory:
+
+    python -m benchmarks.bench_profiling --rounds 10 --sample-rate 100
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+
+from app.profiling import ProfilingMiddleware, RequestProfiler, SamplingProfiler
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.router import get_items_service, router
+from app.service import AsyncItemsService
+from benchmarks.common import asgi_request, dump_json, print_table
+
+
+def build_api(sample_rate: int) -> tuple[FastAPI, str]:
+    repository = InMemoryRepository()
+    key = repository.add_items([f"value-{i}" for i in range(1000)])[0]
+    api = FastAPI()
+    api.include_router(router)
+    if sample_rate:
+        profiler = RequestProfiler(sample_rate, keep=20)
+        api.add_middleware(ProfilingMiddleware, profiler=profiler)
+    service = AsyncItemsService(ThreadPoolRepositoryAdapter(repository, max_workers=1))
+
+    async def get_service():
+        return service
+
+    api.dependency_overrides[get_items_service] = get_service
+    return api, f"/items/{key}"
+
+
+async def seconds_per_request(api: FastAPI, path: str, seconds: float) -> float:
+    """Send requests for `seconds` and return the average time per request."""
+    for _ in range(100):
+        await asgi_request(api, "GET", path)
+    requests = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        await asgi_request(api, "GET", path)
+        requests += 1
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=0.5, help="Per round")
+    parser.add_argument("--sample-rate", type=int, default=100)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    plain = build_api(0)
+    setups = {
+        "off": (plain, None),
+        f"cProfile 1 in {args.sample_rate}": (build_api(args.sample_rate), None),
+        "sampling stacks": (plain, SamplingProfiler()),
+    }
+    timings = {name: float("inf") for name in setups}
+    for _ in range(args.rounds):
+        for name, ((api, path), sampler) in setups.items():
+            thread = None
+            if sampler is not None:
+                thread = threading.Thread(
+                    target=sampler.profile, args=(args.seconds + 0.1,)
+                )
+                thread.start()
+            seconds = asyncio.run(seconds_per_request(api, path, args.seconds))
+            timings[name] = min(timings[name], seconds)
+            if thread is not None:
+                thread.join()
+
+    rows = [
+        {
+            "profiling": name,
+            "requests/s": 1 / seconds,
+            "us/request": seconds * 1e6,
+            "overhead us": (seconds - timings["off"]) * 1e6,
+        }
+        for name, seconds in timings.items()
+    ]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
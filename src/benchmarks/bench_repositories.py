@@ -0,0 +1,107 @@
+"""Compare the throughput of the repository backends.
+
+Run from the `src` directory:
+
+    python -m benchmarks.bench_repositories --items 10000 --ops 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from app.repository.caching_repository import CachingRepository
+from app.repository.compact_repository import CompactInMemoryRepository
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.log_structured_repository import LogStructuredRepository
+from app.repository.sqlite_repository import SqliteRepository
+from benchmarks.common import dump_json, ops_per_second, print_table
+
+
+def memory_backend(_workdir):
+    return InMemoryRepository()
+
+
+def compact_backend(_workdir):
+    return CompactInMemoryRepository()
+
+
+def sqlite_backend(workdir):
+    return SqliteRepository(os.path.join(workdir, "bench.db"))
+
+
+def log_backend(workdir):
+    return LogStructuredRepository(os.path.join(workdir, "log"))
+
+
+def cached_sqlite_backend(workdir):
+    return CachingRepository(sqlite_backend(workdir))
+
+
+BACKENDS = {
+    "memory": memory_backend,
+    "compact": compact_backend,
+    "sqlite": sqlite_backend,
+    "log": log_backend,
+    "sqlite+cache": cached_sqlite_backend,
+}
+
+
+def bench_backend(name, factory, items, ops, batch_size):
+    with tempfile.TemporaryDirectory() as workdir:
+        repository = factory(workdir)
+        values = [f"value-{i}" for i in range(items)]
+        for start in range(0, items, batch_size):
+            stop = start + batch_size
+            repository.add_items(values[start:stop])
+        keys = [item["id"] for item in repository.head(items)]
+        sample = [random.choice(keys) for _ in range(ops)]
+
+        row = {"backend": name, "items": items}
+        row["add_item/s"] = ops_per_second(lambda i: repository.add_item("x"), ops)
+        row["add_items(100)/s"] = ops_per_second(
+            lambda i: repository.add_items(["x"] * 100), max(ops // 100, 1)
+        )
+        row["get_by_id/s"] = ops_per_second(
+            lambda i: repository.get_by_id(sample[i]), ops
+        )
+        row["get_by_id(hot)/s"] = ops_per_second(
+            lambda i: repository.get_by_id(sample[i % 100]), ops
+        )
+        row["update/s"] = ops_per_second(
+            lambda i: repository.update(sample[i], "y"), ops
+        )
+        row["head(100)/s"] = ops_per_second(lambda i: repository.head(100), ops)
+        row["tail(100)/s"] = ops_per_second(lambda i: repository.tail(100), ops)
+        middle = repository.count() // 2
+        row["head(100, offset=n/2)/s"] = ops_per_second(
+            lambda i: repository.head(100, middle), ops
+        )
+        row["page(100)/s"] = ops_per_second(lambda i: repository.page(100), ops)
+        # Close the wrapped backend when it is behind a cache
+        backend = getattr(repository, "repository", repository)
+        if hasattr(backend, "close"):
+            backend.close()
+        return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [
+        bench_backend(name, BACKENDS[name], args.items, args.ops, args.batch_size)
+        for name in args.backends
+    ]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Measure JSON encoding time of item lists against list size.
+
+Compares the stdlib `JSONResponse` with `FastJSONResponse`, next to the time
+the in-memory repository takes to produce the rows. Run from the `src`
+directory:
+
+    python -m benchmarks.bench_serialization --sizes 10 100 1000 10000 100000
+"""
+
+import argparse
+import time
+
+from fastapi.responses import JSONResponse
+
+from app.repository.in_memory_repository import InMemoryRepository
+from app.responses import FastJSONResponse, orjson
+from benchmarks.common import dump_json, print_table
+
+
+def microseconds(fn, repeat: int) -> float:
+    """Best time of `repeat` calls to `fn`, in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6
+
+
+def bench_size(size: int, repeat: int) -> dict:
+    repository = InMemoryRepository()
+    repository.add_items([f"välue-{i}" for i in range(size)])
+    rows = repository.head(size)
+    stdlib_us = microseconds(lambda: JSONResponse(rows), repeat)
+    fast_us = microseconds(lambda: FastJSONResponse(rows), repeat)
+    return {
+        "items": size,
+        "rows_us": microseconds(lambda: repository.head(size), repeat),
+        "stdlib_us": stdlib_us,
+        "fast_us": fast_us,
+        "speedup": stdlib_us / fast_us,
+        "bytes": len(FastJSONResponse(rows).body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json'}")
+    rows = [bench_size(size, args.repeat) for size in args.sizes]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure the sharded repository over in-memory or SQLite shards.
+
+For each shard count the table shows the throughput of batch inserts, point
+reads routed to one shard, and `head` and `list` calls that fan out to every
+shard and merge their results, then the share of items moved when one more
+shard is added. Run from the `src` directory:
+
+    python -m benchmarks.bench_sharding --backend memory sqlite --shards 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.sharded_repository import ShardedRepository
+from app.repository.sqlite_repository import SqliteRepository
+from benchmarks.common import dump_json, ops_per_second, print_table
+
+
+def make_shard(backend: str, directory: str, name: str):
+    if backend == "sqlite":
+        return SqliteRepository(os.path.join(directory, f"shard-{name}.db"))
+    return InMemoryRepository()
+
+
+def run(backend: str, shards: int, items: int, ops: int) -> dict:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        repository = ShardedRepository(
+            [make_shard(backend, directory, str(i)) for i in range(shards)]
+        )
+        values = [f"value-{i}" for i in range(items)]
+        started = time.perf_counter()
+        keys = []
+        for start in range(0, items, 1000):
+            end = start + 1000
+            keys += repository.add_items(values[start:end])
+        add_rate = items / (time.perf_counter() - started)
+
+        row = {
+            "backend": backend,
+            "shards": shards,
+            "add_items/s": add_rate,
+            "get_by_id/s": ops_per_second(
+                lambda _: repository.get_by_id(rng.choice(keys)), ops
+            ),
+            "head(100)/s": ops_per_second(lambda _: repository.head(100), ops // 10),
+            "list/s": ops_per_second(lambda _: repository.list(), 5),
+        }
+        moved = repository.add_shard(make_shard(backend, directory, str(shards)))
+        row["moved %"] = 100 * moved / items
+        repository.close()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--ops", type=int, default=5_000)
+    parser.add_argument(
+        "--backend", nargs="+", choices=["memory", "sqlite"], default=["memory"]
+    )
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [
+        run(backend, shards, args.items, args.ops)
+        for backend in args.backend
+        for shards in args.shards
+    ]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Measure how long it takes to save and restore an InMemoryRepository snapshot.
+
+Run from the `src` directory:
+
+    python -m benchmarks.bench_snapshot --counts 10000 100000 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.repository.in_memory_repository import InMemoryRepository
+from benchmarks.common import dump_json, print_table
+
+
+def bench_count(count: int, value_size: int) -> dict:
+    repository = InMemoryRepository()
+    repository.add_items(["x" * value_size] * count)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "snapshot.bin")
+        started = time.perf_counter()
+        repository.save_snapshot(path)
+        save_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        restored = InMemoryRepository.from_snapshot(path)
+        load_seconds = time.perf_counter() - started
+        assert restored.count() == count
+        size = os.path.getsize(path)
+
+    return {
+        "items": count,
+        "file_mb": size / 1024 / 1024,
+        "save_ms": save_seconds * 1000,
+        "load_ms": load_seconds * 1000,
+        "load_ns/item": load_seconds * 1e9 / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--value-size", type=int, default=32)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [bench_count(count, args.value_size) for count in args.counts]
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
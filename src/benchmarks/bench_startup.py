@@ -0,0 +1,119 @@
+"""Measure how long a fresh process takes to import and serve the API.
+
+Each run starts a new interpreter that imports `app.app:api` and answers one
+request in process. The table shows the median over the runs of the bare
+interpreter start, the time until the import finished, and the time to the
+first response, all measured from the moment the process was started. The
+slowest imports under `python -X importtime` are listed below it.
+
+With `--budget-ms`, the script exits with an error when the median time to
+first request is above the budget, which is how CI catches startup
+regressions. Run from the `src` directory:
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import asgi_request, dump_json, print_table
+
+
+def child(output_path: str) -> None:
+    from app.app import api
+
+    imported = time.time()
+    asyncio.run(asgi_request(api, "GET", "/head"))
+    responded = time.time()
+    with open(output_path, "w") as f:
+        json.dump({"imported": imported, "responded": responded}, f)
+
+
+def measure_run() -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "result.json")
+        started = time.time()
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", output_path],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(output_path) as f:
+            result = json.load(f)
+    return {
+        "import ms": (result["imported"] - started) * 1000,
+        "first request ms": (result["responded"] - started) * 1000,
+    }
+
+
+def interpreter_ms() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def slowest_imports(count: int) -> list[dict]:
+    """Return the imports of `app.app` with the largest cumulative time."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.app"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        rows.append(
+            {
+                "module": name.strip(),
+                "self ms": int(self_us) / 1000,
+                "cumulative ms": int(cumulative_us) / 1000,
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative ms"], reverse=True)
+    return rows[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--imports", type=int, default=15, help="Imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail above this median")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    runs = [measure_run() for _ in range(args.runs)]
+    summary = {
+        "interpreter ms": statistics.median(interpreter_ms() for _ in runs),
+        **{key: statistics.median(run[key] for run in runs) for key in runs[0]},
+    }
+    print_table([summary], list(summary))
+    imports = slowest_imports(args.imports) if args.imports else []
+    if imports:
+        print()
+        print_table(imports, list(imports[0]))
+    if args.json:
+        dump_json([{**summary, "imports": imports}], args.json)
+
+    if args.budget_ms is not None and summary["first request ms"] > args.budget_ms:
+        sys.exit(
+            f"Time to first request {summary['first request ms']:.0f} ms is over "
+            f"the budget of {args.budget_ms:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Benchmark the repository operations and the API at several repository sizes.
+
+Every (backend, size) case runs in a fresh process configured through the
+`LIST_SERVICE_*` settings, with the API stack built by `app.router` as in
+production. The backend is seeded with `--sizes` items, then:
+
+* every `BaseRepository` operation is called on the backend on its own, for
+  `--ops` calls or `--op-seconds`, whichever ends first;
+* each request mix in `--mixes` is sent in process to `app.app:api` by
+  `--concurrency` concurrent clients, `--requests` requests per mix.
+
+Each row reports throughput and p50/p95/p99 latencies, and the peak resident
+memory of the case process. The random choices are seeded, so two runs send
+the same requests. `--json` writes the rows with the commit they were
+measured on, and `--compare` checks them against such a file and fails when
+a throughput dropped by more than `--tolerance`. Run from the `src`
+directory:
+
+    python -m benchmarks.bench_suite --sizes 1000 100000 10000000 --json new.json
+    python -m benchmarks.bench_suite --sizes 1000 100000 --compare old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.common import asgi_request, print_table
+
+SEED_BATCH = 10_000
+PERCENTILES = {"p50 us": 0.5, "p95 us": 0.95, "p99 us": 0.99}
+
+# Weighted requests of each mix. Reads pick an existing item at random, and
+# deletes remove items that the mix added itself.
+MIXES = {
+    "read_heavy": {
+        "get_item": 80,
+        "head": 8,
+        "page": 5,
+        "update_item": 5,
+        "add_item": 2,
+    },
+    "write_heavy": {
+        "add_item": 40,
+        "update_item": 30,
+        "delete_item": 10,
+        "get_item": 20,
+    },
+    # Clients polling for the newest items while they are being added
+    "poll_tail": {"tail": 90, "add_item": 10},
+}
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        name: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1e6
+        for name, q in PERCENTILES.items()
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Repository operations
+
+
+def operation_calls(repository, keys: list[str], rng: random.Random, ops: int):
+    """Yield (name, call, calls to time) for each `BaseRepository` operation.
+
+    Each call takes the call number. Reads come first, so they see the
+    seeded size, and the deletes remove what the adds added, which leaves the
+    repository as it was seeded.
+    """
+    size = len(keys)
+
+    def key():
+        return keys[rng.randrange(size)]
+
+    def get_many(i):
+        repository.get_many([key() for _ in range(100)])
+
+    def update_many(i):
+        repository.update_many([(key(), f"updated-{i}") for _ in range(100)])
+
+    def update_if(i):
+        item_key = key()
+        expected = repository.get_by_id(item_key)[item_key]
+        repository.update_if(item_key, expected, f"updated-{i}")
+
+    def add_items(i):
+        return repository.add_items([f"new-{i}"] * 100)
+
+    delete_many = repository.delete_many
+    cursor = repository.page(100)[1]
+    yield "get_by_id", lambda i: repository.get_by_id(key()), ops
+    yield "get_many(100)", get_many, ops
+    yield "head(100)", lambda i: repository.head(100), ops
+    yield "head(100, offset=n/2)", lambda i: repository.head(100, size // 2), ops
+    yield "tail(100)", lambda i: repository.tail(100), ops
+    yield "page(100)", lambda i: repository.page(100), ops
+    yield "page(100, cursor)", lambda i: repository.page(100, cursor), ops
+    yield "count", lambda i: repository.count(), ops
+    yield "version", lambda i: repository.version(), ops
+    yield "list", lambda i: repository.list(), ops
+    yield "iter_items", lambda i: sum(1 for _ in repository.iter_items()), ops
+    yield "update", lambda i: repository.update(key(), f"updated-{i}"), ops
+    yield "update_many(100)", update_many, ops
+    yield "update_if", update_if, ops
+
+    # A generator only resumes once the previous operation was timed, so the
+    # deletes are timed for as many calls as the adds made
+    added: list[str] = []
+    batches: list[list[str]] = []
+    yield "add_item", lambda i: added.append(repository.add_item(f"new-{i}")), ops
+    yield "add_items(100)", lambda i: batches.append(add_items(i)), ops
+    yield "delete", lambda i: repository.delete(added.pop()), len(added)
+    yield "delete_many(100)", lambda i: delete_many(batches.pop()), len(batches)
+
+
+def time_calls(call: Callable[[int], object], ops: int, seconds: float) -> dict:
+    """Time `call` until it ran `ops` times or `seconds` passed, at least once."""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    for i in range(ops):
+        started = time.perf_counter()
+        call(i)
+        finished = time.perf_counter()
+        latencies.append(finished - started)
+        if finished > deadline:
+            break
+    return {"ops/s": len(latencies) / sum(latencies), **percentiles(latencies)}
+
+
+# Request mixes
+
+
+async def run_mix(
+    api, mix: dict, keys: list[str], requests: int, concurrency: int, seed: int
+) -> dict:
+    names, weights = list(mix), list(mix.values())
+    added: list[str] = []
+    latencies: list[float] = []
+    failures = 0
+
+    async def send(rng: random.Random, name: str) -> tuple[int, bytes]:
+        if name == "get_item":
+            return await asgi_request(api, "GET", f"/items/{rng.choice(keys)}")
+        if name == "head":
+            return await asgi_request(api, "GET", "/head", "num_samples=100")
+        if name == "tail":
+            return await asgi_request(api, "GET", "/tail", "num_samples=20")
+        if name == "page":
+            return await asgi_request(api, "GET", "/items", "limit=100")
+        if name == "update_item":
+            body = json.dumps({"value": f"updated-{rng.random()}"}).encode()
+            return await asgi_request(
+                api, "PUT", f"/items/{rng.choice(keys)}", body=body
+            )
+        if name == "delete_item" and added:
+            return await asgi_request(api, "DELETE", f"/items/{added.pop()}")
+        body = json.dumps({"value": f"new-{rng.random()}"}).encode()
+        status, response = await asgi_request(api, "POST", "/items", body=body)
+        if status < 300:
+            added.append(json.loads(response)["id"])
+        return status, response
+
+    async def client(number: int, count: int) -> None:
+        nonlocal failures
+        rng = random.Random(seed * 1000 + number)
+        for name in rng.choices(names, weights, k=count):
+            started = time.perf_counter()
+            status, _ = await send(rng, name)
+            latencies.append(time.perf_counter() - started)
+            failures += status >= 400
+
+    # Warm up the routes before timing them
+    await client(-1, 100)
+    latencies.clear()
+    failures = 0
+    per_client = max(requests // concurrency, 1)
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n, per_client) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "ops/s": len(latencies) / elapsed,
+        **percentiles(latencies),
+        "errors": failures,
+    }
+
+
+# One case, in its own process
+
+
+def run_case(case: dict) -> list[dict]:
+    from app import router
+    from app.app import api
+
+    backend = router.repository
+    # Seed and time the backend itself, below the change feed, caches and
+    # metrics, which only the request mixes go through
+    while hasattr(backend, "repository"):
+        backend = backend.repository
+    size = case["items"]
+    started = time.perf_counter()
+    keys = []
+    for start in range(0, size, SEED_BATCH):
+        count = min(SEED_BATCH, size - start)
+        keys += backend.add_items([f"value-{start + i}" for i in range(count)])
+    seed_seconds = time.perf_counter() - started
+    common = {"backend": case["backend"], "items": size}
+    rows = [
+        {
+            **common,
+            "kind": "seed",
+            "name": "add_items",
+            "ops/s": size / seed_seconds,
+            "peak rss mb": peak_rss_mb(),
+        }
+    ]
+
+    rng = random.Random(case["seed"])
+    for name, call, ops in operation_calls(backend, keys, rng, case["ops"]):
+        row = time_calls(call, ops, case["op_seconds"])
+        rows.append({**common, "kind": "operation", "name": name, **row})
+
+    loop = asyncio.new_event_loop()
+    for name in case["mixes"]:
+        row = loop.run_until_complete(
+            run_mix(
+                api,
+                MIXES[name],
+                keys,
+                case["requests"],
+                case["concurrency"],
+                case["seed"],
+            )
+        )
+        rows.append({**common, "kind": "mix", "name": name, **row})
+    loop.close()
+    for row in rows[1:]:
+        row["peak rss mb"] = peak_rss_mb()
+    return rows
+
+
+def case_environment(backend: str, directory: str) -> dict:
+    return {
+        **os.environ,
+        "LIST_SERVICE_REPOSITORY_BACKEND": backend,
+        "LIST_SERVICE_SQLITE_PATH": os.path.join(directory, "items.db"),
+        "LIST_SERVICE_LOG_DIRECTORY": os.path.join(directory, "log"),
+        "LIST_SERVICE_SHARED_MEMORY_PATH": os.path.join(directory, "shared"),
+        "LIST_SERVICE_METRICS_EMF_INTERVAL": "0",
+    }
+
+
+def spawn_case(case: dict) -> list[dict]:
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "result.json")
+        # The app logs to stdout, so the results are passed back in a file
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_suite"]
+            + ["--case", json.dumps(case), output_path],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            env=case_environment(case["backend"], directory),
+        )
+        with open(output_path) as f:
+            return json.load(f)
+
+
+# Comparing runs
+
+
+def kind_rows(rows: list[dict], kind: str) -> list[dict]:
+    return [row for row in rows if row["kind"] == kind]
+
+
+def row_key(row: dict) -> tuple:
+    return row["backend"], row["items"], row["kind"], row["name"]
+
+
+def compare(baseline: list[dict], rows: list[dict], tolerance: float) -> list[dict]:
+    """Return the rows that are in both runs with their change in throughput."""
+    previous = {row_key(row): row for row in baseline}
+    changes = []
+    for row in rows:
+        before = previous.get(row_key(row))
+        if before is None:
+            continue
+        change = row["ops/s"] / before["ops/s"] - 1
+        changes.append(
+            {
+                "backend": row["backend"],
+                "items": row["items"],
+                "name": row["name"],
+                "before ops/s": before["ops/s"],
+                "after ops/s": row["ops/s"],
+                "change %": change * 100,
+                "regressed": change < -tolerance,
+            }
+        )
+    return changes
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["memory"])
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--ops", type=int, default=2_000)
+    parser.add_argument("--op-seconds", type=float, default=2.0)
+    parser.add_argument("--mixes", nargs="+", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Throughput drop, as a fraction, that counts as a regression",
+    )
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        case, output_path = args.case
+        rows = run_case(json.loads(case))
+        with open(output_path, "w") as f:
+            json.dump(rows, f)
+        return
+
+    rows = []
+    for backend in args.backends:
+        for size in args.sizes:
+            case = {
+                "backend": backend,
+                "items": size,
+                "ops": args.ops,
+                "op_seconds": args.op_seconds,
+                "mixes": args.mixes,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+            }
+            rows += spawn_case(case)
+    columns = ["backend", "items", "name", "ops/s"]
+    print_table(kind_rows(rows, "seed"), columns + ["peak rss mb"])
+    print()
+    print_table(kind_rows(rows, "operation"), columns + list(PERCENTILES))
+    print()
+    mix_columns = columns + list(PERCENTILES) + ["errors", "peak rss mb"]
+    print_table(kind_rows(rows, "mix"), mix_columns)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "arguments": vars(args),
+                    "rows": rows,
+                },
+                f,
+                indent=2,
+            )
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["rows"]
+        changes = compare(baseline, rows, args.tolerance)
+        print()
+        print_table(changes, list(changes[0]) if changes else ["name"])
+        regressed = [change for change in changes if change["regressed"]]
+        if regressed:
+            sys.exit(f"{len(regressed)} results regressed by more than the tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Measure reads of the shared memory repository from 1, 2, 4 and 8 processes.
+
+Every process opens the same file, like one `uvicorn --workers N` worker,
+and runs a mix of `get_by_id` and `head` reads with a share of writes for a
+fixed time. Reads scale with the number of processes up to the number of
+cores. Run from the `src` directory:
+
+    python -m benchmarks.bench_workers --items 100000 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app.repository.shared_memory_repository import SharedMemoryRepository
+from benchmarks.common import dump_json, print_table
+
+
+def worker(path, seconds, write_ratio, seed, start, results) -> None:
+    repository = SharedMemoryRepository(path)
+    keys = [row["id"] for row in repository.head(10_000)]
+    rng = random.Random(seed)
+    ops = 0
+    # Load the file in every process before the clock starts
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            roll = rng.random()
+            if roll < write_ratio:
+                repository.update(rng.choice(keys), f"updated-{ops}")
+            elif roll < 0.5:
+                repository.get_by_id(rng.choice(keys))
+            else:
+                repository.head(100, rng.randrange(len(keys)))
+            ops += 1
+    results.put(ops)
+    repository.close()
+
+
+def run(path: str, workers: int, seconds: float, write_ratio: float) -> dict:
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    start = context.Barrier(workers)
+    processes = [
+        context.Process(
+            target=worker, args=(path, seconds, write_ratio, n, start, results)
+        )
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ops = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return {
+        "workers": workers,
+        "ops/s": ops / seconds,
+        "ops/s per worker": ops / seconds / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--write-ratio", type=float, default=0.01)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir="/dev/shm") as workdir:
+        path = os.path.join(workdir, "bench.shm")
+        repository = SharedMemoryRepository(path)
+        repository.add_items([f"value-{i}" for i in range(args.items)])
+        repository.close()
+        rows = [
+            run(path, workers, args.seconds, args.write_ratio)
+            for workers in args.workers
+        ]
+    print(f"{os.cpu_count()} cores")
+    print_table(rows, list(rows[0]))
+    if args.json:
+        dump_json(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import json
+import time
+from typing import Callable
+
+
+def ops_per_second(fn: Callable[[int], object], iterations: int) -> float:
+    """Call `fn(i)` for i in range(iterations) and return calls per second."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed if elapsed else float("inf")
+
+
+async def asgi_request(
+    app, method: str, path: str, query: str = "", body: bytes = b""
+) -> tuple[int, bytes]:
+    """Call an ASGI app in-process and return the status code and response body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "server": ("bench", 80),
+        "client": ("bench", 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status = messages[0]["status"]
+    return status, b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def print_table(rows: list[dict], columns: list[str]) -> None:
+    """Print rows as a fixed-width table."""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def dump_json(rows: list[dict], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(rows, f, indent=2)
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.0f}" if value >= 100 else f"{value:.3f}"
+    return str(value)
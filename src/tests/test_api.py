@@ -1,11 +1,14 @@
+import json
+
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
 from app.router import get_items_service
 from app.router import router as items_router
-from app.service import ItemsService
+from app.service import AsyncItemsService
 
 
 def mock_faulty_db_unexpected_error_repository():
@@ -33,13 +36,15 @@ def mock_in_memory_repository():
     return repository
 
 
-class MockService(ItemsService):
+class MockService(AsyncItemsService):
     """Mock service for testing purposes."""
 
     def __init__(self, repository=None):
         if repository is None:
             repository = InMemoryRepository()
-        super().__init__(items_repository=repository)
+        super().__init__(
+            items_repository=ThreadPoolRepositoryAdapter(repository, max_workers=1)
+        )
 
 
 @pytest.fixture
@@ -228,6 +233,95 @@ def test_tail_endpoint_sample_size_greater_than_list_len(client):
     assert expected == collected
 
 
+def test_head_and_tail_reflect_writes_between_cached_reads(client):
+    assert client.get("/head?num_samples=1").json()[0]["value"] == "String1"
+    first = client.get("/head?num_samples=1").json()[0]
+    client.put(f"/items/{first['id']}", json={"value": "Updated"})
+    assert client.get("/head?num_samples=1").json()[0]["value"] == "Updated"
+    client.post("/items/", json={"value": "String4"})
+    response = client.get("/tail?num_samples=1")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()[0]["value"] == "String4"
+    client.delete(f"/items/{first['id']}")
+    assert client.get("/head?num_samples=1").json()[0]["value"] == "String2"
+
+
+def test_collection_etag_gives_304_until_a_write(client):
+    response = client.get("/head?num_samples=2")
+    etag = response.headers["etag"]
+    response = client.get("/head?num_samples=2", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert client.get("/items", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/items/", json={"value": "String4"})
+    response = client.get("/head?num_samples=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_item_etag_gives_304_while_the_value_is_unchanged(client):
+    item_id = client.get("/head?num_samples=1").json()[0]["id"]
+    etag = client.get(f"/items/{item_id}").headers["etag"]
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    client.put(f"/items/{item_id}", json={"value": "Updated"})
+    response = client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_update_with_if_match(client):
+    item_id = client.get("/head?num_samples=1").json()[0]["id"]
+    etag = client.get(f"/items/{item_id}").headers["etag"]
+    response = client.put(
+        f"/items/{item_id}", json={"value": "First"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    new_etag = response.headers["etag"]
+    assert client.get(f"/items/{item_id}").headers["etag"] == new_etag
+
+    # A second writer still holding the old ETag is turned away
+    response = client.put(
+        f"/items/{item_id}", json={"value": "Second"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    assert client.get(f"/items/{item_id}").json() == {item_id: "First"}
+
+
+def test_delete_with_if_match(client):
+    item_id = client.get("/head?num_samples=1").json()[0]["id"]
+    response = client.delete(f"/items/{item_id}", headers={"If-Match": '"stale"'})
+    assert response.status_code == 412
+    etag = client.get(f"/items/{item_id}").headers["etag"]
+    response = client.delete(f"/items/{item_id}", headers={"If-Match": etag})
+    assert response.status_code == 204
+    response = client.delete(f"/items/{item_id}", headers={"If-Match": "*"})
+    assert response.status_code == 404
+
+
+def test_head_endpoint_with_offset(client):
+    response = client.get("/head?num_samples=1&offset=1")
+    assert response.status_code == 200
+    assert [item["value"] for item in response.json()] == ["String2"]
+
+
+def test_tail_endpoint_with_offset(client):
+    response = client.get("/tail?num_samples=5&offset=1")
+    assert response.status_code == 200
+    assert [item["value"] for item in response.json()] == ["String2", "String1"]
+
+
+def test_head_endpoint_offset_past_the_end_returns_empty_list(client):
+    response = client.get("/head?num_samples=2&offset=3")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_head_endpoint_negative_offset_raises_422(client):
+    response = client.get("/head?offset=-1")
+    assert response.status_code == 422
+
+
 def test_tail_endpoint_sample_size_zero_raises_422(client):
     response = client.get("/tail?num_samples=0")
     assert response.status_code == 422
@@ -236,3 +330,69 @@ def test_tail_endpoint_sample_size_zero_raises_422(client):
 def test_head_endpoint_sample_size_zero_raises_422(client):
     response = client.get("/head?num_samples=0")
     assert response.status_code == 422
+
+
+def test_get_items_paginated(client):
+    response = client.get("/items?limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["value"] for item in page["items"]] == ["String1", "String2"]
+
+    response = client.get(f"/items?limit=2&cursor={page['next_cursor']}")
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["value"] for item in page["items"]] == ["String3"]
+    assert page["next_cursor"] is None
+
+
+def test_get_items_invalid_cursor_returns_400(client):
+    response = client.get("/items?limit=2&cursor=bogus")
+    assert response.status_code == 400
+
+
+def test_get_items_limit_above_max_returns_422(client):
+    response = client.get("/items?limit=100000")
+    assert response.status_code == 422
+
+
+def test_get_items_stream_query_param(client):
+    response = client.get("/items?stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    values = [json.loads(line)["value"] for line in lines]
+    assert values == ["String1", "String2", "String3"]
+
+
+def test_get_items_stream_accept_header(client):
+    response = client.get("/items", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
+
+
+def test_batch_endpoint(client):
+    response = client.post(
+        "/items:batch",
+        json={
+            "operations": [
+                {"op": "insert", "value": "String4"},
+                {"op": "delete", "id": "nonexistent_id"},
+                {"op": "update"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [201, 404, 400]
+
+    response = client.get(f"/items/{results[0]['id']}")
+    assert response.status_code == 200
+
+
+def test_get_many_endpoint(client):
+    item_id = client.post("/items/", json={"value": "NewItem"}).json()["id"]
+    response = client.post("/items:get", json={"ids": [item_id, "nonexistent_id"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["value"] == "NewItem"
+    assert results[1]["status"] == 404
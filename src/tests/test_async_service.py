@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.service import AsyncItemsService, ItemNotFoundError, ServerError
+
+
+@pytest.fixture
+def async_service():
+    """Fixture to create an AsyncItemsService over an adapted InMemoryRepository."""
+    repository = InMemoryRepository()
+    repository.add_item(value="String1")
+    repository.add_item(value="String2")
+    repository.add_item(value="String3")
+    adapter = ThreadPoolRepositoryAdapter(repository, max_workers=1)
+    yield AsyncItemsService(items_repository=adapter)
+    adapter.close()
+
+
+def test_list(async_service):
+    items = asyncio.run(async_service.list())
+    assert [item["value"] for item in items] == ["String1", "String2", "String3"]
+
+
+def test_add_and_get_item(async_service):
+    async def scenario():
+        item_id = (await async_service.add_item({"value": "NewItem"}))["id"]
+        return item_id, await async_service.get_item_by_id(item_id)
+
+    item_id, item = asyncio.run(scenario())
+    assert item == {item_id: "NewItem"}
+
+
+def test_get_item_not_found(async_service):
+    with pytest.raises(ItemNotFoundError):
+        asyncio.run(async_service.get_item_by_id("non_existent_id"))
+
+
+def test_iter_items(async_service):
+    async def collect():
+        return [item["value"] async for item in async_service.iter_items()]
+
+    assert asyncio.run(collect()) == ["String1", "String2", "String3"]
+
+
+def test_unexpected_repository_error_raises_server_error():
+    class FaultyRepository(InMemoryRepository):
+        def list(self):
+            raise Exception("Simulated database error")
+
+    service = AsyncItemsService(
+        items_repository=ThreadPoolRepositoryAdapter(FaultyRepository())
+    )
+    with pytest.raises(ServerError):
+        asyncio.run(service.list())
+
+
+def test_adapter_runs_calls_off_the_event_loop_thread():
+    class RecordingRepository(InMemoryRepository):
+        def count(self):
+            return threading.current_thread().name
+
+    adapter = ThreadPoolRepositoryAdapter(RecordingRepository())
+    assert asyncio.run(adapter.count()).startswith("repository")
+
+
+def test_adapter_overlaps_slow_calls_up_to_max_workers():
+    class SlowRepository(InMemoryRepository):
+        def count(self):
+            time.sleep(0.1)
+            return 0
+
+    adapter = ThreadPoolRepositoryAdapter(SlowRepository(), max_workers=4)
+
+    async def scenario():
+        started = time.perf_counter()
+        await asyncio.gather(*(adapter.count() for _ in range(4)))
+        return time.perf_counter() - started
+
+    # Four 100ms calls on four workers finish together, not one after another
+    assert asyncio.run(scenario()) < 0.3
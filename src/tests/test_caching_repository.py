@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+
+from app.repository.base_repository import DBItemNotFoundError
+from app.repository.caching_repository import CachingRepository, LRUCache
+from app.repository.in_memory_repository import InMemoryRepository
+
+
+class CountingRepository(InMemoryRepository):
+    """In-memory repository that counts how often reads reach it."""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_by_id(self, key: str):
+        self.reads += 1
+        return super().get_by_id(key)
+
+    def head(self, n: int, offset: int = 0):
+        self.reads += 1
+        return super().head(n, offset)
+
+
+@pytest.fixture
+def backend():
+    return CountingRepository()
+
+
+@pytest.fixture
+def repository(backend):
+    repository = CachingRepository(backend, max_size=2)
+    repository.add_item("String1")
+    repository.add_item("String2")
+    return repository
+
+
+def test_repeated_reads_are_served_from_the_cache(repository, backend):
+    key = repository.head(1)[0]["id"]
+    assert repository.get_by_id(key) == {key: "String1"}
+    assert repository.get_by_id(key) == {key: "String1"}
+    assert repository.head(1) == repository.head(1)
+    assert backend.reads == 2
+    assert repository.stats["hits"] == 3
+    assert repository.stats["misses"] == 2
+
+
+def test_update_is_visible_immediately(repository):
+    key = repository.head(1)[0]["id"]
+    repository.get_by_id(key)
+    repository.update(key, "Updated")
+    assert repository.get_by_id(key) == {key: "Updated"}
+    assert repository.head(1) == [{"id": key, "value": "Updated"}]
+
+
+def test_delete_is_visible_immediately(repository):
+    key = repository.head(1)[0]["id"]
+    repository.get_by_id(key)
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    assert [i["value"] for i in repository.head(5)] == ["String2"]
+
+
+def test_add_and_batch_writes_invalidate_windows(repository):
+    assert [i["value"] for i in repository.head(5)] == ["String1", "String2"]
+    repository.add_item("String3")
+    assert [i["value"] for i in repository.tail(1)] == ["String3"]
+    keys = repository.add_items(["String4"])
+    assert [i["value"] for i in repository.tail(1)] == ["String4"]
+    repository.get_by_id(keys[0])
+    repository.update_many([(keys[0], "Batch")])
+    assert repository.get_by_id(keys[0]) == {keys[0]: "Batch"}
+    repository.delete_many(keys)
+    assert [i["value"] for i in repository.tail(1)] == ["String3"]
+
+
+def test_failed_write_still_invalidates(repository, backend):
+    key = repository.head(1)[0]["id"]
+    repository.get_by_id(key)
+    backend.update(key, "Changed behind the cache")
+    with pytest.raises(DBItemNotFoundError):
+        repository.update("non_existent_id", "value")
+    assert repository.head(1)[0]["value"] == "Changed behind the cache"
+
+
+def test_writes_made_behind_the_cache_are_seen(repository, backend):
+    # As written by another worker process sharing the backend
+    key = repository.head(1)[0]["id"]
+    repository.get_by_id(key)
+    backend.update(key, "Changed by another worker")
+    assert repository.get_by_id(key) == {key: "Changed by another worker"}
+    assert repository.head(1)[0]["value"] == "Changed by another worker"
+    reads = backend.reads
+    repository.get_by_id(key)
+    assert backend.reads == reads
+
+
+def test_hot_item_survives_unrelated_writes(repository, backend):
+    key = repository.head(1)[0]["id"]
+    repository.get_by_id(key)
+    reads = backend.reads
+    for i in range(5):
+        repository.add_item(f"Unrelated{i}")
+        assert repository.get_by_id(key) == {key: "String1"}
+    assert backend.reads == reads
+
+
+def test_write_overlapping_a_write_behind_the_cache_drops_the_items():
+    class BusyBackend(CountingRepository):
+        overlapping = None
+
+        def add_item(self, value: str) -> str:
+            if self.overlapping is not None:
+                # Another worker writes while this one adds its item
+                super().update(self.overlapping, "Changed by another worker")
+            return super().add_item(value)
+
+    backend = BusyBackend()
+    repository = CachingRepository(backend, max_size=2)
+    key = repository.add_item("String1")
+    repository.get_by_id(key)
+    backend.overlapping = key
+    repository.add_item("String2")
+    assert repository.get_by_id(key) == {key: "Changed by another worker"}
+
+
+def test_least_recently_used_entries_are_evicted(repository, backend):
+    keys = [i["id"] for i in repository.head(2)]
+    repository.add_item("String3")
+    third = repository.tail(1)[0]["id"]
+    for key in (*keys, third):
+        repository.get_by_id(key)
+    assert repository.stats["evictions"] == 1
+    reads = backend.reads
+    repository.get_by_id(keys[0])
+    assert backend.reads == reads + 1
+
+
+def test_entries_expire_after_ttl(backend):
+    now = [0.0]
+    repository = CachingRepository(backend, ttl=10, clock=lambda: now[0])
+    key = repository.add_item("String1")
+    repository.get_by_id(key)
+    repository.get_by_id(key)
+    assert backend.reads == 1
+    now[0] = 11
+    repository.get_by_id(key)
+    assert backend.reads == 2
+
+
+def test_read_racing_a_write_is_not_cached(backend):
+    repository = CachingRepository(backend)
+    key = repository.add_item("old")
+    reading = threading.Event()
+    written = threading.Event()
+
+    class SlowReader(CountingRepository):
+        def get_by_id(self, key):
+            result = super().get_by_id(key)
+            reading.set()
+            written.wait()
+            return result
+
+    backend.__class__ = SlowReader
+    reader = threading.Thread(target=repository.get_by_id, args=(key,))
+    reader.start()
+    reading.wait()
+    backend.__class__ = CountingRepository
+    repository.update(key, "new")
+    written.set()
+    reader.join()
+    assert repository.get_by_id(key) == {key: "new"}
+
+
+def test_lru_cache_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        LRUCache(0)
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.change_feed import ChangeFeed, ChangesExpiredError
+from app.repository.base_repository import (
+    DBFailedToDeleteItemError,
+    DBPartialBatchError,
+)
+from app.repository.change_feed_repository import ChangeFeedRepository
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.router import get_items_service
+from app.router import router as items_router
+from app.router import sse_events
+from app.service import AsyncItemsService
+
+
+@pytest.fixture
+def feed():
+    return ChangeFeed(capacity=6)
+
+
+@pytest.fixture
+def repository(feed):
+    return ChangeFeedRepository(InMemoryRepository(), feed)
+
+
+@pytest.fixture
+def service(repository, feed):
+    adapter = ThreadPoolRepositoryAdapter(repository, max_workers=1)
+    yield AsyncItemsService(items_repository=adapter, change_feed=feed)
+    adapter.close()
+
+
+@pytest.fixture
+def client(service):
+    app = FastAPI()
+    app.include_router(items_router)
+
+    def override_items_service():
+        return service
+
+    app.dependency_overrides[get_items_service] = override_items_service
+    return TestClient(app)
+
+
+def test_every_write_gets_a_sequence_number(repository, feed):
+    key = repository.add_item("a")
+    repository.update(key, "b")
+    keys = repository.add_items(["c", "d"])
+    repository.update_many([(keys[0], "e"), ("missing", "x")])
+    repository.delete_many([keys[1], "missing"])
+    repository.delete(key)
+    changes = feed.since(1, 10)
+    assert [(c["seq"], c["op"], c["value"]) for c in changes] == [
+        (2, "update", "b"),
+        (3, "insert", "c"),
+        (4, "insert", "d"),
+        (5, "update", "e"),
+        (6, "delete", None),
+        (7, "delete", None),
+    ]
+    assert feed.since(5, 1)[0]["id"] == keys[1]
+    assert feed.since(7, 10) == []
+
+
+def test_bulk_write_failing_partway_publishes_what_it_applied(feed):
+    class FaultyRepository(InMemoryRepository):
+        def delete(self, key):
+            if key == "explode":
+                raise DBFailedToDeleteItemError(key)
+            super().delete(key)
+
+    repository = ChangeFeedRepository(FaultyRepository(), feed)
+    keys = repository.add_items(["a", "b"])
+    with pytest.raises(DBPartialBatchError):
+        repository.delete_many([keys[0], "missing", "explode", keys[1]])
+    assert [(c["op"], c["id"]) for c in feed.since(2, 10)] == [("delete", keys[0])]
+
+
+def test_changes_pushed_out_of_the_buffer_are_expired(repository, feed):
+    repository.add_items([str(i) for i in range(8)])
+    assert feed.since(2, 10)[0]["seq"] == 3
+    with pytest.raises(ChangesExpiredError):
+        feed.since(1, 10)
+    # A sequence number from before a restart is also rejected
+    with pytest.raises(ChangesExpiredError):
+        feed.since(9, 10)
+
+
+def test_waiting_readers_are_woken_by_a_write_from_another_thread(feed):
+    async def scenario():
+        readers = [asyncio.create_task(feed.wait(0, 5, 10)) for _ in range(1000)]
+        await asyncio.sleep(0.01)
+        assert not any(reader.done() for reader in readers)
+        writer = threading.Thread(target=feed.publish, args=([("insert", "a", "1")],))
+        writer.start()
+        results = await asyncio.gather(*readers)
+        writer.join()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(records == [results[0][0]] for records in results)
+    assert results[0][0]["seq"] == 1
+
+
+def test_wait_times_out_without_changes(feed):
+    assert asyncio.run(feed.wait(0, 0.01, 10)) == []
+
+
+def test_long_poll_endpoint(client):
+    response = client.get("/changes?timeout=0")
+    assert response.json() == {"changes": [], "last_seq": 0}
+    item_id = client.post("/items/", json={"value": "String1"}).json()["id"]
+    client.delete(f"/items/{item_id}")
+    response = client.get("/changes?since=0&limit=1")
+    assert response.json() == {
+        "changes": [{"seq": 1, "op": "insert", "id": item_id, "value": "String1"}],
+        "last_seq": 1,
+    }
+    response = client.get("/changes?since=1")
+    assert response.json()["changes"][0]["op"] == "delete"
+
+
+def test_expired_position_returns_410(client):
+    client.post(
+        "/items:batch", json={"operations": [{"op": "insert", "value": "x"}] * 8}
+    )
+    assert client.get("/changes?since=0").status_code == 410
+    assert client.get("/changes?since=0&stream=true").status_code == 410
+
+
+def test_disabled_change_feed_returns_404():
+    adapter = ThreadPoolRepositoryAdapter(InMemoryRepository(), max_workers=1)
+    app = FastAPI()
+    app.include_router(items_router)
+    app.dependency_overrides[get_items_service] = lambda: AsyncItemsService(
+        items_repository=adapter
+    )
+    client = TestClient(app)
+    for query in ("", "?stream=true"):
+        response = client.get("/changes" + query)
+        assert response.status_code == 404
+        assert "change feed is disabled" in response.json()["detail"]
+    adapter.close()
+
+
+def test_server_sent_events(service, repository):
+    async def scenario():
+        events = sse_events(service, 0)
+        repository.add_item("String1")
+        first = await anext(events)
+        await events.aclose()
+        return first
+
+    event = asyncio.run(scenario())
+    assert event.startswith(b"id: 1\nevent: change\ndata: {")
+    assert b'"value":"String1"' in event
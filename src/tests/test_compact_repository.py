@@ -0,0 +1,126 @@
+import pytest
+
+from app.repository.base_repository import (
+    DBFailedToAddItemError,
+    DBItemNotFoundError,
+    DBPartialBatchError,
+)
+from app.repository.compact_repository import CompactInMemoryRepository
+
+
+@pytest.fixture
+def repository():
+    """Fixture to create a CompactInMemoryRepository with some initial data."""
+    repository = CompactInMemoryRepository()
+    repository.add_item(value="String1")
+    repository.add_item(value="String2")
+    repository.add_item(value="String3")
+    return repository
+
+
+def test_crud(repository):
+    key = repository.add_item("NewItem ✓")
+    assert repository.get_by_id(key) == {key: "NewItem ✓"}
+    repository.update(key, "UpdatedItem")
+    assert repository.get_by_id(key) == {key: "UpdatedItem"}
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.delete(key)
+
+
+def test_unknown_and_malformed_ids_are_not_found(repository):
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id("non_existent_id")
+    with pytest.raises(DBItemNotFoundError):
+        repository.update("00000000-0000-4000-8000-000000000000", "value")
+
+
+def test_head_tail_page_keep_insertion_order(repository):
+    assert [i["value"] for i in repository.list()] == ["String1", "String2", "String3"]
+    assert [i["value"] for i in repository.head(2)] == ["String1", "String2"]
+    assert [i["value"] for i in repository.tail(5)] == ["String3", "String2", "String1"]
+    items, cursor = repository.page(2)
+    items, cursor = repository.page(2, cursor)
+    assert [i["value"] for i in items] == ["String3"]
+    assert cursor is None
+
+
+def test_table_grows_past_its_initial_size():
+    repository = CompactInMemoryRepository()
+    keys = repository.add_items([f"value-{i}" for i in range(5000)])
+    assert repository.count() == 5000
+    assert all(repository.get_by_id(k) == {k: f"value-{i}"} for i, k in enumerate(keys))
+
+
+def test_deleted_slots_are_reclaimed_and_cursors_survive():
+    repository = CompactInMemoryRepository()
+    keys = repository.add_items([f"value-{i}" for i in range(3000)])
+    _, cursor = repository.page(2500)
+    for key in keys[:2400]:
+        repository.delete(key)
+    assert len(repository._seqs) < 3000
+
+    items, _ = repository.page(10, cursor)
+    assert [i["value"] for i in items] == [f"value-{i}" for i in range(2500, 2510)]
+    assert repository.head(1) == [{"id": keys[2400], "value": "value-2400"}]
+    assert repository.get_by_id(keys[2999]) == {keys[2999]: "value-2999"}
+
+
+def test_overwritten_values_are_reclaimed():
+    repository = CompactInMemoryRepository()
+    key = repository.add_item("x")
+    for i in range(300):
+        repository.update(key, f"{i}" * 5000)
+    assert len(repository._arena) < 2 * 1024 * 1024
+    assert repository.get_by_id(key) == {key: "299" * 5000}
+
+
+def test_offset_windows_skip_deleted_slots():
+    repository = CompactInMemoryRepository()
+    keys = repository.add_items([f"value-{i}" for i in range(100)])
+    for key in keys[10:60]:
+        repository.delete(key)
+    head = repository.head(3, offset=9)
+    assert [i["value"] for i in head] == ["value-9", "value-60", "value-61"]
+    tail = repository.tail(3, offset=39)
+    assert [i["value"] for i in tail] == ["value-60", "value-9", "value-8"]
+    assert repository.head(5, offset=50) == []
+    _, cursor = repository.page(10)
+    page, _ = repository.page(2, cursor)
+    assert [i["value"] for i in page] == ["value-60", "value-61"]
+
+
+def test_version_increases_with_every_write(repository):
+    versions = [repository.version()]
+    key = repository.add_item("NewItem")
+    versions.append(repository.version())
+    repository.update(key, "UpdatedItem")
+    versions.append(repository.version())
+    repository.get_by_id(key)
+    repository.head(5)
+    assert repository.version() == versions[-1]
+    repository.delete(key)
+    versions.append(repository.version())
+    assert versions == sorted(set(versions))
+
+
+def test_bulk_add_failing_partway_reports_the_added_keys(repository):
+    with pytest.raises(DBPartialBatchError) as raised:
+        # A lone surrogate cannot be encoded
+        repository.add_items(["String4", "\ud800", "String5"])
+    added, *rest = raised.value.outcomes
+    assert rest == [None, None]
+    assert repository.get_by_id(added) == {added: "String4"}
+    assert repository.count() == 4
+
+
+def test_rejected_import_adds_nothing(repository):
+    key = repository.head(1)[0]["id"]
+    new_key = "00000000-0000-4000-8000-000000000001"
+    with pytest.raises(DBFailedToAddItemError):
+        repository.import_items([(new_key, "x"), (key, "y")])
+    with pytest.raises(DBFailedToAddItemError):
+        repository.import_items([(new_key, "x"), ("not-a-uuid", "y")])
+    assert repository.count() == 3
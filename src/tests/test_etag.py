@@ -0,0 +1,32 @@
+from app.etag import (
+    collection_etag,
+    item_etag,
+    matches_if_match,
+    matches_if_none_match,
+)
+
+
+def test_etags_are_quoted_and_stable():
+    assert collection_etag("abc", 3) == '"abc-3"'
+    assert item_etag("value") == item_etag("value")
+    assert item_etag("value") != item_etag("other")
+    assert item_etag("value").startswith('"') and item_etag("value").endswith('"')
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = '"abc-3"'
+    assert matches_if_none_match('"abc-3"', etag)
+    assert matches_if_none_match('W/"abc-3"', etag)
+    assert matches_if_none_match('"abc-2", "abc-3"', etag)
+    assert matches_if_none_match("*", etag)
+    assert not matches_if_none_match('"abc-2"', etag)
+    assert not matches_if_none_match(None, etag)
+
+
+def test_if_match_uses_strong_comparison():
+    etag = item_etag("value")
+    assert matches_if_match(etag, etag)
+    assert matches_if_match(f'"other", {etag}', etag)
+    assert matches_if_match("*", etag)
+    assert not matches_if_match(f"W/{etag}", etag)
+    assert not matches_if_match("*", None)
@@ -0,0 +1,95 @@
+import uuid
+from itertools import count
+
+import pytest
+
+from app.repository.compact_repository import CompactInMemoryRepository
+from app.repository.ids import (
+    ID_SCHEMES,
+    SnowflakeGenerator,
+    ULIDGenerator,
+    UUID4Generator,
+    UUID7Generator,
+    create_id_generator,
+)
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.sqlite_repository import SqliteRepository
+
+NOW_NS = 1_800_000_000_000_000_000
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def frozen_clock():
+    return NOW_NS
+
+
+def backwards_clock():
+    """A clock that moves back one millisecond on every call."""
+    ticks = count()
+    return lambda: NOW_NS - next(ticks) * 1_000_000
+
+
+@pytest.mark.parametrize("scheme", sorted(ID_SCHEMES))
+def test_ids_are_unique(scheme):
+    generate = create_id_generator(scheme)
+    ids = [generate() for _ in range(10_000)]
+    assert len(set(ids)) == len(ids)
+    assert len({len(key) for key in ids}) == 1
+    if generate.time_ordered:
+        assert ids == sorted(ids)
+
+
+@pytest.mark.parametrize("generator_class", [UUID7Generator, ULIDGenerator])
+@pytest.mark.parametrize("clock", [frozen_clock, backwards_clock()])
+def test_ids_keep_increasing_when_the_clock_does_not(generator_class, clock):
+    generate = generator_class(clock=clock)
+    # More than the 12 bit counter of UUIDv7 holds in one millisecond
+    ids = [generate() for _ in range(10_000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_uuid7_layout():
+    generate = UUID7Generator(clock=frozen_clock)
+    key = uuid.UUID(generate())
+    assert key.version == 7
+    assert key.variant == uuid.RFC_4122
+    assert key.int >> 80 == NOW_NS // 1_000_000
+    assert uuid.UUID(bytes=generate.new_bytes()) > key
+
+
+def test_ulid_and_snowflake_encoding():
+    ulid = ULIDGenerator(clock=frozen_clock)()
+    assert len(ulid) == 26
+    assert set(ulid) <= set(CROCKFORD)
+    # The first 10 characters encode the millisecond timestamp
+    timestamp = 0
+    for char in ulid[:10]:
+        timestamp = timestamp * 32 + CROCKFORD.index(char)
+    assert timestamp == NOW_NS // 1_000_000
+
+    generate = SnowflakeGenerator(worker_id=5, clock=frozen_clock)
+    first, second = generate(), generate()
+    assert len(first) == 13
+    assert first < second
+    assert generate.worker_id == 5
+
+
+def test_repositories_use_the_given_generator(tmp_path):
+    generate = ULIDGenerator()
+    memory = InMemoryRepository(id_generator=generate)
+    sqlite = SqliteRepository(str(tmp_path / "items.db"), id_generator=generate)
+    for repository in (memory, sqlite):
+        keys = [repository.add_item("a")] + repository.add_items(["b", "c"])
+        assert all(len(key) == 26 for key in keys)
+        assert keys == sorted(keys)
+        assert [row["id"] for row in repository.list()] == keys
+
+
+def test_compact_repository_needs_uuid_ids():
+    with pytest.raises(ValueError):
+        CompactInMemoryRepository(ULIDGenerator())
+    repository = CompactInMemoryRepository(UUID4Generator())
+    key = repository.add_item("a")
+    assert uuid.UUID(key).version == 4
+    assert uuid.UUID(CompactInMemoryRepository().add_item("a")).version == 7
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from app.repository.fenwick import FenwickTree
+from app.repository.insertion_order import InsertionOrder
+
+
+def test_fenwick_prefix_sums_and_find():
+    tree = FenwickTree([1, 0, 1, 1])
+    tree.append(0)
+    tree.append(1)
+    assert [tree.prefix_sum(i) for i in range(7)] == [0, 1, 1, 2, 3, 3, 4]
+    assert [tree.find(k) for k in range(5)] == [0, 2, 3, 5, 6]
+    tree.add(2, -1)
+    assert [tree.find(k) for k in range(3)] == [0, 3, 5]
+
+
+def test_fenwick_with_array_storage():
+    tree = FenwickTree([1] * 10, typecode="i")
+    tree.append(1)
+    tree.add(0, -1)
+    assert tree.prefix_sum(len(tree)) == 10
+    assert tree.find(0) == 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_windows_match_a_plain_list(seed):
+    rng = random.Random(seed)
+    order = InsertionOrder()
+    expected = []
+    for i in range(3000):
+        if expected and rng.random() < 0.4:
+            key = expected.pop(rng.randrange(len(expected)))
+            order.remove(key)
+        else:
+            order.append(f"key-{i}")
+            expected.append(f"key-{i}")
+        if i % 97 == 0:
+            offset = rng.randrange(len(expected) + 2)
+            end = offset + rng.randrange(1, 50)
+            newest_first = expected[::-1]
+            assert order.window(offset, end - offset) == expected[offset:end]
+            assert (
+                order.window_from_end(offset, end - offset) == newest_first[offset:end]
+            )
+            if expected:
+                key = rng.choice(expected)
+                assert order.rank_of(key) == expected.index(key)
+                start = expected.index(key) + 1
+                end = start + rng.randrange(1, 50)
+                after = order.after(order.seq_of(key), end - start)
+                assert [k for _, k in after] == expected[start:end]
+
+
+def test_windows_skip_long_runs_of_tombstones():
+    order = InsertionOrder(f"key-{i}" for i in range(1000))
+    for i in range(10, 990):
+        order.remove(f"key-{i}")
+    assert order.window(8, 4) == ["key-8", "key-9", "key-990", "key-991"]
+    assert order.window_from_end(8, 4) == ["key-991", "key-990", "key-9", "key-8"]
+    assert order.window(20, 5) == []
+    assert order.last(2) == ["key-999", "key-998"]
+    assert order.after(order.seq_of("key-9"), 2) == [(991, "key-990"), (992, "key-991")]
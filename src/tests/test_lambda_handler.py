@@ -0,0 +1,90 @@
+import base64
+import json
+
+from app.lambda_handler import handler
+
+
+def v1_event(method, path, query=None, body=None, headers=None):
+    """An API Gateway REST API proxy event, as recorded from a deployed stage."""
+    return {
+        "resource": path,
+        "path": path,
+        "httpMethod": method,
+        "headers": {"Host": "api.example.com", **(headers or {})},
+        "multiValueHeaders": None,
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": None,
+        "requestContext": {"stage": "dev", "identity": {"sourceIp": "10.0.0.1"}},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+def v2_event(method, path, query="", body=None, headers=None, stage="$default"):
+    """An API Gateway HTTP API event, in payload format version 2.0."""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"host": "api.example.com", **(headers or {})},
+        "requestContext": {
+            "stage": stage,
+            "http": {"method": method, "path": path, "sourceIp": "10.0.0.1"},
+        },
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_rest_api_events():
+    body = json.dumps({"value": "from lambda"})
+    response = handler(v1_event("POST", "/items", body=body))
+    assert response["statusCode"] == 201
+    assert response["isBase64Encoded"] is False
+    assert response["multiValueHeaders"]["content-type"] == ["application/json"]
+    item_id = json.loads(response["body"])["id"]
+
+    response = handler(v1_event("GET", f"/items/{item_id}"))
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {item_id: "from lambda"}
+
+    response = handler(v1_event("GET", "/tail", query={"num_samples": "1"}))
+    assert json.loads(response["body"])[0]["id"] == item_id
+
+
+def test_http_api_events():
+    encoded = base64.b64encode(json.dumps({"value": "encoded"}).encode()).decode()
+    event = v2_event("POST", "/prod/items", body=encoded, stage="prod")
+    event["isBase64Encoded"] = True
+    response = handler(event)
+    assert response["statusCode"] == 201
+    item_id = json.loads(response["body"])["id"]
+
+    response = handler(v2_event("GET", "/tail", query="num_samples=1"))
+    assert response["statusCode"] == 200
+    assert response["headers"]["content-type"] == "application/json"
+    assert json.loads(response["body"])[0]["id"] == item_id
+
+    response = handler(v2_event("DELETE", f"/items/{item_id}"))
+    assert response["statusCode"] == 204
+    assert handler(v2_event("GET", f"/items/{item_id}"))["statusCode"] == 404
+
+
+def test_streams_are_ended_before_the_invocation_times_out():
+    handler(v2_event("POST", "/items", body=json.dumps({"value": "a"})))
+    event = v2_event(
+        "GET", "/changes", query="since=0", headers={"accept": "text/event-stream"}
+    )
+    response = handler(event, Context(remaining_ms=1200))
+    assert response["statusCode"] == 200
+    assert response["headers"]["content-type"].startswith("text/event-stream")
+    assert "data: " in response["body"]
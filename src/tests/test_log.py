@@ -0,0 +1,86 @@
+import io
+import logging
+import threading
+
+from app.log import EventLogger, QueueBatchingHandler
+
+
+class BlockingStream(io.StringIO):
+    """Stream whose first write waits until it is released."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait()
+        self.writes += 1
+        return super().write(text)
+
+
+def test_queue_handler_writes_queued_records_in_one_batch():
+    stream = BlockingStream()
+    handler = QueueBatchingHandler(stream)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("test_queue_handler")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning("first")
+        stream.writing.wait()
+        # Logged while the writer is busy with the first record
+        for i in range(50):
+            logger.warning("record %d", i)
+        stream.release.set()
+        handler.flush()
+    finally:
+        logger.removeHandler(handler)
+    lines = stream.getvalue().splitlines()
+    assert lines == ["first"] + [f"record {i}" for i in range(50)]
+    assert stream.writes == 2
+
+
+class RecordingLogger:
+    def __init__(self, level=logging.INFO):
+        self.level = level
+        self.calls = []
+
+    def isEnabledFor(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args, extra=None, stacklevel=1):
+        self.calls.append((level, message % args, extra))
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("formatted an event that was not written")
+
+
+def test_event_logger_samples_each_event_type():
+    logger = RecordingLogger()
+    draws = iter([0.5, 0.05] * 10)
+    events = EventLogger(logger, {"item.get": 0.1}, random=lambda: next(draws))
+    for _ in range(2):
+        events.info("item.get", "Getting item %s", "a", item_id="a")
+    events.info("item.add", "Adding %s", "b")
+    assert logger.calls == [
+        (
+            logging.INFO,
+            "Getting item a",
+            {"item_id": "a", "sample_rate": 0.1, "event": "item.get"},
+        ),
+        (logging.INFO, "Adding b", {"event": "item.add"}),
+    ]
+
+
+def test_event_logger_skips_formatting_below_the_level():
+    logger = RecordingLogger(level=logging.WARNING)
+    events = EventLogger(logger, {"item.add": 0.0})
+    events.info("item.add", "Adding %s", Unformattable())
+    events.info("item.update", "Updating %s", Unformattable())
+    events.debug("item.update", "Updating %s", Unformattable())
+    assert logger.calls == []
@@ -0,0 +1,257 @@
+import os
+import threading
+
+import pytest
+
+from app.repository.base_repository import (
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+)
+from app.repository.log_structured_repository import LogStructuredRepository
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / "log")
+
+
+@pytest.fixture
+def repository(log_dir):
+    """Fixture to create a LogStructuredRepository with small segments."""
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    repository.add_item(value="String1")
+    repository.add_item(value="String2")
+    repository.add_item(value="String3")
+    yield repository
+    repository.close()
+
+
+def test_crud(repository):
+    key = repository.add_item("NewItem")
+    assert repository.get_by_id(key) == {key: "NewItem"}
+    repository.update(key, "UpdatedItem")
+    assert repository.get_by_id(key) == {key: "UpdatedItem"}
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.update(key, "Again")
+
+
+def test_head_tail_page_keep_insertion_order(repository):
+    assert [i["value"] for i in repository.head(2)] == ["String1", "String2"]
+    assert [i["value"] for i in repository.tail(5)] == ["String3", "String2", "String1"]
+    items, cursor = repository.page(2)
+    items, cursor = repository.page(2, cursor)
+    assert [i["value"] for i in items] == ["String3"]
+    assert cursor is None
+
+
+def test_writes_roll_over_to_new_segments(repository):
+    keys = repository.add_items([f"value-{i:04d}" * 10 for i in range(200)])
+    assert repository.count() == 203
+    assert repository.get_by_id(keys[0]) == {keys[0]: "value-0000" * 10}
+    assert repository.get_by_id(keys[-1]) == {keys[-1]: "value-0199" * 10}
+
+
+def test_recovery_replays_the_log_without_a_checkpoint(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    keys = repository.add_items([f"value-{i}" for i in range(100)])
+    repository.update(keys[1], "updated")
+    repository.delete(keys[0])
+    # Simulate a crash: nothing is checkpointed
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert recovered.count() == 99
+    assert recovered.head(1) == [{"id": keys[1], "value": "updated"}]
+    assert recovered.tail(1) == [{"id": keys[-1], "value": "value-99"}]
+    recovered.close()
+
+
+def test_recovery_from_checkpoint_and_log_tail(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    keys = repository.add_items([f"value-{i}" for i in range(50)])
+    repository.checkpoint()
+    repository.delete(keys[10])
+    new_key = repository.add_item("after-checkpoint")
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert recovered.count() == 50
+    assert recovered.tail(1) == [{"id": new_key, "value": "after-checkpoint"}]
+    with pytest.raises(DBItemNotFoundError):
+        recovered.get_by_id(keys[10])
+    recovered.close()
+
+
+def test_append_only_writes_are_checkpointed(log_dir):
+    repository = LogStructuredRepository(
+        log_dir, segment_size=4096, checkpoint_min_log=8192
+    )
+    repository.add_items([f"value-{i}" for i in range(200)])
+    repository.maintain()
+    assert "checkpoint" in os.listdir(log_dir)
+    new_key = repository.add_item("after-checkpoint")
+    # Below the threshold again, so nothing is written
+    repository.maintain()
+    # Simulate a crash: only the log after the checkpoint is replayed
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert recovered.count() == 201
+    assert recovered.tail(1) == [{"id": new_key, "value": "after-checkpoint"}]
+    recovered.close()
+
+
+def test_cursor_survives_restart(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    repository.add_items(["A", "B", "C"])
+    _, cursor = repository.page(2)
+    repository.close()
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    items, _ = recovered.page(2, cursor)
+    assert [i["value"] for i in items] == ["C"]
+    recovered.close()
+
+
+def test_compaction_reclaims_space(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    keys = repository.add_items([f"value-{i}" for i in range(100)])
+    for _ in range(5):
+        repository.update_many([(key, "x" * 20) for key in keys])
+    repository.delete_many(keys[:50])
+    assert repository.garbage_bytes > 0
+    segments_before = len(os.listdir(log_dir))
+
+    repository.compact()
+    assert repository.garbage_bytes == 0
+    assert len(os.listdir(log_dir)) < segments_before
+    assert repository.count() == 50
+    assert repository.get_by_id(keys[99]) == {keys[99]: "x" * 20}
+    repository.close()
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert [i["id"] for i in recovered.head(100)] == keys[50:]
+    recovered.close()
+
+
+def test_checkpoints_and_compaction_run_alongside_writers(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=1024)
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        keys = repository.add_items([f"value-{i}" for i in range(200)])
+        for key in keys[::2]:
+            repository.delete(key)
+
+    def maintainer():
+        while not stop.is_set():
+            assert repository.garbage_bytes >= 0
+            repository.checkpoint()
+            repository.compact()
+
+    def guarded(target):
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    writers = [threading.Thread(target=guarded, args=(writer,)) for _ in range(4)]
+    maintainers = [
+        threading.Thread(target=guarded, args=(maintainer,)) for _ in range(2)
+    ]
+    for thread in maintainers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in maintainers:
+        thread.join()
+    assert errors == []
+    repository.close()
+
+    recovered = LogStructuredRepository(log_dir, segment_size=1024)
+    assert recovered.count() == 4 * 100
+    recovered.close()
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        pytest.param(lambda data: b"\x80\x05not a checkpoint", id="foreign"),
+        pytest.param(lambda data: data[:-1] + bytes([data[-1] ^ 1]), id="checksum"),
+        pytest.param(lambda data: data[: len(data) // 2], id="truncated"),
+    ],
+)
+def test_invalid_checkpoint_falls_back_to_a_full_replay(log_dir, damage):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    keys = repository.add_items([f"value-{i}" for i in range(100)])
+    repository.update_many([(key, "old") for key in keys[:20]])
+    repository.compact()
+    repository.update(keys[0], "after-compaction")
+    repository.delete(keys[1])
+    new_key = repository.add_item("new")
+    expected = repository.head(200)
+    repository.close()
+
+    path = os.path.join(log_dir, "checkpoint")
+    with open(path, "rb") as f:
+        assert f.read(7) == b"LSCHECK"
+        f.seek(0)
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(damage(data))
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert recovered.head(200) == expected
+    assert recovered.add_item("later") != new_key
+    _, cursor = recovered.page(1)
+    assert recovered.page(1, cursor)[0] == [{"id": keys[2], "value": "old"}]
+    recovered.close()
+
+
+def test_torn_write_at_the_end_of_the_log_is_discarded(log_dir):
+    repository = LogStructuredRepository(log_dir, segment_size=4096)
+    key = repository.add_item("complete")
+    repository.add_item("torn")
+    segment = repository._active
+    # Corrupt the last byte of the second record
+    segment.write_at(b"\xff", segment.write_pos - 1)
+
+    recovered = LogStructuredRepository(log_dir, segment_size=4096)
+    assert recovered.count() == 1
+    assert recovered.get_by_id(key) == {key: "complete"}
+    new_key = recovered.add_item("after")
+    recovered.close()
+
+    reopened = LogStructuredRepository(log_dir, segment_size=4096)
+    assert reopened.get_by_id(new_key) == {new_key: "after"}
+    reopened.close()
+
+
+def test_version_increases_with_every_write(repository):
+    versions = [repository.version()]
+    key = repository.add_item("NewItem")
+    versions.append(repository.version())
+    repository.update(key, "UpdatedItem")
+    versions.append(repository.version())
+    repository.get_by_id(key)
+    repository.head(5)
+    assert repository.version() == versions[-1]
+    repository.delete(key)
+    versions.append(repository.version())
+    assert versions == sorted(set(versions))
+
+
+def test_conditional_writes_compare_the_current_value(repository):
+    key = repository.add_item("v1")
+    with pytest.raises(DBPreconditionFailedError):
+        repository.update_if(key, "v0", "v2")
+    repository.update_if(key, "v1", "v2")
+    assert repository.get_by_id(key) == {key: "v2"}
+    with pytest.raises(DBPreconditionFailedError):
+        repository.delete_if(key, "v1")
+    repository.delete_if(key, "v2")
+    with pytest.raises(DBItemNotFoundError):
+        repository.update_if(key, "v2", "v3")
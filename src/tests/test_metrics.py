@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import api
+from app.common import metrics
+from app.metrics import Histogram, MetricsRecorder
+from app.repository.base_repository import DBItemNotFoundError
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.instrumented_repository import InstrumentedRepository
+
+
+def test_histogram_percentiles_are_within_one_bucket():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+    # Buckets are 2 ** (1 / 4) wide, so percentiles overestimate by < 19%
+    assert 0.5 <= histogram.percentile(0.5) < 0.5 * 1.19
+    assert 0.99 <= histogram.percentile(0.99) <= 1.0
+    assert histogram.percentile(1.0) == histogram.max == 1.0
+    assert histogram.summary(scale=1000)["mean"] == pytest.approx(500.5)
+    assert Histogram().summary()["p99"] == 0.0
+
+
+def test_instrumented_repository_times_every_call():
+    calls = []
+    repository = InstrumentedRepository(
+        InMemoryRepository(), lambda *args: calls.append(args)
+    )
+    key = repository.add_item("a")
+    assert repository.head(1) == [{"id": key, "value": "a"}]
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id("missing")
+    assert [(name, failed) for name, _, failed in calls] == [
+        ("add_item", False),
+        ("head", False),
+        ("get_by_id", True),
+    ]
+    assert all(seconds >= 0 for _, seconds, _ in calls)
+
+
+def test_metrics_endpoint_reports_routes_and_repository_calls():
+    client = TestClient(api)
+    item_id = client.post("/items", json={"value": "measured"}).json()["id"]
+    client.get(f"/items/{item_id}")
+    client.get("/items/missing")
+    client.get("/no-such-route")
+    report = client.get("/metrics").json()
+
+    route = report["routes"]["GET /items/{item_id}"]
+    assert route["statuses"]["200"] >= 1
+    assert route["statuses"]["404"] >= 1
+    assert route["latency_ms"]["p99"] >= route["latency_ms"]["p50"] > 0
+    assert report["routes"]["POST /items"]["request_bytes"]["max"] > 0
+    assert "GET unmatched" in report["routes"]
+    assert report["repository"]["get_by_id"]["failures"] >= 1
+    assert set(report["single_flight"]) == {"executions", "coalesced", "in_flight"}
+    assert set(report["response_cache"]) == {"hits", "misses", "size"}
+
+
+def test_publish_writes_one_emf_log_per_series(capsys):
+    recorder = MetricsRecorder(metrics, emf_interval=60)
+    recorder.record_request("GET", "/items", 200, 0.002, 0, 100)
+    recorder.record_request("GET", "/items", 503, 0.004, 0, 100)
+    recorder.record_operation("list", 0.001, False)
+    recorder.publish()
+    logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [log.get("route", log.get("operation")) for log in logs] == [
+        "GET /items",
+        "list",
+    ]
+    assert logs[0]["Calls"] == [2.0]
+    assert logs[0]["Errors"] == [1.0]
+    assert "LatencyP99" in logs[0]
+    # The next interval starts empty, so nothing is written for it
+    recorder.publish()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import debug
+from app.config import settings
+from app.profiling import (
+    ProfilerBusyError,
+    ProfilingMiddleware,
+    RequestProfiler,
+    SamplingProfiler,
+    collapsed_text,
+    flamegraph_tree,
+)
+
+
+def spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler_sees_other_threads():
+    profiler = SamplingProfiler(interval=0.001)
+    worker = threading.Thread(target=spin, args=(0.3,), name="worker")
+    worker.start()
+    stacks = profiler.profile(0.1)
+    worker.join()
+    spinning = [stack for stack in stacks if stack.startswith("worker;")]
+    assert spinning
+    assert all(stack.split(";")[-1].startswith("spin (") for stack in spinning)
+
+
+def test_sampling_profiler_runs_one_profile_at_a_time():
+    profiler = SamplingProfiler()
+    first = threading.Thread(target=profiler.profile, args=(0.2,))
+    first.start()
+    time.sleep(0.05)
+    with pytest.raises(ProfilerBusyError):
+        profiler.profile(0.01)
+    first.join()
+
+
+def test_collapsed_stacks_and_flamegraph_tree():
+    stacks = Counter({"main;a;b": 3, "main;a": 1, "main;c": 2})
+    assert collapsed_text(stacks) == "main;a;b 3\nmain;c 2\nmain;a 1\n"
+    tree = flamegraph_tree(stacks)
+    assert tree["value"] == 6
+    [main] = tree["children"]
+    assert [(child["name"], child["value"]) for child in main["children"]] == [
+        ("a", 4),
+        ("c", 2),
+    ]
+
+
+def test_request_profiler_keeps_the_slowest_sampled_requests():
+    app = FastAPI()
+
+    @app.get("/sleep/{ms}")
+    def sleep(ms: int):
+        time.sleep(ms / 1000)
+
+    profiler = RequestProfiler(sample_rate=2, keep=2)
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    client = TestClient(app)
+    for ms in (30, 1, 10, 1, 20, 1, 1, 1):
+        client.get(f"/sleep/{ms}")
+
+    reports = [profile.report() for profile in profiler.slowest()]
+    assert [report["path"] for report in reports] == ["/sleep/30", "/sleep/20"]
+    assert reports[0]["status"] == 200
+    assert reports[0]["duration_ms"] >= 30
+    assert reports[0]["functions"]
+
+
+def test_debug_routes_require_the_token(monkeypatch):
+    monkeypatch.setattr(settings, "debug_token", "secret")
+    monkeypatch.setattr(debug, "request_profiler", None)
+    app = FastAPI()
+    app.include_router(debug.router)
+    client = TestClient(app)
+
+    assert client.get("/debug/profile?seconds=0.01").status_code == 403
+    headers = {"X-Debug-Token": "wrong"}
+    assert client.get("/debug/profile?seconds=0.01", headers=headers).status_code == 403
+
+    headers = {"X-Debug-Token": "secret"}
+    response = client.get("/debug/profile?seconds=0.05", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.strip()
+    response = client.get("/debug/profile?seconds=0.05&format=json", headers=headers)
+    assert response.json()["name"] == "all"
+    assert client.get("/debug/profile?seconds=600", headers=headers).status_code == 422
+    assert client.get("/debug/profiles", headers=headers).status_code == 404
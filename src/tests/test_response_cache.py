@@ -0,0 +1,30 @@
+from app.response_cache import ResponseCache
+
+
+def test_bodies_are_served_for_their_version_only():
+    cache = ResponseCache()
+    cache.put(("head", 10, 0), 1, b"[]")
+    assert cache.get(("head", 10, 0), 1) == b"[]"
+    assert cache.get(("head", 10, 0), 2) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_newer_version_drops_older_bodies():
+    cache = ResponseCache()
+    cache.put("a", 1, b"1")
+    cache.put("b", 2, b"2")
+    assert len(cache) == 1
+    # A body built before the latest write is not stored
+    cache.put("a", 1, b"1")
+    assert cache.get("a", 2) is None
+
+
+def test_size_is_bounded_and_zero_disables():
+    cache = ResponseCache(max_size=2)
+    for key in "abc":
+        cache.put(key, 1, key.encode())
+    assert len(cache) == 2
+    assert cache.get("a", 1) is None
+    disabled = ResponseCache(max_size=0)
+    disabled.put("a", 1, b"a")
+    assert disabled.get("a", 1) is None
@@ -0,0 +1,19 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+from app import responses
+from app.responses import FastJSONResponse, dumps
+
+ROWS = [{"id": "a", "value": "ünïcödé ✓"}, {"id": "b", "value": 'quote " and \\'}]
+
+
+def test_fast_response_matches_stdlib_response():
+    assert FastJSONResponse(ROWS).body == JSONResponse(ROWS).body
+    assert FastJSONResponse(ROWS).headers["content-type"] == "application/json"
+
+
+def test_stdlib_fallback(monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    assert dumps(ROWS) == JSONResponse(ROWS).body
+    assert json.loads(dumps(ROWS)) == ROWS
@@ -1,8 +1,10 @@
 import pytest
 
+from app.repository import in_memory_repository
 from app.repository.in_memory_repository import (
     DBFailedToAddItemError,
     DBFailedtoListItemsError,
+    DBFailedToUpdateItemError,
     DBItemNotFoundError,
     InMemoryRepository,
 )
@@ -113,6 +115,13 @@ def test_update_item_not_found(items_service):
         items_service.update_item("non_existent_id", {"value": "NewValue"})
 
 
+def test_update_item_invalid_input(items_service):
+    """Test to ensure an invalid update body raises a validation error."""
+    item_id = items_service.add_item({"value": "ItemToUpdate"})["id"]
+    with pytest.raises(ValidationError, match="expected data in the format"):
+        items_service.update_item(item_id, {"wrong": "NewValue"})
+
+
 def test_delete_item(items_service):
     """Test to ensure an item can be deleted."""
     new_item = {"value": "ItemToDelete"}
@@ -185,3 +194,159 @@ def test_head_sample_assert_sample_count_zero_raises_validation_error(items_serv
 def test_tail_sample_assert_sample_count_zero_raises_validation_error(items_service):
     with pytest.raises(ValidationError):
         _ = items_service.tail(0)
+
+
+def test_head_and_tail_with_offset(items_service):
+    assert [item["value"] for item in items_service.head(5, 1)] == [
+        "String2",
+        "String3",
+    ]
+    assert [item["value"] for item in items_service.tail(1, 2)] == ["String1"]
+
+
+def test_negative_offset_raises_validation_error(items_service):
+    with pytest.raises(ValidationError):
+        _ = items_service.head(1, -1)
+    with pytest.raises(ValidationError):
+        _ = items_service.tail(1, -1)
+
+
+def test_page_walks_all_items_in_insertion_order(items_service):
+    first = items_service.page(2)
+    assert [item["value"] for item in first["items"]] == ["String1", "String2"]
+    assert first["next_cursor"] is not None
+
+    second = items_service.page(2, first["next_cursor"])
+    assert [item["value"] for item in second["items"]] == ["String3"]
+    assert second["next_cursor"] is None
+
+
+def test_page_cursor_is_stable_across_inserts_and_deletes(items_service):
+    first = items_service.page(2)
+    ids = [item["id"] for item in first["items"]]
+
+    # Remove an item that was already returned and append a new one
+    items_service.delete_item(ids[0])
+    items_service.add_item({"value": "String4"})
+
+    second = items_service.page(2, first["next_cursor"])
+    assert [item["value"] for item in second["items"]] == ["String3", "String4"]
+
+
+def test_page_invalid_cursor_raises_validation_error(items_service):
+    with pytest.raises(ValidationError):
+        items_service.page(2, "not-a-cursor")
+
+
+def test_page_limit_zero_raises_validation_error(items_service):
+    with pytest.raises(ValidationError):
+        items_service.page(0)
+
+
+def test_iter_items(items_service):
+    values = [item["value"] for item in items_service.iter_items()]
+    assert values == ["String1", "String2", "String3"]
+
+
+def test_iter_items_spans_multiple_pages():
+    repository = InMemoryRepository()
+    for i in range(25):
+        repository.add_item(value=f"String{i}")
+    values = [item["value"] for item in repository.iter_items(batch_size=10)]
+    assert values == [f"String{i}" for i in range(25)]
+
+
+def test_batch_mixed_operations(items_service):
+    existing_id = items_service.page(1)["items"][0]["id"]
+    results = items_service.batch(
+        [
+            {"op": "insert", "value": "String4"},
+            {"op": "insert", "value": "String5"},
+            {"op": "update", "id": existing_id, "value": "Updated"},
+            {"op": "delete", "id": "non_existent_id"},
+        ]
+    )
+    assert [result["status"] for result in results] == [201, 201, 200, 404]
+    assert items_service.get_item_by_id(results[0]["id"])[results[0]["id"]] == "String4"
+    assert items_service.get_item_by_id(existing_id)[existing_id] == "Updated"
+
+
+def test_batch_invalid_entry_does_not_fail_the_batch(items_service):
+    results = items_service.batch(
+        [
+            {"op": "insert"},
+            {"op": "explode", "id": "x"},
+            {"op": "insert", "value": "String4"},
+        ]
+    )
+    assert [result["status"] for result in results] == [400, 400, 201]
+
+
+def test_batch_repository_error_is_reported_per_item():
+    class FaultyRepository(InMemoryRepository):
+        def delete_many(self, keys):
+            raise Exception("Simulated database error")
+
+    service = ItemsService(items_repository=FaultyRepository())
+    results = service.batch(
+        [{"op": "insert", "value": "String1"}, {"op": "delete", "id": "some_id"}]
+    )
+    assert [result["status"] for result in results] == [201, 500]
+
+
+def test_batch_failing_partway_keeps_the_results_of_applied_entries():
+    class FaultyRepository(InMemoryRepository):
+        def update(self, key, value):
+            if value == "explode":
+                raise DBFailedToUpdateItemError(key, value)
+            super().update(key, value)
+
+    repository = FaultyRepository()
+    keys = repository.add_items(["String1", "String2", "String3"])
+    service = ItemsService(items_repository=repository)
+    results = service.batch(
+        [
+            {"op": "update", "id": keys[0], "value": "Updated"},
+            {"op": "update", "id": "non_existent_id", "value": "Updated"},
+            {"op": "update", "id": keys[1], "value": "explode"},
+            {"op": "update", "id": keys[2], "value": "Updated"},
+        ]
+    )
+    assert [result["status"] for result in results] == [200, 404, 500, 500]
+    assert repository.get_many(keys) == {
+        keys[0]: "Updated",
+        keys[1]: "String2",
+        keys[2]: "String3",
+    }
+
+
+def test_rejected_import_adds_nothing():
+    repository = InMemoryRepository()
+    key = repository.add_item("String1")
+    with pytest.raises(DBFailedToAddItemError):
+        repository.import_items([("new", "String2"), (key, "String3")])
+    with pytest.raises(DBFailedToAddItemError):
+        repository.import_items([("new", "String2"), ("new", "String3")])
+    assert repository.list() == [{"id": key, "value": "String1"}]
+
+
+def test_get_many(items_service):
+    item_id = items_service.add_item({"value": "NewItem"})["id"]
+    results = items_service.get_many([item_id, "non_existent_id"])
+    assert results[0] == {"id": item_id, "status": 200, "value": "NewItem"}
+    assert results[1]["status"] == 404
+
+
+def test_in_memory_row_cache_stays_bounded(monkeypatch):
+    monkeypatch.setattr(in_memory_repository, "ROW_CACHE_SIZE", 50)
+    repository = InMemoryRepository()
+    keys = repository.add_items([f"value-{i}" for i in range(200)])
+    assert sum(1 for _ in repository.iter_items(batch_size=20)) == 200
+    assert len(repository.list()) == 200
+    assert repository._rows == {}
+    for offset in range(0, 200, 20):
+        repository.head(20, offset)
+    assert len(repository._rows) == 50
+    # The newest rows are kept, and a write still drops the stale row
+    repository.update(keys[-1], "changed")
+    assert repository.tail(1) == [{"id": keys[-1], "value": "changed"}]
@@ -0,0 +1,175 @@
+import os
+import random
+
+import pytest
+
+from app.config import Settings
+from app.repository.base_repository import (
+    DBError,
+    DBInvalidCursorError,
+    DBItemNotFoundError,
+    DBPartialBatchError,
+    DBPreconditionFailedError,
+)
+from app.repository.factory import create_repository
+from app.repository.ids import ULIDGenerator, UUID4Generator
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.sharded_repository import ConsistentHashRing, ShardedRepository
+from app.repository.sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def repository():
+    """Fixture to create a ShardedRepository over four in-memory shards."""
+    repository = ShardedRepository([InMemoryRepository() for _ in range(4)])
+    repository.add_items([f"String{i}" for i in range(100)])
+    yield repository
+    repository.close()
+
+
+def values(rows):
+    return [row["value"] for row in rows]
+
+
+def test_adding_a_shard_moves_about_one_nth_of_the_keys():
+    keys = [f"key-{i}" for i in range(10_000)]
+    before = ConsistentHashRing(["0", "1", "2", "3"])
+    after = ConsistentHashRing(["0", "1", "2", "3", "4"])
+    moved = [key for key in keys if before.shard_for(key) != after.shard_for(key)]
+    assert all(after.shard_for(key) == "4" for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.3
+
+
+def test_items_are_spread_and_routed(repository):
+    assert all(shard.count() > 10 for shard in repository.shards.values())
+    key = repository.head(1)[0]["id"]
+    assert repository.get_by_id(key) == {key: "String0"}
+    repository.update(key, "Updated")
+    repository.update_if(key, "Updated", "Again")
+    with pytest.raises(DBPreconditionFailedError):
+        repository.delete_if(key, "Updated")
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    keys = [row["id"] for row in repository.head(3)]
+    assert repository.get_many(keys + [key]) == {
+        keys[0]: "String1",
+        keys[1]: "String2",
+        keys[2]: "String3",
+    }
+    assert repository.update_many([(keys[0], "a"), (key, "b")]) == [True, False]
+    assert repository.delete_many([key, keys[1]]) == [False, True]
+    assert repository.count() == 98
+
+
+def test_ordered_reads_merge_shards_in_insertion_order(repository):
+    expected = [f"String{i}" for i in range(100)]
+    assert values(repository.list()) == expected
+    assert values(repository.head(5, offset=10)) == expected[10:15]
+    assert values(repository.tail(3, offset=1)) == expected[-2:-5:-1]
+    assert values(repository.iter_items(batch_size=7)) == expected
+
+
+def test_pages_stay_consistent_with_concurrent_deletes(repository):
+    rows, cursor = repository.page(10)
+    # Delete items on every shard, some before and some after the cursor
+    repository.delete_many([row["id"] for row in repository.list()[5:20]])
+    rows, cursor = repository.page(10, cursor)
+    assert values(rows) == [f"String{i}" for i in range(20, 30)]
+    with pytest.raises(DBInvalidCursorError):
+        repository.page(10, "not-a-cursor")
+
+
+def test_pages_return_items_added_to_shards_that_had_run_out():
+    sharded = ShardedRepository([InMemoryRepository() for _ in range(4)])
+    unsharded = InMemoryRepository()
+    for repository in (sharded, unsharded):
+        repository.add_items([f"v{i}" for i in range(8)])
+    pages = []
+    for repository in (sharded, unsharded):
+        rows, cursor = repository.page(6)
+        repository.add_items([f"v{i}" for i in range(8, 20)])
+        returned = values(rows)
+        while cursor is not None:
+            rows, cursor = repository.page(5, cursor)
+            returned += values(rows)
+        pages.append(returned)
+    assert pages[0] == pages[1] == [f"v{i}" for i in range(20)]
+    sharded.close()
+
+
+def test_add_and_remove_shards_keep_every_item(repository):
+    expected = values(repository.list())
+    _, cursor = repository.page(50)
+    moved = repository.add_shard(InMemoryRepository())
+    assert 0 < moved < 50
+    assert repository.shards["4"].count() == moved
+    assert values(repository.list()) == expected
+    assert values(repository.head(5, offset=20)) == expected[20:25]
+    # Cursors issued before the rebalance skip what was already returned
+    rows, _ = repository.page(50, cursor)
+    assert values(rows) == expected[50:]
+
+    version = repository.version()
+    repository.remove_shard("1")
+    assert sorted(repository.shards) == ["0", "2", "3", "4"]
+    assert values(repository.list()) == expected
+    assert repository.count() == 100
+    assert repository.rebalance() == 0
+    assert repository.version() > version
+
+
+def test_shards_need_time_ordered_ids():
+    with pytest.raises(ValueError):
+        ShardedRepository([InMemoryRepository()], id_generator=UUID4Generator())
+    repository = ShardedRepository(
+        [InMemoryRepository() for _ in range(3)], id_generator=ULIDGenerator()
+    )
+    repository.add_items([f"String{i}" for i in range(30)])
+    assert values(repository.list()) == [f"String{i}" for i in range(30)]
+    repository.close()
+
+
+def test_sqlite_shards(tmp_path):
+    rng = random.Random(3)
+    shards = [SqliteRepository(str(tmp_path / f"shard-{i}.db")) for i in range(3)]
+    repository = ShardedRepository(shards)
+    keys = repository.add_items([f"String{i}" for i in range(50)])
+    for key in rng.sample(keys, 10):
+        repository.delete(key)
+    expected = [row["value"] for row in repository.list()]
+    assert len(expected) == 40
+    repository.add_shard(SqliteRepository(str(tmp_path / "shard-3.db")))
+    assert values(repository.list()) == expected
+    assert values(repository.tail(2)) == expected[:-3:-1]
+    repository.close()
+
+
+def test_factory_builds_one_backend_per_shard(tmp_path):
+    settings = Settings(
+        repository_backend="sqlite",
+        sqlite_path=str(tmp_path / "items.db"),
+        shard_count=3,
+    )
+    repository = create_repository(settings)
+    assert isinstance(repository, ShardedRepository)
+    assert repository.thread_safe == SqliteRepository.thread_safe
+    for i in range(3):
+        assert os.path.exists(tmp_path / f"items-{i}.db")
+    repository.close()
+
+
+def test_bulk_write_reports_the_outcomes_of_the_shards_that_succeeded():
+    class FailingShard(InMemoryRepository):
+        def import_items(self, items):
+            raise DBError("Simulated database error")
+
+    shards = [InMemoryRepository(), InMemoryRepository(), FailingShard()]
+    repository = ShardedRepository(shards)
+    with pytest.raises(DBPartialBatchError) as raised:
+        repository.add_items([f"String{i}" for i in range(30)])
+    outcomes = raised.value.outcomes
+    added = [key for key in outcomes if key is not None]
+    assert 0 < len(added) < 30
+    assert sorted(row["id"] for row in repository.list()) == sorted(added)
+    repository.close()
@@ -0,0 +1,247 @@
+import fcntl
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.change_feed import ChangeFeed, ChangesExpiredError
+from app.repository import shared_memory_repository
+from app.repository.base_repository import (
+    DBError,
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+)
+from app.repository.insertion_order import InsertionOrder
+from app.repository.shared_memory_repository import SharedMemoryRepository
+from app.repository.thread_safe_repository import ThreadSafeInMemoryRepository
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "items.shm")
+
+
+@pytest.fixture
+def repository(path):
+    """Fixture to create a SharedMemoryRepository with some initial data."""
+    repository = SharedMemoryRepository(path)
+    repository.add_items(["String1", "String2", "String3"])
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def other(path, repository):
+    """A second handle on the same file, standing in for another worker."""
+    other = SharedMemoryRepository(path)
+    yield other
+    other.close()
+
+
+def test_crud(repository):
+    key = repository.add_item("NewItem ✓")
+    assert repository.get_by_id(key) == {key: "NewItem ✓"}
+    repository.update(key, "UpdatedItem")
+    assert repository.get_by_id(key) == {key: "UpdatedItem"}
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.delete(key)
+
+
+def test_writes_are_seen_by_other_handles(repository, other):
+    assert [i["value"] for i in other.list()] == ["String1", "String2", "String3"]
+    first = repository.list()[0]["id"]
+    key = other.add_item("String4")
+    other.update(first, "Updated")
+    assert [i["value"] for i in repository.list()] == [
+        "Updated",
+        "String2",
+        "String3",
+        "String4",
+    ]
+    repository.delete(key)
+    assert other.count() == 3
+    assert [i["value"] for i in other.tail(1)] == ["String3"]
+    assert other.version() == repository.version()
+    items, cursor = other.page(2)
+    assert repository.page(2, cursor)[0] == [other.list()[2]]
+
+
+def test_conditional_writes(repository, other):
+    key = repository.list()[0]["id"]
+    other.update_if(key, "String1", "Changed")
+    with pytest.raises(DBPreconditionFailedError):
+        repository.update_if(key, "String1", "Lost update")
+    with pytest.raises(DBPreconditionFailedError):
+        repository.delete_if(key, "String1")
+    repository.delete_if(key, "Changed")
+    assert other.get_many([key]) == {}
+
+
+def test_file_grows_and_other_handles_follow(repository, other):
+    values = ["x" * 1000 + str(i) for i in range(3000)]
+    repository.add_items(values)
+    assert other.count() == 3003
+    assert other.tail(1)[0]["value"] == values[-1]
+
+
+def test_compaction_replaces_the_file(repository, other, monkeypatch):
+    monkeypatch.setattr(shared_memory_repository, "MIN_COMPACTION_RECORDS", 10)
+    key = repository.list()[0]["id"]
+    _, cursor = other.page(1)
+    for i in range(30):
+        repository.update(key, f"Update {i}")
+    assert repository._records < 10
+    assert other.get_by_id(key) == {key: "Update 29"}
+    assert [i["value"] for i in other.page(5, cursor)[0]] == ["String2", "String3"]
+    other.add_item("String4")
+    assert repository.count() == 4
+
+
+def test_change_feeds_list_the_writes_of_every_handle(path, repository):
+    feeds = [ChangeFeed(), ChangeFeed()]
+    handles = [SharedMemoryRepository(path, change_feed=feed) for feed in feeds]
+    # Changes made before a handle opened are not listed, but are counted
+    assert [feed.last_seq for feed in feeds] == [3, 3]
+    first, second = handles
+    deleted = repository.list()[0]["id"]
+    key = first.add_item("String4")
+    second.update(key, "Updated")
+    second.delete(deleted)
+    first.count()
+    expected = [
+        {"seq": 4, "op": "insert", "id": key, "value": "String4"},
+        {"seq": 5, "op": "update", "id": key, "value": "Updated"},
+        {"seq": 6, "op": "delete", "id": deleted, "value": None},
+    ]
+    assert feeds[0].since(3, 10) == feeds[1].since(3, 10) == expected
+    for handle in handles:
+        handle.close()
+
+
+def test_change_feed_follows_other_handles_without_reads(path, repository):
+    feed = ChangeFeed()
+    follower = SharedMemoryRepository(path, change_feed=feed)
+    key = repository.add_item("String4")
+    deadline = time.monotonic() + 2
+    while feed.last_seq == 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert feed.since(3, 10) == [
+        {"seq": 4, "op": "insert", "id": key, "value": "String4"}
+    ]
+    follower.close()
+
+
+def test_change_feed_skips_changes_lost_to_compaction(path, repository, monkeypatch):
+    monkeypatch.setattr(shared_memory_repository, "MIN_COMPACTION_RECORDS", 10)
+    # Keep the handle from catching up on its own
+    monkeypatch.setattr(shared_memory_repository, "POLL_INTERVAL", 60)
+    feed = ChangeFeed()
+    behind = SharedMemoryRepository(path, change_feed=feed)
+    key = repository.list()[0]["id"]
+    for i in range(30):
+        repository.update(key, f"Update {i}")
+    assert behind.get_by_id(key) == {key: "Update 29"}
+    assert feed.last_seq == 33
+    with pytest.raises(ChangesExpiredError):
+        feed.since(3, 10)
+    repository.delete(key)
+    behind.count()
+    assert feed.since(33, 10) == [{"seq": 34, "op": "delete", "id": key, "value": None}]
+    behind.close()
+
+
+def test_version_does_not_wait_for_the_file_lock(path, repository, monkeypatch):
+    # Keep the handle from catching up on its own
+    monkeypatch.setattr(shared_memory_repository, "POLL_INTERVAL", 60)
+    behind = SharedMemoryRepository(path)
+    version = behind.version()
+    repository.add_item("String4")
+    # Another process holding the lock, such as one compacting the file
+    fd = os.open(path + ".lock", os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        assert behind.version() == version
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+    assert behind.count() == 4
+    assert behind.version() == repository.version() > version
+    behind.close()
+
+
+def test_version_follows_other_handles_without_reads(repository, other):
+    repository.add_item("String4")
+    deadline = time.monotonic() + 2
+    while other.version() != repository.version() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert other.version() == repository.version()
+
+
+def test_reads_during_a_reload_see_every_item(path, repository, monkeypatch):
+    monkeypatch.setattr(shared_memory_repository, "MIN_COMPACTION_RECORDS", 10)
+    monkeypatch.setattr(shared_memory_repository, "POLL_INTERVAL", 60)
+    reader = SharedMemoryRepository(path)
+    key = reader.list()[0]["id"]
+    seen = []
+
+    class ObservedOrder(InsertionOrder):
+        def append(self, key_appended, seq=None):
+            # What reads that take no lock see while the file is reloaded
+            seen.append(
+                (
+                    ThreadSafeInMemoryRepository.count(reader),
+                    ThreadSafeInMemoryRepository.get_by_id(reader, key),
+                )
+            )
+            return super().append(key_appended, seq)
+
+    monkeypatch.setattr(shared_memory_repository, "InsertionOrder", ObservedOrder)
+    for i in range(30):
+        repository.update(key, f"Update {i}")
+    # The reader picks up the compacted file and reloads it
+    assert reader.count() == 3
+    assert seen and all(entry == (3, {key: "String1"}) for entry in seen)
+    reader.close()
+
+
+def test_reopening_keeps_the_data(path, repository):
+    repository.delete(repository.list()[0]["id"])
+    reopened = SharedMemoryRepository(path)
+    assert reopened.list() == repository.list()
+    assert reopened.version() == repository.version()
+    reopened.close()
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    path = tmp_path / "foreign"
+    path.write_bytes(b"not a repository")
+    with pytest.raises(DBError):
+        SharedMemoryRepository(str(path))
+
+
+def add_items_from_another_process(path: str, worker: int) -> None:
+    repository = SharedMemoryRepository(path)
+    for i in range(50):
+        repository.add_items([f"{worker}-{i}"] * 2)
+    repository.close()
+
+
+def test_concurrent_processes_share_one_list(path, repository):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=add_items_from_another_process, args=(path, n))
+        for n in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    values = [i["value"] for i in repository.list()[3:]]
+    assert len(values) == 400
+    # Each batch was committed as a whole, so its two items are adjacent
+    assert values[0::2] == values[1::2]
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.thread_pool_adapter import ThreadPoolRepositoryAdapter
+from app.router import cached_json_response
+from app.service import AsyncItemsService
+from app.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_one_key_share_one_execution():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(single_flight.do(key, lambda key=key: load(key)) for key in "aaab")
+        )
+
+    assert asyncio.run(scenario()) == ["A", "A", "A", "B"]
+    assert sorted(calls) == ["a", "b"]
+    assert single_flight.stats == {"executions": 2, "coalesced": 2, "in_flight": 0}
+
+
+def test_finished_calls_are_not_reused():
+    single_flight = SingleFlight()
+    counter = iter(range(10))
+
+    async def load():
+        return next(counter)
+
+    async def scenario():
+        return [await single_flight.do("key", load) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [0, 1]
+    assert single_flight.coalesced == 0
+
+
+def test_errors_reach_every_caller():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(single_flight.do("key", fail) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    assert [type(result) for result in asyncio.run(scenario())] == [RuntimeError] * 3
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    single_flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        first = asyncio.create_task(single_flight.do("key", load))
+        second = asyncio.create_task(single_flight.do("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_disabled_runs_every_call():
+    single_flight = SingleFlight(enabled=False)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def scenario():
+        return await asyncio.gather(*(single_flight.do("key", load) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [1, 1, 1]
+    assert single_flight.stats["executions"] == 3
+
+
+@pytest.mark.parametrize("enabled,expected_calls", [(True, 1), (False, 20)])
+def test_identical_requests_share_one_repository_read(enabled, expected_calls):
+    class SlowRepository(InMemoryRepository):
+        def __init__(self):
+            super().__init__()
+            self.head_calls = 0
+            self.release = threading.Event()
+
+        def head(self, n, offset=0):
+            self.head_calls += 1
+            self.release.wait(1)
+            return super().head(n, offset)
+
+    repository = SlowRepository()
+    repository.add_items(["String1", "String2"])
+    adapter = ThreadPoolRepositoryAdapter(repository, max_workers=20)
+    service = AsyncItemsService(adapter, single_flight=SingleFlight(enabled))
+
+    async def scenario():
+        requests = [
+            asyncio.create_task(
+                cached_json_response(service, ("head", 1, 0), lambda: service.head(1))
+            )
+            for _ in range(20)
+        ]
+        await asyncio.sleep(0.05)
+        repository.release.set()
+        return await asyncio.gather(*requests)
+
+    try:
+        responses = asyncio.run(scenario())
+    finally:
+        adapter.close()
+    assert {response.body for response in responses} == {
+        f'[{{"id":"{repository.list()[0]["id"]}","value":"String1"}}]'.encode()
+    }
+    assert repository.head_calls == expected_calls
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from app.repository.in_memory_repository import InMemoryRepository
+from app.repository.snapshot import (
+    DBSnapshotError,
+    PeriodicSnapshot,
+    dump_snapshot,
+    load_snapshot,
+)
+
+
+def test_round_trip_keeps_insertion_order(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    repository = InMemoryRepository()
+    keys = [repository.add_item(f"String{i}") for i in range(5)]
+    repository.delete(keys[2])
+    repository.update(keys[0], "Updated")
+    repository.save_snapshot(path)
+
+    restored = InMemoryRepository.from_snapshot(path)
+    assert restored.list() == repository.list()
+    assert [i["value"] for i in restored.tail(1)] == ["String4"]
+    assert restored.add_item("New") in {i["id"] for i in restored.tail(1)}
+
+
+def test_round_trip_with_separator_and_unicode_values(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    items = [("a", "nul\x00inside"), ("b", "ünïcödé ✓"), ("c", "")]
+    dump_snapshot(path, items)
+    keys, values = load_snapshot(path)
+    assert list(zip(keys, values)) == items
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    dump_snapshot(path, [])
+    assert load_snapshot(path) == ([], [])
+
+
+def test_invalid_file_raises_snapshot_error(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(DBSnapshotError):
+        load_snapshot(str(path))
+
+
+def test_truncated_file_raises_snapshot_error(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    dump_snapshot(path, [("a", "1"), ("b", "2")])
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 1)
+    with pytest.raises(DBSnapshotError):
+        load_snapshot(path)
+
+
+def test_periodic_snapshot_skips_unchanged_repository(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.bin")
+    repository = InMemoryRepository()
+    saves = []
+    monkeypatch.setattr(repository, "save_snapshot", saves.append)
+    writer = PeriodicSnapshot(repository, path, interval=0.01)
+    writer.start()
+    time.sleep(0.05)
+    repository.add_item("String1")
+    time.sleep(0.05)
+    writer.stop()
+    assert saves == [path]
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+
+from app.repository.base_repository import (
+    DBInvalidCursorError,
+    DBItemNotFoundError,
+    DBPreconditionFailedError,
+)
+from app.repository.sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """Fixture to create a SqliteRepository with some initial data."""
+    repository = SqliteRepository(str(tmp_path / "items.db"))
+    repository.add_item(value="String1")
+    repository.add_item(value="String2")
+    repository.add_item(value="String3")
+    yield repository
+    repository.close()
+
+
+def test_add_and_get_item(repository):
+    key = repository.add_item("NewItem")
+    assert repository.get_by_id(key) == {key: "NewItem"}
+
+
+def test_get_item_not_found(repository):
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id("non_existent_id")
+
+
+def test_update_item(repository):
+    key = repository.add_item("ItemToUpdate")
+    repository.update(key, "UpdatedItem")
+    assert repository.get_by_id(key) == {key: "UpdatedItem"}
+
+
+def test_update_item_not_found(repository):
+    with pytest.raises(DBItemNotFoundError):
+        repository.update("non_existent_id", "NewValue")
+
+
+def test_delete_item(repository):
+    key = repository.add_item("ItemToDelete")
+    repository.delete(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+    with pytest.raises(DBItemNotFoundError):
+        repository.delete(key)
+
+
+def test_list_head_tail_keep_insertion_order(repository):
+    assert [i["value"] for i in repository.list()] == ["String1", "String2", "String3"]
+    assert [i["value"] for i in repository.head(2)] == ["String1", "String2"]
+    assert [i["value"] for i in repository.tail(5)] == ["String3", "String2", "String1"]
+    assert repository.count() == 3
+
+
+def test_page_cursor_is_stable_across_deletes(repository):
+    first, cursor = repository.page(2)
+    repository.delete(first[1]["id"])
+    repository.add_item("String4")
+
+    second, cursor = repository.page(2, cursor)
+    assert [i["value"] for i in second] == ["String3", "String4"]
+    assert cursor is None
+
+
+def test_page_invalid_cursor(repository):
+    with pytest.raises(DBInvalidCursorError):
+        repository.page(2, "bogus")
+
+
+def test_bulk_operations(repository):
+    keys = repository.add_items(["A", "B", "C"])
+    assert repository.get_many([keys[0], "missing", keys[2]]) == {
+        keys[0]: "A",
+        keys[2]: "C",
+    }
+    assert repository.update_many([(keys[1], "B2"), ("missing", "X")]) == [True, False]
+    assert repository.delete_many([keys[0], keys[0]]) == [True, False]
+    assert [i["value"] for i in repository.tail(2)] == ["C", "B2"]
+
+
+def test_data_survives_reopening(tmp_path):
+    path = str(tmp_path / "items.db")
+    repository = SqliteRepository(path)
+    key = repository.add_item("Persisted")
+    repository.close()
+
+    reopened = SqliteRepository(path)
+    assert reopened.get_by_id(key) == {key: "Persisted"}
+    reopened.close()
+
+
+def test_concurrent_writers(repository):
+    def writer():
+        for i in range(50):
+            repository.add_item(f"value{i}")
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert repository.count() == 203
+
+
+def test_head_and_tail_with_offset(repository):
+    keys = repository.add_items([f"value-{i}" for i in range(10)])
+    repository.delete(keys[3])
+    assert [i["value"] for i in repository.head(3, offset=5)] == [
+        "value-2",
+        "value-4",
+        "value-5",
+    ]
+    assert [i["value"] for i in repository.tail(2, offset=7)] == ["value-1", "value-0"]
+
+
+def test_version_increases_with_every_write(repository):
+    versions = [repository.version()]
+    key = repository.add_item("NewItem")
+    versions.append(repository.version())
+    repository.update(key, "UpdatedItem")
+    versions.append(repository.version())
+    repository.get_by_id(key)
+    repository.head(5)
+    assert repository.version() == versions[-1]
+    repository.delete(key)
+    versions.append(repository.version())
+    assert versions == sorted(set(versions))
+
+
+def test_version_sees_writes_from_another_connection(repository, tmp_path):
+    other = SqliteRepository(str(tmp_path / "items.db"))
+    before = repository.version()
+    other.add_item("FromAnotherProcess")
+    deadline = time.monotonic() + 2
+    while repository.version() == before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert repository.version() > before
+    other.close()
+
+
+def test_version_does_not_query_the_database(repository, monkeypatch):
+    version = repository.version()
+
+    def refuse(*args):
+        raise AssertionError("version() touched the database")
+
+    monkeypatch.setattr(repository, "_connection", refuse)
+    assert repository.version() == version
+
+
+def test_conditional_writes_compare_the_current_value(repository):
+    key = repository.add_item("v1")
+    with pytest.raises(DBPreconditionFailedError):
+        repository.update_if(key, "v0", "v2")
+    repository.update_if(key, "v1", "v2")
+    assert repository.get_by_id(key) == {key: "v2"}
+    with pytest.raises(DBPreconditionFailedError):
+        repository.delete_if(key, "v1")
+    repository.delete_if(key, "v2")
+    with pytest.raises(DBItemNotFoundError):
+        repository.update_if(key, "v2", "v3")
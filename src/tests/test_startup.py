@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import app
+from app.common import LazyProxy
+
+# Modules the default configuration has no use for, which would only slow
+# down cold starts if `app.app` imported them
+LAZY_MODULES = [
+    "aws_lambda_powertools",
+    "cProfile",
+    "app.debug",
+    "app.profiling",
+    "sqlite3",
+    "app.repository.caching_repository",
+    "app.repository.compact_repository",
+    "app.repository.log_structured_repository",
+    "app.repository.sharded_repository",
+    "app.repository.shared_memory_repository",
+    "app.repository.sqlite_repository",
+]
+
+
+def test_importing_the_app_skips_unused_modules():
+    code = "import sys, app.app; print('\\n'.join(sys.modules))"
+    # Run from the directory holding the package, wherever pytest was started
+    source_root = os.path.dirname(os.path.dirname(app.__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=source_root,
+    ).stdout
+    imported = set(output.split())
+    assert imported.isdisjoint(LAZY_MODULES)
+
+
+def test_lazy_proxy_builds_its_target_once():
+    built = []
+
+    def factory():
+        built.append(1)
+        return "target"
+
+    proxy = LazyProxy(factory)
+    assert not proxy.initialized
+    assert proxy.upper() == "TARGET"
+    assert proxy.startswith("t")
+    assert proxy.initialized
+    assert built == [1]
@@ -0,0 +1,125 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from app.repository.base_repository import DBItemNotFoundError
+from app.repository.thread_safe_repository import ThreadSafeInMemoryRepository
+
+
+@pytest.fixture
+def repository():
+    repository = ThreadSafeInMemoryRepository()
+    repository.add_items(["String1", "String2", "String3"])
+    return repository
+
+
+def test_list_snapshot_is_reused_until_a_write(repository):
+    first = repository.list()
+    first.append("caller's own copy")
+    assert [i["value"] for i in repository.list()] == ["String1", "String2", "String3"]
+    key = repository.add_item("String4")
+    repository.update(key, "Updated")
+    assert repository.list()[-1] == {"id": key, "value": "Updated"}
+    repository.delete(key)
+    assert len(repository.list()) == 3
+    with pytest.raises(DBItemNotFoundError):
+        repository.get_by_id(key)
+
+
+def test_patched_list_snapshot_matches_the_writes():
+    rng = random.Random(7)
+    repository = ThreadSafeInMemoryRepository()
+    keys = repository.add_items([f"v{i}" for i in range(50)])
+    # A dict keeps insertion order through updates, like the repository
+    expected = {key: f"v{i}" for i, key in enumerate(keys)}
+    repository.list()
+    for i in range(500):
+        roll = rng.random()
+        if roll < 0.3 and expected:
+            key = rng.choice(list(expected))
+            repository.delete(key)
+            del expected[key]
+        elif roll < 0.6 and expected:
+            key = rng.choice(list(expected))
+            repository.update(key, f"u{i}")
+            expected[key] = f"u{i}"
+        else:
+            expected[repository.add_item(f"a{i}")] = f"a{i}"
+        assert repository.list() == [
+            {"id": key, "value": value} for key, value in expected.items()
+        ]
+
+
+def test_snapshot_file_round_trip(repository, tmp_path):
+    path = str(tmp_path / "items.snapshot")
+    repository.save_snapshot(path)
+    restored = ThreadSafeInMemoryRepository.from_snapshot(path)
+    assert isinstance(restored, ThreadSafeInMemoryRepository)
+    assert [i["value"] for i in restored.head(3)] == ["String1", "String2", "String3"]
+
+
+def assert_pairs(rows):
+    """Rows come in pairs of consecutive items with the same value."""
+    values = [row["value"] for row in rows]
+    assert len(values) % 2 == 0, values
+    assert values[0::2] == values[1::2], values
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_readers_see_consistent_views_under_concurrent_writes(
+    frequent_thread_switches,
+):
+    # Writers only ever insert, update and delete pairs of items in one
+    # operation, so any point-in-time view holds whole pairs
+    repository = ThreadSafeInMemoryRepository()
+    stop = threading.Event()
+    errors = []
+
+    def writer(name):
+        pairs = []
+        for i in range(300):
+            pairs.append(repository.add_items([f"{name}-{i}"] * 2))
+            if i % 3 == 1:
+                keys = pairs.pop(0)
+                repository.update_many([(key, f"{name}-{i}-u") for key in keys])
+            if i % 3 == 2:
+                repository.delete_many(pairs.pop(0))
+
+    def reader():
+        while not stop.is_set():
+            assert_pairs(repository.list())
+            assert_pairs(repository.head(10))
+            assert_pairs(repository.tail(10))
+            assert_pairs(repository.page(10)[0])
+            assert repository.count() % 2 == 0
+
+    def guarded(target, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    readers = [threading.Thread(target=guarded, args=(reader,)) for _ in range(4)]
+    writers = [
+        threading.Thread(target=guarded, args=(writer, f"w{n}")) for n in range(4)
+    ]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert repository.count() == 4 * 2 * 200
+    assert_pairs(repository.list())